@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+
+"""
+    Tuxus - ISO burning & USB drive formatting app for Linux
+    Copyright © 2025 santofrancesco
+    Full notice can be found on https://www.github.com/santofrancesco/tuxus/blob/main/LICENSE
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# Local job API on a Unix socket, so provisioning tools can drive Tuxus.
+#
+# The protocol is one JSON object per line. Requests look like
+#   {"id": 1, "method": "submit", "params": {"op": "burn", ...}}
+# and every request gets {"id": 1, "result": ...} or {"id": 1, "error": "..."}.
+#
+# Methods:
+#   devices                         removable drives, as in the drive lists
+#   submit {op, device, ...}        start a burn/format/verify/duplicate/hash
+#                                   job (duplicate takes targets=[...])
+#   jobs / job {job}                list jobs / get one job
+#   cancel {job}                    stop a job
+#   clear                           forget finished jobs, returns their ids
+#   add_rule {op, ...}              run a job on every newly inserted drive
+#   rules / remove_rule {rule}      list / delete auto rules
+#   subscribe                       stream {"event": "job", "job": {...}} and
+#                                   {"event": "cleared", "jobs": [ids]} lines
+#                                   on this connection until it is closed
+#
+# Run this file to talk to a running instance, e.g.
+#   ./api.py submit op=burn device=/dev/sdb image=/tmp/x.iso verify=true
+
+import json, os, queue, select, socket, socketserver, sys, tempfile, threading
+import logic
+
+# Seconds between checks whether a subscribed client is still connected
+STREAM_POLL = 1.0
+
+
+# Returns the API socket path ($XDG_RUNTIME_DIR/tuxus.sock)
+def socket_path():
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return os.path.join(runtime, "tuxus.sock")
+    return os.path.join(tempfile.gettempdir(), f"tuxus-{os.getuid()}.sock")
+
+
+# Handles one client connection
+class ApiHandler(socketserver.StreamRequestHandler):
+    def send(self, message):
+        self.wfile.write((json.dumps(message) + "\n").encode())
+        self.wfile.flush()
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                method = request["method"]
+                params = request.get("params") or {}
+            except (ValueError, KeyError, TypeError):
+                self.send({"id": None, "error": "Malformed request"})
+                continue
+
+            if method == "subscribe":
+                self.stream(request.get("id"))
+                return
+            try:
+                result = self.dispatch(method, params)
+                self.send({"id": request.get("id"), "result": result})
+            except (ValueError, KeyError, TypeError) as e:
+                self.send({"id": request.get("id"), "error": str(e)})
+            except Exception as e:
+                # Failures reading drives or the history must not end the
+                # connection without a reply
+                print(f"Error handling API method {method}:", e)
+                self.send({"id": request.get("id"), "error": f"{method} failed: {e}"})
+
+    def dispatch(self, method, params):
+        manager = self.server.manager
+        if method == "devices":
+            return logic.list_usb_drives()
+        if method == "submit":
+            params = dict(params)
+            return manager.submit(params.pop("op", None), params).to_dict()
+        if method == "jobs":
+            return [job.to_dict() for job in manager.list()]
+        if method == "job":
+            return manager.get(int(params["job"])).to_dict()
+        if method == "cancel":
+            return manager.cancel(int(params["job"])).to_dict()
+        if method == "clear":
+            return manager.clear_finished()
+        if method == "add_rule":
+            params = dict(params)
+            return manager.add_rule(params.pop("op", None), params)
+        if method == "rules":
+            return manager.list_rules()
+        if method == "remove_rule":
+            return manager.remove_rule(int(params["rule"]))
+        raise ValueError(f"Unknown method: {method}")
+
+    # Streams job events until the client disconnects
+    def stream(self, request_id):
+        manager = self.server.manager
+        events = manager.subscribe()
+        try:
+            self.send({"id": request_id, "result": "subscribed"})
+            while True:
+                try:
+                    self.send(events.get(timeout=STREAM_POLL))
+                except queue.Empty:
+                    if self.disconnected():
+                        return
+        except OSError:
+            pass
+        finally:
+            manager.unsubscribe(events)
+
+    # True once the client closed its end; it sends nothing while subscribed
+    def disconnected(self):
+        readable, _, _ = select.select([self.connection], [], [], 0)
+        if not readable:
+            return False
+        try:
+            return not self.connection.recv(1, socket.MSG_PEEK)
+        except OSError:
+            return True
+
+
+# Unix socket server, one thread per connection
+class ApiServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, manager, path=None):
+        self.manager = manager
+        self.path = path or socket_path()
+        if os.path.exists(self.path):
+            # A socket nobody listens on is left over from a crash
+            try:
+                Client(self.path).close()
+                raise RuntimeError(f"Tuxus API already running on {self.path}")
+            except ConnectionRefusedError:
+                os.unlink(self.path)
+        super().__init__(self.path, ApiHandler)
+        os.chmod(self.path, 0o600)
+
+    # Serves requests on a background thread
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+# Minimal client for scripts and tests
+class Client:
+    def __init__(self, path=None):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path or socket_path())
+        self.file = self.sock.makefile("rw")
+        self.next_id = 1
+
+    def request(self, method, **params):
+        request_id = self.next_id
+        self.next_id += 1
+        self.file.write(
+            json.dumps({"id": request_id, "method": method, "params": params}) + "\n"
+        )
+        self.file.flush()
+        return request_id
+
+    def receive(self):
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("Tuxus API closed the connection")
+        return json.loads(line)
+
+    # Calls a method and returns its result, raising RuntimeError on errors
+    def call(self, method, **params):
+        self.request(method, **params)
+        reply = self.receive()
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply["result"]
+
+    # Yields job events forever; use a separate Client for other calls
+    def events(self):
+        self.call("subscribe")
+        while True:
+            yield self.receive()
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+# Turns "key=value" arguments into params, parsing JSON values when possible
+def parse_params(args):
+    params = {}
+    for arg in args:
+        key, _, value = arg.partition("=")
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    return params
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("usage: api.py METHOD [key=value ...]")
+        return 2
+
+    client = Client()
+    try:
+        if argv[0] == "subscribe":
+            for event in client.events():
+                print(json.dumps(event), flush=True)
+        else:
+            result = client.call(argv[0], **parse_params(argv[1:]))
+            print(json.dumps(result, indent=2))
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
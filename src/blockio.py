@@ -0,0 +1,1179 @@
+#!/usr/bin/env python3
+
+"""
+    Tuxus - ISO burning & USB drive formatting app for Linux
+    Copyright © 2025 santofrancesco
+    Full notice can be found on https://www.github.com/santofrancesco/tuxus/blob/main/LICENSE
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# Privileged block device helper.
+#
+# The GUI never touches raw devices itself: it starts this script through
+# pkexec and reads its progress as JSON lines on stdout, one object per line
+# with an "event" key ("progress", "result" or "error").
+#
+# stdin is the control channel. The helper runs as root, so the GUI cannot
+# signal it; writing "cancel" (or closing stdin) stops the running command.
+
+import argparse, errno, fcntl, hashlib, json, mmap, os, queue, random, stat, struct
+import shutil, statistics, subprocess, sys, threading, time
+
+MiB = 1024 * 1024
+MB = 1000 * 1000
+PAGE = 4096
+CHUNK = 4 * MiB
+
+# ioctl request numbers from <linux/fs.h>
+BLKFLSBUF = 0x1261
+BLKDISCARD = 0x1277
+
+# Bytes per discard request, so progress and cancel stay responsive
+DISCARD_STEP = 1024 * MiB
+
+# Every scanned page starts with this header: magic, absolute offset, run seed
+SCAN_HEADER = struct.Struct("<8sQQ")
+SCAN_MAGIC = b"TUXUSCAN"
+
+# Number of equally sized regions used for the per-region throughput map
+SCAN_REGIONS = 16
+
+
+# Set once the GUI asks the running command to stop
+CANCEL = threading.Event()
+
+# write --await-commit: the GUI accepts ("commit") or rejects ("abort") the
+# image once it has checked it; abort also sets CANCEL
+COMMIT = threading.Event()
+ABORT = threading.Event()
+
+
+class Cancelled(Exception):
+    pass
+
+
+# Reads control commands from stdin until it is closed. Only a pipe counts
+# as a control channel, so running the helper by hand from a shell works.
+def watch_control():
+    if not stat.S_ISFIFO(os.fstat(sys.stdin.fileno()).st_mode):
+        COMMIT.set()  # Nobody to wait for
+        return
+    for line in sys.stdin:
+        command = line.strip()
+        if command == "commit":
+            COMMIT.set()
+        elif command == "abort":
+            ABORT.set()
+            break
+        elif command == "cancel":
+            break
+    CANCEL.set()
+
+
+# Raises Cancelled if the GUI asked to stop
+def check_cancel():
+    if CANCEL.is_set():
+        raise Cancelled("cancelled")
+
+
+_emit_lock = threading.Lock()
+
+
+# Writes one JSON event line for the GUI
+def emit(event, **fields):
+    fields["event"] = event
+    with _emit_lock:
+        sys.stdout.write(json.dumps(fields) + "\n")
+        sys.stdout.flush()
+
+
+# Returns size in bytes of an open block device
+def device_size(fd):
+    return os.lseek(fd, 0, os.SEEK_END)
+
+
+# Opens a block device for exclusive raw I/O, bypassing the page cache when
+# the device allows it so timings reflect the flash and not RAM. Sources that
+# are only read open shared: several verify and clone runs may read one
+# drive at once, and the caller unmounts it first.
+def open_device(device, flags=os.O_RDWR, exclusive=True):
+    if exclusive:
+        flags |= os.O_EXCL
+    try:
+        return os.open(device, flags | os.O_DIRECT)
+    except OSError:
+        return os.open(device, flags)
+
+
+# Copies data into a page aligned buffer, as O_DIRECT requires
+def aligned(data):
+    buf = mmap.mmap(-1, max(PAGE, -(-len(data) // PAGE) * PAGE))
+    buf[: len(data)] = data
+    return memoryview(buf)[: len(data)]
+
+
+# Positional read into a page aligned buffer
+def read_at(fd, length, offset):
+    buf = mmap.mmap(-1, max(PAGE, -(-length // PAGE) * PAGE))
+    got = os.preadv(fd, [buf], offset)
+    return buf[: min(got, length)]
+
+
+# Flushes dirty pages to the device and drops them from the page cache
+def drop_caches(fd):
+    os.fsync(fd)
+    try:
+        fcntl.ioctl(fd, BLKFLSBUF)
+    except OSError:
+        pass
+    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+# Runs produce() on a worker thread and consume() on the caller, overlapping
+# the two through a bounded queue
+def pipeline(produce, consume, depth=4):
+    items = queue.Queue(maxsize=depth)
+    errors = []
+
+    def worker():
+        try:
+            for item in produce():
+                items.put(item)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            items.put(None)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    while True:
+        item = items.get()
+        if item is None:
+            break
+        consume(item)
+    thread.join()
+    if errors:
+        raise errors[0]
+
+
+# Emits throttled progress events
+class Progress:
+    def __init__(self, phase, total, interval=0.25):
+        self.phase = phase
+        self.total = total
+        self.done = 0
+        self.interval = interval
+        self.last = 0.0
+
+    def add(self, nbytes, **extra):
+        check_cancel()
+        self.done += nbytes
+        now = time.monotonic()
+        if now - self.last >= self.interval or self.done >= self.total:
+            self.last = now
+            emit(
+                "progress",
+                phase=self.phase,
+                done=self.done,
+                total=self.total,
+                **extra,
+            )
+
+
+# =====================================================
+#  Surface scan
+# =====================================================
+
+# Builds the position-tagged test pattern for [offset, offset + length)
+def scan_pattern(offset, length, seed):
+    filler = bytes((seed + i) & 0xFF for i in range(PAGE - SCAN_HEADER.size))
+    pages = [
+        SCAN_HEADER.pack(SCAN_MAGIC, offset + p, seed) + filler
+        for p in range(0, length, PAGE)
+    ]
+    return b"".join(pages)[:length]
+
+
+# Classifies a read-back chunk page by page.
+# Returns a list of (offset, kind, alias_of) for every page that failed.
+def scan_check(offset, data, expected, seed):
+    if data == expected:
+        return []
+    failures = []
+    for p in range(0, len(expected), PAGE):
+        got = data[p : p + PAGE]
+        if got == expected[p : p + PAGE]:
+            continue
+        alias_of = None
+        if len(got) >= SCAN_HEADER.size:
+            magic, tag, tag_seed = SCAN_HEADER.unpack_from(got)
+            if magic == SCAN_MAGIC and tag_seed == seed and tag != offset + p:
+                alias_of = tag
+        kind = "aliased" if alias_of is not None else "bad"
+        failures.append((offset + p, kind, alias_of))
+    return failures
+
+
+# Merges failed pages into contiguous regions
+def merge_regions(failures, granularity=PAGE):
+    regions = []
+    for offset, kind, alias_of in sorted(failures):
+        last = regions[-1] if regions else None
+        if last and last["kind"] == kind and last["end"] == offset:
+            last["end"] = offset + granularity
+        else:
+            region = {"start": offset, "end": offset + granularity, "kind": kind}
+            if alias_of is not None:
+                region["alias_of"] = alias_of
+            regions.append(region)
+    return regions
+
+
+# One write-then-read pass over a list of (offset, length) samples.
+# Samples are written first and only read back after the cache is dropped,
+# so a later write that wraps around onto an earlier one is detected.
+def scan_pass(fd, samples, seed, stats, done_before, total):
+    failures = []
+
+    write_progress = Progress("write", total)
+    write_progress.done = done_before
+
+    def generate():
+        for offset, length in samples:
+            yield offset, length, aligned(scan_pattern(offset, length, seed))
+
+    def write(item):
+        offset, length, pattern = item
+        start = time.monotonic()
+        try:
+            os.pwritev(fd, [pattern], offset)
+        except OSError:
+            failures.append((offset, "bad", None))
+        stats.record(offset, length, "write", time.monotonic() - start)
+        write_progress.add(length)
+
+    pipeline(generate, write)
+    drop_caches(fd)
+
+    read_progress = Progress("read", total)
+    read_progress.done = done_before
+
+    def read():
+        for offset, length in samples:
+            start = time.monotonic()
+            try:
+                data = read_at(fd, length, offset)
+            except OSError:
+                data = None
+            stats.record(offset, length, "read", time.monotonic() - start)
+            yield offset, length, data
+
+    def verify(item):
+        offset, length, data = item
+        if data is None:
+            failures.extend(
+                (offset + p, "bad", None) for p in range(0, length, PAGE)
+            )
+        else:
+            failures.extend(
+                scan_check(offset, data, scan_pattern(offset, length, seed), seed)
+            )
+        read_progress.add(length)
+
+    pipeline(read, verify)
+    return failures
+
+
+# Accumulates bytes and seconds per region for the throughput map
+class RegionStats:
+    def __init__(self, size):
+        self.size = size
+        self.width = max(PAGE, -(-size // SCAN_REGIONS))
+        self.data = {}
+
+    def record(self, offset, length, phase, seconds):
+        key = (offset // self.width, phase)
+        nbytes, total = self.data.get(key, (0, 0.0))
+        self.data[key] = (nbytes + length, total + seconds)
+
+    def report(self):
+        regions = []
+        for index in range(-(-self.size // self.width)):
+            region = {
+                "start": index * self.width,
+                "end": min(self.size, (index + 1) * self.width),
+            }
+            for phase in ("write", "read"):
+                nbytes, seconds = self.data.get((index, phase), (0, 0.0))
+                region[f"{phase}_mbps"] = (
+                    round(nbytes / seconds / MB, 1) if nbytes and seconds else None
+                )
+            regions.append(region)
+        return regions
+
+
+# Works out the real capacity from the scan failures.
+# A device that wraps writes around shows up as aliased pages, where the
+# distance between the tag and the page is the real size; a device that
+# drops writes past its real size fails every sample from some point on.
+def real_capacity(size, samples, failures):
+    capacity = size
+    aliases = [
+        alias_of - offset
+        for offset, kind, alias_of in failures
+        if kind == "aliased" and alias_of > offset
+    ]
+    if aliases:
+        capacity = min(capacity, min(aliases))
+
+    failed = {offset - offset % PAGE for offset, _, _ in failures}
+    tail = None
+    for offset, length in sorted(samples, reverse=True):
+        if not any(p in failed for p in range(offset, offset + length, PAGE)):
+            break
+        tail = offset
+    if tail is not None:
+        capacity = min(capacity, tail)
+    return capacity
+
+
+# Scans a device and reports bad/aliased regions, real capacity and throughput.
+#
+# "full" writes and reads back the whole device in CHUNK sized pieces.
+# "quick" samples 1 MiB blocks on a power-of-two stride, so the blocks a
+# wrapping fake device aliases onto are themselves sampled, then narrows the
+# stride around the first failure to pin down where the real capacity ends.
+def surface_scan(device, mode):
+    fd = open_device(device)
+    try:
+        size = device_size(fd)
+        stats = RegionStats(size)
+        seed = int.from_bytes(os.urandom(4), "little")
+
+        if mode == "full":
+            samples = [(o, min(CHUNK, size - o)) for o in range(0, size, CHUNK)]
+            failures = scan_pass(fd, samples, seed, stats, 0, size)
+            tested = size
+        else:
+            length = MiB
+            stride = length
+            while size // stride > 256:
+                stride *= 2
+            samples = [(o, length) for o in range(0, size - length + 1, stride)]
+            total = len(samples) * length
+            failures = scan_pass(fd, samples, seed, stats, 0, total)
+            tested = total
+
+            # Refine between the last good sample and the first bad one
+            for _ in range(4):
+                capacity = real_capacity(size, samples, failures)
+                if capacity >= size or stride <= length:
+                    break
+                if any(kind == "aliased" for _, kind, _ in failures):
+                    break  # wrap-around already gives the exact size
+                low = max(0, capacity - stride)
+                stride = max(length, stride // 16)
+                extra = [
+                    (o, length)
+                    for o in range(low + stride, capacity, stride)
+                    if o + length <= size
+                ]
+                if not extra:
+                    break
+                seed += 1
+                total = tested + len(extra) * length
+                failures += scan_pass(fd, extra, seed, stats, tested, total)
+                samples += extra
+                tested = total
+
+        capacity = real_capacity(size, samples, failures)
+        emit(
+            "result",
+            mode=mode,
+            size=size,
+            real_capacity=capacity,
+            tested_bytes=tested,
+            regions=merge_regions(failures),
+            throughput=stats.report(),
+        )
+    finally:
+        os.close(fd)
+
+
+# =====================================================
+#  Image writing
+# =====================================================
+
+# Returns bytes written to a block device so far according to the kernel,
+# or None when the device has no /sys/class/block/<name>/stat
+def sectors_written(device):
+    name = os.path.basename(os.path.realpath(device))
+    try:
+        with open(f"/sys/class/block/{name}/stat") as f:
+            return int(f.read().split()[6]) * 512
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+# Flushes everything to the device, then drops its buffer cache.
+# While the flush runs, a watcher reports how much of it already reached the
+# device using the kernel's per-device write counter.
+def final_flush(fd, device, progress, flushed):
+    baseline = sectors_written(device)
+    stop = threading.Event()
+
+    def watch():
+        while not stop.wait(0.25) and baseline is not None:
+            current = sectors_written(device)
+            if current is not None:
+                done = min(progress.total, flushed + current - baseline)
+                emit(
+                    "progress",
+                    phase="flush",
+                    done=progress.done,
+                    total=progress.total,
+                    flushed=done,
+                )
+
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+    try:
+        os.fsync(fd)
+        try:
+            fcntl.ioctl(fd, BLKFLSBUF)
+        except OSError:
+            pass
+    finally:
+        stop.set()
+        watcher.join()
+
+
+# Overwrites the first MiB of a device (partition tables, boot code and the
+# ISO 9660 volume descriptors) so it is no longer recognized or bootable
+def invalidate(fd):
+    os.pwrite(fd, bytes(MiB), 0)
+    os.fsync(fd)
+
+
+# Copies an image onto a device.
+#
+# durability selects when the data is forced out to the device:
+#   "sync"      fdatasync after every block (what dd oflag=sync does)
+#   "periodic"  fdatasync every flush_every bytes
+#   "final"     a single fsync plus BLKFLSBUF once everything is written
+# Every mode ends with a full flush, and progress events report written and
+# flushed bytes separately so nothing claims 100% before it is on the drive.
+#
+# With await_commit the final flush waits for "commit" on stdin, so the GUI
+# can reject an image whose checksum turned out wrong. On "abort" the start
+# of the drive is wiped, leaving no half-valid image behind.
+def write_image(
+    source, device, durability="periodic", flush_every=64 * MiB, await_commit=False
+):
+    total = os.path.getsize(source)
+    started = time.monotonic()
+    progress = Progress("write", total)
+    flushed = 0
+    waited = 0.0  # spent waiting for "commit", not part of the write time
+
+    src = os.open(source, os.O_RDONLY)
+    fd = os.open(device, os.O_WRONLY | os.O_EXCL)
+    try:
+        os.posix_fadvise(src, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+        def read():
+            while True:
+                data = os.read(src, CHUNK)
+                if not data:
+                    return
+                yield data
+
+        def write(data):
+            nonlocal flushed
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view) :]
+            progress.done += len(data)
+            if durability == "sync" or (
+                durability == "periodic" and progress.done - flushed >= flush_every
+            ):
+                os.fdatasync(fd)
+                flushed = progress.done
+            progress.add(0, flushed=flushed)
+
+        try:
+            pipeline(read, write)
+            if await_commit:
+                emit(
+                    "progress",
+                    phase="commit",
+                    done=progress.done,
+                    total=total,
+                    flushed=flushed,
+                )
+                wait_started = time.monotonic()
+                while not COMMIT.wait(0.1):
+                    check_cancel()
+                waited = time.monotonic() - wait_started
+        except Cancelled:
+            if ABORT.is_set():
+                invalidate(fd)
+            raise
+
+        emit(
+            "progress",
+            phase="flush",
+            done=progress.done,
+            total=total,
+            flushed=flushed,
+        )
+        final_flush(fd, device, progress, flushed)
+        flushed = progress.done
+        emit(
+            "progress",
+            phase="done",
+            done=progress.done,
+            total=total,
+            flushed=flushed,
+        )
+
+        emit(
+            "result",
+            bytes=progress.done,
+            seconds=round(time.monotonic() - started - waited, 3),
+            commit_wait=round(waited, 3),
+            durability=durability,
+        )
+    finally:
+        os.close(fd)
+        os.close(src)
+
+
+# Compares a device against an image, reading the device past the page cache.
+# Reports the offset of the first difference, if any.
+def verify_image(source, device):
+    total = os.path.getsize(source)
+    progress = Progress("verify", total)
+    mismatch = None
+
+    fd = open_device(device, os.O_RDONLY, exclusive=False)
+    try:
+        with open(source, "rb") as src:
+
+            def read():
+                for offset in range(0, total, CHUNK):
+                    length = min(CHUNK, total - offset)
+                    yield offset, read_at(fd, length, offset), src.read(length)
+
+            def compare(item):
+                nonlocal mismatch
+                offset, got, expected = item
+                if mismatch is None and got != expected:
+                    mismatch = offset + next(
+                        (i for i, (a, b) in enumerate(zip(got, expected)) if a != b),
+                        min(len(got), len(expected)),
+                    )
+                    raise ValueError(f"Drive content differs at byte {mismatch}")
+                progress.add(len(expected))
+
+            pipeline(read, compare)
+    finally:
+        os.close(fd)
+
+    emit("result", bytes=total, match=True)
+
+
+# =====================================================
+#  Drive duplication
+# =====================================================
+
+# Chunks a duplication keeps in flight per target; bounds the shared buffer
+CLONE_DEPTH = 8
+
+# Bytes between flush + read-back verification of a target
+CLONE_VERIFY_EVERY = 64 * MiB
+
+
+# Returns (bytes in use, partition table type) of a device: the end of its
+# last partition, or the whole device when it has no partition table
+def used_extent(device, size):
+    try:
+        output = subprocess.run(
+            ["sfdisk", "-J", device], capture_output=True, text=True, check=True
+        ).stdout
+        table = json.loads(output)["partitiontable"]
+    except (OSError, subprocess.CalledProcessError, ValueError, KeyError):
+        return size, None
+    sector = table.get("sectorsize", 512)
+    ends = [(p["start"] + p["size"]) * sector for p in table.get("partitions", [])]
+    if not ends:
+        return size, None
+    return min(max(ends), size), table.get("label")
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+# One target of a duplication: writes the chunks it is handed and, every
+# CLONE_VERIFY_EVERY bytes, flushes and reads them back against their digests
+class CloneTarget:
+    def __init__(self, device):
+        self.device = device
+        self.fd = open_device(device, os.O_RDWR)
+        self.chunks = queue.Queue(maxsize=CLONE_DEPTH)
+        self.written = 0
+        self.verified = 0
+        self.pending = []  # (offset, length, digest) written but not verified
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while True:
+            item = self.chunks.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue  # Keep draining so the reader never blocks on us
+            try:
+                self.write(*item)
+            except Exception as e:
+                self.error = str(e)
+        if self.error is None and not CANCEL.is_set():
+            try:
+                self.verify()
+            except Exception as e:
+                self.error = str(e)
+
+    def write(self, offset, data, digest):
+        view = data
+        position = offset
+        while view:
+            written = os.pwrite(self.fd, view, position)
+            view = view[written:]
+            position += written
+        self.written += len(data)
+        self.pending.append((offset, len(data), digest))
+        if self.written - self.verified >= CLONE_VERIFY_EVERY:
+            self.verify()
+
+    # Forces the pending chunks onto the device, evicts them from the page
+    # cache and compares what the device returns
+    def verify(self):
+        if not self.pending:
+            return
+        os.fdatasync(self.fd)
+        start = self.pending[0][0]
+        end = self.pending[-1][0] + self.pending[-1][1]
+        os.posix_fadvise(self.fd, start, end - start, os.POSIX_FADV_DONTNEED)
+        for offset, length, digest in self.pending:
+            if _digest(read_at(self.fd, length, offset)) != digest:
+                raise ValueError(f"Read-back differs in the {length} bytes at {offset}")
+            self.verified += length
+        self.pending = []
+
+    def close(self):
+        if self.fd is not None:
+            try:
+                fcntl.ioctl(self.fd, BLKFLSBUF)
+            except OSError:
+                pass
+            os.close(self.fd)
+            self.fd = None
+
+
+# Copies the used extent of one drive to many in a single read pass.
+#
+# A reader fills chunks once and hands the same buffer to every target's
+# writer thread through bounded queues, so memory stays at CLONE_DEPTH chunks
+# per target and the slowest target sets the pace. Each target is verified
+# by reading it back as the copy goes. A failing target is dropped and the
+# others carry on; the result lists every target's outcome.
+def clone_drive(source, targets):
+    started = time.monotonic()
+    src = open_device(source, os.O_RDONLY, exclusive=False)
+    clones = []
+    try:
+        size = device_size(src)
+        extent, label = used_extent(source, size)
+        for device in targets:
+            clones.append(CloneTarget(device))
+        for clone in clones:
+            if device_size(clone.fd) < extent:
+                raise ValueError(
+                    f"{clone.device} is smaller than the {extent} bytes to copy"
+                )
+
+        progress = Progress("copy", extent)
+        for clone in clones:
+            clone.thread.start()
+        try:
+            for offset in range(0, extent, CHUNK):
+                length = min(CHUNK, extent - offset)
+                buf = mmap.mmap(-1, max(PAGE, -(-length // PAGE) * PAGE))
+                got = os.preadv(src, [buf], offset)
+                if got < length:
+                    raise OSError(f"Short read from {source} at byte {offset}")
+                data = memoryview(buf)[:length]
+                digest = _digest(data)
+                for clone in clones:
+                    clone.chunks.put((offset, data, digest))
+                if all(clone.error for clone in clones):
+                    break
+                progress.add(
+                    length,
+                    targets={
+                        c.device: {
+                            "written": c.written,
+                            "verified": c.verified,
+                            "error": c.error,
+                        }
+                        for c in clones
+                    },
+                )
+        finally:
+            for clone in clones:
+                clone.chunks.put(None)
+            for clone in clones:
+                clone.thread.join()
+        check_cancel()
+
+        for clone in clones:
+            clone.close()
+            if clone.error is None and label == "gpt":
+                # The backup GPT belongs at the end of each target, which
+                # the copy never reached
+                subprocess.run(
+                    ["sfdisk", "--relocate", "gpt-bak-std", clone.device],
+                    capture_output=True,
+                )
+
+        emit(
+            "result",
+            bytes=extent,
+            source_size=size,
+            seconds=round(time.monotonic() - started, 3),
+            targets={
+                c.device: {"ok": c.error is None, "error": c.error} for c in clones
+            },
+        )
+    finally:
+        for clone in clones:
+            clone.close()
+        os.close(src)
+
+
+# =====================================================
+#  Discard
+# =====================================================
+
+# Discards (TRIMs) every block of a device, telling the flash controller the
+# old data is garbage so later writes skip its read-modify-write cycles.
+# Fails with "not supported" when the device or its USB bridge cannot discard.
+def discard_device(device):
+    started = time.monotonic()
+    fd = os.open(device, os.O_WRONLY | os.O_EXCL)
+    try:
+        total = device_size(fd)
+        progress = Progress("discard", total)
+        offset = 0
+        while offset < total:
+            length = min(DISCARD_STEP, total - offset)
+            try:
+                fcntl.ioctl(fd, BLKDISCARD, struct.pack("QQ", offset, length))
+            except OSError as e:
+                if e.errno in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL):
+                    raise RuntimeError("Discard is not supported by this device")
+                raise
+            offset += length
+            progress.add(length)
+
+        emit(
+            "result",
+            bytes=total,
+            seconds=round(time.monotonic() - started, 3),
+        )
+    finally:
+        os.close(fd)
+
+
+# =====================================================
+#  Erase block probe
+# =====================================================
+
+# Alignments tried by the probe: 16 KiB up to 32 MiB
+PROBE_ALIGNMENTS = [16 * 1024 << i for i in range(12)]
+
+
+# Estimates the flash erase block size from read timings (non-destructive).
+#
+# Reading across an erase block boundary touches two blocks and is slower
+# than reading inside one. For alignments below the erase block only some
+# boundaries are real ones, so the crossing penalty grows with the alignment
+# and levels off at the erase block size; the smallest alignment on that
+# plateau is the estimate. Reports erase_block None when timings are too
+# noisy to tell.
+def probe_erase_block(device, samples=48):
+    fd = open_device(device, os.O_RDONLY)
+    try:
+        total = device_size(fd)
+        drop_caches(fd)
+        buf = mmap.mmap(-1, 2 * PAGE)
+        progress = Progress("probe", len(PROBE_ALIGNMENTS))
+
+        def timed(offset):
+            start = time.perf_counter()
+            os.preadv(fd, [buf], offset)
+            return time.perf_counter() - start
+
+        penalties = {}
+        baseline = []
+        for align in PROBE_ALIGNMENTS:
+            blocks = total // align - 1
+            if blocks < 2:
+                break
+            across, inside = [], []
+            for _ in range(samples):
+                boundary = random.randrange(1, blocks) * align
+                across.append(timed(boundary - PAGE))
+                inside.append(timed(boundary + align // 2 - PAGE))
+            penalties[align] = statistics.median(across) - statistics.median(inside)
+            baseline.append(statistics.median(inside))
+            progress.add(1)
+
+        erase = None
+        if penalties:
+            plateau = max(penalties.values())
+            # A real boundary costs at least a tenth of a plain read
+            if plateau > 0.1 * statistics.median(baseline):
+                erase = min(a for a, p in penalties.items() if p >= 0.7 * plateau)
+
+        emit(
+            "result",
+            erase_block=erase,
+            penalties_us={a: round(p * 1e6, 1) for a, p in penalties.items()},
+        )
+    finally:
+        os.close(fd)
+
+
+# =====================================================
+#  Benchmark
+# =====================================================
+
+# Measures sequential and 4K random read/write speed of a device.
+#
+# The benchmark does not destroy data: every write puts back the exact bytes
+# that were just read from the same place, so an interrupted run leaves the
+# drive as it was. Each test stops after time_limit seconds.
+def benchmark(device, seq_size=64 * MiB, random_ops=256, time_limit=5.0):
+    fd = open_device(device)
+    try:
+        size = device_size(fd)
+        seq_size = max(CHUNK, min(seq_size, size // 4 // CHUNK * CHUNK))
+        # Stay clear of the partition table and filesystem headers at the start
+        seq_start = size // 2 // MiB * MiB
+        total = 2 * seq_size + 2 * random_ops * PAGE
+        progress = Progress("bench", total)
+        result = {"size": size}
+
+        def timed(phase, ops):
+            start = time.monotonic()
+            done = 0
+            for nbytes in ops:
+                done += nbytes
+                progress.add(nbytes, test=phase)
+                if time.monotonic() - start > time_limit:
+                    break
+            return done, max(time.monotonic() - start, 1e-6)
+
+        # Sequential read, keeping the data for the write test
+        chunks = []
+
+        def seq_read():
+            for offset in range(seq_start, seq_start + seq_size, CHUNK):
+                chunks.append((offset, read_at(fd, CHUNK, offset)))
+                yield CHUNK
+
+        nbytes, seconds = timed("seq_read", seq_read())
+        result["seq_read_mbps"] = round(nbytes / seconds / MB, 1)
+
+        def seq_write():
+            for offset, data in chunks:
+                os.pwritev(fd, [aligned(data)], offset)
+                yield CHUNK
+            # Runs inside the timed loop, so the flush counts towards the result
+            os.fdatasync(fd)
+
+        nbytes, seconds = timed("seq_write", seq_write())
+        os.fdatasync(fd)
+        result["seq_write_mbps"] = round(nbytes / seconds / MB, 1)
+
+        # 4K random I/O over the whole device
+        rng = random.Random(size)
+        offsets = [rng.randrange(size // PAGE) * PAGE for _ in range(random_ops)]
+        pages = []
+
+        def rand_read():
+            for offset in offsets:
+                pages.append((offset, read_at(fd, PAGE, offset)))
+                yield PAGE
+
+        count, seconds = timed("rand_read", rand_read())
+        result["rand_read_iops"] = round(count / PAGE / seconds)
+
+        def rand_write():
+            for offset, data in pages:
+                os.pwritev(fd, [aligned(data)], offset)
+                os.fdatasync(fd)
+                yield PAGE
+
+        count, seconds = timed("rand_write", rand_write())
+        result["rand_write_iops"] = round(count / PAGE / seconds)
+
+        emit("result", **result)
+    finally:
+        os.close(fd)
+
+
+# =====================================================
+#  Command broker
+# =====================================================
+
+# Programs the broker may run; the same tools the GUI runs through pkexec
+BROKER_PROGRAMS = {
+    "umount",
+    "parted",
+    "udevadm",
+    "mkfs.vfat",
+    "mkfs.exfat",
+    "mkfs.ntfs",
+    "mkfs.ext4",
+}
+
+# The only directories the broker takes those programs from. A request names
+# a program by its bare name or its path in one of these directories.
+BROKER_PATH = ("/usr/sbin", "/usr/bin", "/sbin", "/bin")
+
+
+# Returns {name: absolute path} of the allowed programs that are installed
+def broker_programs():
+    programs = {}
+    for name in BROKER_PROGRAMS:
+        path = shutil.which(name, path=os.pathsep.join(BROKER_PATH))
+        if path:
+            programs[name] = path
+    return programs
+
+
+# Returns the path to run for a requested argv[0], or None if not allowed
+def broker_resolve(programs, program):
+    name = os.path.basename(program)
+    if name not in programs:
+        return None
+    if program != name and program not in [os.path.join(d, name) for d in BROKER_PATH]:
+        return None
+    return programs[name]
+
+
+# Runs commands for the GUI as root, so a batch needs one authorization.
+#
+# Reads {"id": n, "argv": [...]} lines from stdin and runs them concurrently,
+# answering each with an "exec" event carrying id, returncode, stdout and
+# stderr. {"id": n, "helper": [command, ...]} runs a command of this helper
+# instead; its event lines are forwarded as {"event": "output", "id", "line"}
+# before the "exec" event, and {"id": n, "input": text} writes to its control
+# channel. Closing stdin ends the broker once running commands finish.
+def broker():
+    workers = []
+    programs = broker_programs()
+    helpers = {}  # request id -> running helper command
+
+    def run(request):
+        reply = {"id": request.get("id"), "returncode": 127, "stdout": ""}
+        argv = request.get("argv") or []
+        valid = argv and all(isinstance(arg, str) for arg in argv)
+        path = broker_resolve(programs, argv[0]) if valid else None
+        if not path:
+            reply["stderr"] = f"Not allowed: {' '.join(map(str, argv))}"
+        else:
+            try:
+                process = subprocess.run(
+                    [path] + argv[1:], capture_output=True, text=True
+                )
+                reply.update(
+                    returncode=process.returncode,
+                    stdout=process.stdout,
+                    stderr=process.stderr,
+                )
+            except OSError as e:
+                reply["stderr"] = str(e)
+        emit("exec", **reply)
+
+    def start_helper(request):
+        args = request.get("helper")
+        valid = args and all(isinstance(arg, str) for arg in args)
+        if not valid or args[0] == "broker":
+            reply = {"id": request.get("id"), "returncode": 127, "stdout": ""}
+            emit("exec", stderr=f"Not allowed: helper {args}", **reply)
+            return None
+        # Started here rather than on the worker, so input sent right after
+        # the request finds it
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)] + args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        helpers[request.get("id")] = process
+        return process
+
+    def run_helper(request, process):
+        stderr = []
+        reader = threading.Thread(
+            target=lambda: stderr.append(process.stderr.read()), daemon=True
+        )
+        reader.start()
+        for line in process.stdout:
+            emit("output", id=request.get("id"), line=line.rstrip("\n"))
+        process.wait()
+        reader.join()
+        # Closing its stdin earlier would have cancelled the command
+        process.stdin.close()
+        emit(
+            "exec",
+            id=request.get("id"),
+            returncode=process.returncode,
+            stdout="",
+            stderr="".join(stderr),
+        )
+
+    for line in sys.stdin:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            continue
+        if "input" in request:
+            process = helpers.get(request.get("id"))
+            if process and process.poll() is None:
+                try:
+                    process.stdin.write(str(request["input"]))
+                    process.stdin.flush()
+                except (OSError, ValueError):
+                    pass
+            continue
+        if "helper" in request:
+            process = start_helper(request)
+            if not process:
+                continue
+            worker = threading.Thread(
+                target=run_helper, args=(request, process), daemon=True
+            )
+        else:
+            worker = threading.Thread(target=run, args=(request,), daemon=True)
+        worker.start()
+        workers.append(worker)
+
+    for worker in workers:
+        worker.join()
+    emit("result", commands=len(workers))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="blockio.py")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan = commands.add_parser("scan", help="destructive surface scan")
+    scan.add_argument("--mode", choices=["quick", "full"], default="quick")
+    scan.add_argument("device")
+
+    write = commands.add_parser("write", help="write an image to a device")
+    write.add_argument(
+        "--durability", choices=["sync", "periodic", "final"], default="periodic"
+    )
+    write.add_argument(
+        "--flush-every", type=int, default=64, help="MiB between periodic flushes"
+    )
+    write.add_argument(
+        "--await-commit",
+        action="store_true",
+        help='wait for "commit" on stdin before the final flush',
+    )
+    write.add_argument("source")
+    write.add_argument("device")
+
+    verify = commands.add_parser("verify", help="compare a device with an image")
+    verify.add_argument("source")
+    verify.add_argument("device")
+
+    clone = commands.add_parser("clone", help="copy one drive to many")
+    clone.add_argument("source")
+    clone.add_argument("targets", nargs="+")
+
+    discard = commands.add_parser("discard", help="discard every block (TRIM)")
+    discard.add_argument("device")
+
+    probe = commands.add_parser("probe", help="estimate the erase block size")
+    probe.add_argument("device")
+
+    bench = commands.add_parser("bench", help="non-destructive benchmark")
+    bench.add_argument("device")
+
+    commands.add_parser("broker", help="run commands for the GUI as root")
+
+    args = parser.parse_args(argv)
+    if args.command != "broker":
+        # The broker reads its requests from stdin itself
+        threading.Thread(target=watch_control, daemon=True).start()
+    # Tells the GUI that authorization is over and the command is running
+    emit("started", command=args.command)
+    try:
+        if args.command == "scan":
+            surface_scan(args.device, args.mode)
+        elif args.command == "write":
+            write_image(
+                args.source,
+                args.device,
+                args.durability,
+                args.flush_every * MiB,
+                args.await_commit,
+            )
+        elif args.command == "verify":
+            verify_image(args.source, args.device)
+        elif args.command == "clone":
+            clone_drive(args.source, args.targets)
+        elif args.command == "discard":
+            discard_device(args.device)
+        elif args.command == "probe":
+            probe_erase_block(args.device)
+        elif args.command == "bench":
+            benchmark(args.device)
+        elif args.command == "broker":
+            broker()
+    except Cancelled:
+        if ABORT.is_set():
+            emit("error", message="Image rejected, the start of the drive was wiped")
+        else:
+            emit("error", message="Cancelled")
+        return 130
+    except Exception as e:
+        emit("error", message=str(e))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
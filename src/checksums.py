@@ -0,0 +1,210 @@
+"""
+    Tuxus - ISO burning & USB drive formatting app for Linux
+    Copyright © 2025 santofrancesco
+    Full notice can be found on https://www.github.com/santofrancesco/tuxus/blob/main/LICENSE
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# Image pre-flight: finds the checksum an image was published with and
+# checks the image against it on a background thread.
+#
+# Sources, in order: sidecar files next to the image (x.iso.sha256,
+# SHA256SUMS, x.md5, Fedora-style CHECKSUM, ...) and the MD5 that
+# implantisomd5 embeds in the ISO 9660 volume descriptor.
+
+import hashlib, os, re, threading
+
+CHUNK = 4 * 1024 * 1024
+
+# Sidecar names per algorithm; {name} is the image file name, {stem} the
+# name without extension
+SIDECARS = {
+    "sha512": ["{name}.sha512", "{stem}.sha512", "SHA512SUMS", "sha512sum.txt"],
+    "sha256": [
+        "{name}.sha256",
+        "{name}.sha256sum",
+        "{stem}.sha256",
+        "SHA256SUMS",
+        "sha256sum.txt",
+        "SHA256SUMS.txt",
+    ],
+    "sha1": ["{name}.sha1", "{stem}.sha1", "SHA1SUMS"],
+    "md5": ["{name}.md5", "{stem}.md5", "MD5SUMS", "md5sum.txt"],
+}
+
+# Files listing several algorithms, e.g. "SHA256 (x.iso) = ..." lines
+MIXED_SIDECARS = ["CHECKSUM", "{stem}-CHECKSUM", "CHECKSUMS"]
+
+DIGEST_LENGTHS = {32: "md5", 40: "sha1", 64: "sha256", 128: "sha512"}
+
+# "hash  name", "hash *name" (GNU) and "ALGO (name) = hash" (BSD)
+GNU_LINE = re.compile(r"^\\?([0-9a-fA-F]{32,128})\s+\*?(.+?)\s*$")
+BSD_LINE = re.compile(r"^(\w+)\s*\((.+)\)\s*=\s*([0-9a-fA-F]{32,128})\s*$")
+
+# implantisomd5 layout: application use area of the primary volume
+# descriptor, which is hashed as spaces
+SECTOR = 2048
+PVD_OFFSET = 16 * SECTOR
+APPDATA_OFFSET = PVD_OFFSET + 883
+APPDATA_SIZE = 512
+
+
+# Returns the expected digest of image from a checksum file, or None
+def parse_checksum_file(path, image, algo=None):
+    name = os.path.basename(image)
+    try:
+        with open(path, errors="replace") as f:
+            lines = f.read(1024 * 1024).splitlines()
+    except OSError:
+        return None
+
+    for line in lines:
+        line = line.strip()
+        bsd = BSD_LINE.match(line)
+        if bsd:
+            line_algo = bsd.group(1).lower().replace("-", "")
+            if os.path.basename(bsd.group(2)) == name and line_algo == algo:
+                return bsd.group(3).lower()
+            continue
+        gnu = GNU_LINE.match(line)
+        if gnu and os.path.basename(gnu.group(2)) == name:
+            if DIGEST_LENGTHS.get(len(gnu.group(1))) == algo:
+                return gnu.group(1).lower()
+
+    # A sidecar made for this one image may hold just the digest
+    if len(lines) == 1 and lines[0].strip() and " " not in lines[0].strip():
+        digest = lines[0].strip().lower()
+        if DIGEST_LENGTHS.get(len(digest)) == algo:
+            return digest
+    return None
+
+
+# Returns {"algo", "expected", "source"} from a sidecar next to image, or None
+def find_sidecar(image):
+    folder = os.path.dirname(os.path.abspath(image))
+    name = os.path.basename(image)
+    stem = os.path.splitext(name)[0]
+
+    for algo, patterns in SIDECARS.items():
+        for pattern in patterns:
+            path = os.path.join(folder, pattern.format(name=name, stem=stem))
+            expected = parse_checksum_file(path, image, algo)
+            if expected:
+                return {"algo": algo, "expected": expected, "source": path}
+
+    for pattern in MIXED_SIDECARS:
+        path = os.path.join(folder, pattern.format(name=name, stem=stem))
+        for algo in SIDECARS:
+            expected = parse_checksum_file(path, image, algo)
+            if expected:
+                return {"algo": algo, "expected": expected, "source": path}
+    return None
+
+
+# Returns {"algo": "isomd5", "expected", "length", "source"} for an ISO with
+# an implanted MD5 (implantisomd5), or None
+def find_implanted_md5(image):
+    try:
+        with open(image, "rb") as f:
+            f.seek(PVD_OFFSET)
+            pvd = f.read(SECTOR)
+    except OSError:
+        return None
+    if len(pvd) < SECTOR or pvd[0] != 1 or pvd[1:6] != b"CD001":
+        return None
+
+    appdata = pvd[883 : 883 + APPDATA_SIZE].decode("ascii", "replace")
+    fields = {}
+    for item in appdata.split(";"):
+        key, _, value = item.partition("=")
+        fields[key.strip().upper()] = value.strip()
+    expected = fields.get("ISO MD5SUM", "").lower()
+    if not re.fullmatch(r"[0-9a-f]{32}", expected):
+        return None
+
+    try:
+        skip = int(fields.get("SKIPSECTORS", "0"))
+    except ValueError:
+        skip = 0
+    volume_size = int.from_bytes(pvd[80:84], "little") * SECTOR
+    return {
+        "algo": "isomd5",
+        "expected": expected,
+        "length": volume_size - skip * SECTOR,
+        "source": "implanted ISO MD5",
+    }
+
+
+# Returns the checksum to check image against, or None if none is published
+def find_checksum(image):
+    return find_sidecar(image) or find_implanted_md5(image)
+
+
+# Hashes an image on a background thread as soon as it is created.
+#
+# done is set once the check finished; ok is then True, False (mismatch) or
+# None (the image could not be read). on_done(check) runs on the hashing
+# thread.
+class ImageCheck:
+    def __init__(self, image, checksum, on_done=None):
+        self.image = image
+        self.checksum = checksum
+        self.on_done = on_done
+        self.hashed = 0
+        self.total = checksum.get("length") or os.path.getsize(image)
+        self.ok = None
+        self.error = None
+        self.done = threading.Event()
+        self.stopped = threading.Event()
+        threading.Thread(target=self.run, name="tuxus-image-check", daemon=True).start()
+
+    @property
+    def fraction(self):
+        return self.hashed / max(self.total, 1)
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        algo = self.checksum["algo"]
+        digest = hashlib.new("md5" if algo == "isomd5" else algo)
+        try:
+            with open(self.image, "rb") as f:
+                while self.hashed < self.total and not self.stopped.is_set():
+                    data = f.read(min(CHUNK, self.total - self.hashed))
+                    if not data:
+                        break
+                    if algo == "isomd5":
+                        data = self.blank_appdata(data)
+                    digest.update(data)
+                    self.hashed += len(data)
+            if not self.stopped.is_set():
+                self.ok = digest.hexdigest() == self.checksum["expected"]
+        except OSError as e:
+            self.error = str(e)
+        self.done.set()
+        if self.on_done and not self.stopped.is_set():
+            self.on_done(self)
+
+    # implantisomd5 hashes its own application use area as spaces
+    def blank_appdata(self, data):
+        start, end = self.hashed, self.hashed + len(data)
+        if start >= APPDATA_OFFSET + APPDATA_SIZE or end <= APPDATA_OFFSET:
+            return data
+        data = bytearray(data)
+        low = max(APPDATA_OFFSET, start) - start
+        high = min(APPDATA_OFFSET + APPDATA_SIZE, end) - start
+        data[low:high] = b" " * (high - low)
+        return data
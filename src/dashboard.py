@@ -0,0 +1,228 @@
+"""
+    Tuxus - ISO burning & USB drive formatting app for Linux
+    Copyright © 2025 santofrancesco
+    Full notice can be found on https://www.github.com/santofrancesco/tuxus/blob/main/LICENSE
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# Jobs tab: every job of the JobManager as one row of a ListStore.
+#
+# Jobs publish an event for every status, progress and byte count change,
+# from many threads at once. Instead of one main loop callback per event,
+# events are coalesced per job on the way in and the model is refreshed at
+# most once per frame, so dozens of concurrent jobs cost a few row updates
+# per frame and nothing at all while idle.
+
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import Gtk, GLib
+import threading
+import logic, tracing
+
+# Milliseconds between model refreshes while events are arriving
+FRAME_MS = 16
+
+# Model columns
+(
+    COL_ID,
+    COL_DEVICE,
+    COL_OP,
+    COL_PHASE,
+    COL_PERCENT,
+    COL_PERCENT_TEXT,
+    COL_RATE,
+    COL_ETA,
+    COL_RESULT,
+) = range(9)
+
+RESULTS = {"done": "✅ Done", "failed": "❌ Failed", "cancelled": "Cancelled"}
+
+
+class JobsView(Gtk.Box):
+    def __init__(self, manager):
+        super().__init__(orientation=Gtk.Orientation.VERTICAL, spacing=5)
+        self.set_border_width(15)
+        self.manager = manager
+
+        self.store = Gtk.ListStore(int, str, str, str, int, str, str, str, str)
+        self.rows = {}  # job id -> TreeIter (ListStore iters stay valid)
+
+        self.view = Gtk.TreeView(model=self.store)
+        self.view.set_fixed_height_mode(True)
+        columns = (
+            ("#", COL_ID, 40),
+            ("Device", COL_DEVICE, 90),
+            ("Operation", COL_OP, 80),
+            ("Phase", COL_PHASE, 140),
+            ("MB/s", COL_RATE, 60),
+            ("ETA", COL_ETA, 60),
+            ("Result", COL_RESULT, 200),
+        )
+        for title, column, width in columns:
+            view_column = Gtk.TreeViewColumn(title, Gtk.CellRendererText(), text=column)
+            self._fixed(view_column, width)
+            self.view.append_column(view_column)
+            if column == COL_PHASE:
+                progress = Gtk.TreeViewColumn(
+                    "Progress",
+                    Gtk.CellRendererProgress(),
+                    value=COL_PERCENT,
+                    text=COL_PERCENT_TEXT,
+                )
+                self._fixed(progress, 120)
+                self.view.append_column(progress)
+
+        scroller = Gtk.ScrolledWindow()
+        scroller.set_vexpand(True)
+        scroller.add(self.view)
+        self.pack_start(scroller, True, True, 0)
+
+        buttons = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        buttons.set_halign(Gtk.Align.END)
+        cancel_button = Gtk.Button(label="Cancel job")
+        cancel_button.connect("clicked", self.on_cancel_clicked)
+        buttons.pack_start(cancel_button, False, False, 0)
+        clear_button = Gtk.Button(label="Clear finished")
+        clear_button.connect("clicked", self.on_clear_clicked)
+        buttons.pack_start(clear_button, False, False, 0)
+        self.pack_start(buttons, False, False, 0)
+
+        self.summary = Gtk.Label(label="No jobs")
+        self.summary.set_xalign(0)
+        self.pack_start(self.summary, False, False, 0)
+
+        # Latest state per job id, waiting for the next refresh
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.scheduled = False
+
+        events = manager.subscribe()
+        for job in manager.list():
+            self.queue(job.id, job.to_dict())
+        threading.Thread(target=self.pump, args=(events,), daemon=True).start()
+
+    # Fixed-size columns let the view skip measuring every row
+    @staticmethod
+    def _fixed(column, width):
+        column.set_sizing(Gtk.TreeViewColumnSizing.FIXED)
+        column.set_fixed_width(width)
+        column.set_resizable(True)
+
+    # =====================================================
+    #  Event batching
+    # =====================================================
+
+    def pump(self, events):
+        while True:
+            event = events.get()
+            if event.get("event") == "job":
+                self.queue(event["job"]["id"], event["job"])
+            elif event.get("event") == "cleared":
+                for job_id in event["jobs"]:
+                    self.queue(job_id, None)
+
+    # Keeps the newest state of a job (None once it was cleared) and
+    # schedules one refresh per frame
+    def queue(self, job_id, job):
+        with self.lock:
+            self.pending[job_id] = job
+            if self.scheduled:
+                return
+            self.scheduled = True
+        GLib.timeout_add(FRAME_MS, tracing.dispatch(self.refresh))
+
+    def refresh(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.scheduled = False
+        for job_id, job in pending.items():
+            if job is None:
+                row = self.rows.pop(job_id, None)
+                if row is not None:
+                    self.store.remove(row)
+            else:
+                self.apply(job)
+        self.update_summary()
+        return False
+
+    # =====================================================
+    #  Model
+    # =====================================================
+
+    def apply(self, job):
+        state = job["state"]
+        running = state == "running"
+        if running:
+            phase = job["phase"] or "running"
+        else:
+            phase = "queued" if state == "queued" else ""
+
+        fraction = job["fraction"] if state != "done" else 1.0
+        rate = job["rate_mbps"] if running and job["phase"] else 0
+        eta = job["eta"] if running else None
+
+        result = RESULTS.get(state, "")
+        if state in ("failed", "cancelled") and job["message"]:
+            result += f": {job['message'].splitlines()[0]}"
+        elif running and job["message"]:
+            result = job["message"].splitlines()[0]
+
+        values = {
+            COL_ID: job["id"],
+            COL_DEVICE: job["device"] or "",
+            COL_OP: job["op"],
+            COL_PHASE: phase,
+            COL_PERCENT: int(fraction * 100),
+            COL_PERCENT_TEXT: f"{fraction:.0%}",
+            COL_RATE: f"{rate:.1f}" if rate else "",
+            COL_ETA: logic.human_duration(eta) if eta is not None else "",
+            COL_RESULT: result,
+        }
+        row = self.rows.get(job["id"])
+        if row is None:
+            self.rows[job["id"]] = self.store.append(list(values.values()))
+        else:
+            # One set() per row, and only of the columns that changed
+            changed = []
+            for column, value in values.items():
+                if self.store.get_value(row, column) != value:
+                    changed += [column, value]
+            if changed:
+                self.store.set(row, *changed)
+
+    def update_summary(self):
+        states = [job.state for job in self.manager.list()]
+        running = states.count("running")
+        queued = states.count("queued")
+        finished = len(states) - running - queued
+        if not states:
+            self.summary.set_text("No jobs")
+        else:
+            self.summary.set_text(
+                f"{running} running, {queued} queued, {finished} finished"
+            )
+
+    def on_cancel_clicked(self, button):
+        model, row = self.view.get_selection().get_selected()
+        if row is not None:
+            try:
+                self.manager.cancel(model[row][COL_ID])
+            except ValueError:
+                pass
+
+    # Forgets finished jobs; their rows go with the "cleared" event
+    def on_clear_clicked(self, button):
+        self.manager.clear_finished()
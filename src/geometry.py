@@ -0,0 +1,204 @@
+"""
+    Tuxus - ISO burning & USB drive formatting app for Linux
+    Copyright © 2025 santofrancesco
+    Full notice can be found on https://www.github.com/santofrancesco/tuxus/blob/main/LICENSE
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# Flash-friendly partition and filesystem geometry.
+#
+# Flash erases in blocks of 1-16 MiB. A partition or cluster that straddles
+# an erase block boundary turns one write into a read-modify-write of two
+# blocks, which halves sustained write speed on cheap sticks. The planner
+# works out the erase block size and lays out the partition, clusters and
+# filesystem metadata on its boundaries.
+
+import os
+
+KiB = 1024
+MiB = 1024 * 1024
+
+SYSFS_BLOCK = "/sys/class/block"
+
+# Assumed when nothing better is known: a multiple of the erase block of
+# nearly every USB stick and SD card, and what SD card formatters use
+DEFAULT_ERASE_BLOCK = 4 * MiB
+
+# Erase block sizes worth believing; anything else is a reporting quirk
+MIN_ERASE_BLOCK = 128 * KiB
+MAX_ERASE_BLOCK = 32 * MiB
+
+# Left free at the end of the device for a GPT backup header
+GPT_BACKUP = 64 * KiB
+
+# FAT32 needs at least this many clusters
+FAT32_MIN_CLUSTERS = 65525
+
+
+def _read_int(path):
+    try:
+        with open(path) as f:
+            return int(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _power_of_two(n):
+    return n > 0 and n & (n - 1) == 0
+
+
+# Returns the queue limits of a block device from sysfs, in bytes:
+# size, logical/physical block size, minimum/optimal I/O size, discard
+# granularity and, for SD cards, the preferred erase size
+def device_limits(device_path):
+    name = os.path.basename(os.path.realpath(device_path))
+    base = os.path.join(SYSFS_BLOCK, name)
+    queue = os.path.join(base, "queue")
+
+    def queue_int(attr):
+        return _read_int(os.path.join(queue, attr)) or 0
+
+    sectors = _read_int(os.path.join(base, "size")) or 0
+    return {
+        "size": sectors * 512,
+        "logical_block_size": queue_int("logical_block_size") or 512,
+        "physical_block_size": queue_int("physical_block_size") or 512,
+        "minimum_io_size": queue_int("minimum_io_size"),
+        "optimal_io_size": queue_int("optimal_io_size"),
+        "discard_granularity": queue_int("discard_granularity"),
+        "preferred_erase_size": _read_int(
+            os.path.join(base, "device", "preferred_erase_size")
+        )
+        or 0,
+    }
+
+
+# Picks the erase block size and says where it came from. A probed size
+# (blockio.py probe) wins, then what the device itself reports.
+def erase_block(limits, probed=None):
+    candidates = [
+        (probed, "measured"),
+        (limits["preferred_erase_size"], "SD card erase size"),
+        (limits["discard_granularity"], "discard granularity"),
+        (limits["optimal_io_size"], "optimal I/O size"),
+    ]
+    for size, source in candidates:
+        if not size or not _power_of_two(size):
+            continue
+        if MIN_ERASE_BLOCK <= size <= MAX_ERASE_BLOCK:
+            return size, source
+    return DEFAULT_ERASE_BLOCK, "default"
+
+
+# Largest cluster size giving FAT32 enough clusters for the volume
+def _fat32_cluster(size):
+    for cluster in (32 * KiB, 16 * KiB, 8 * KiB, 4 * KiB, 2 * KiB, 1 * KiB):
+        if size // cluster >= FAT32_MIN_CLUSTERS * 1.02:
+            return cluster
+    return 512
+
+
+# Recommended cluster (block) size: large enough to cover a flash page,
+# small enough not to waste space on small files
+def recommended_cluster(fs, size, erase):
+    if fs == "FAT32":
+        cluster = _fat32_cluster(size)
+    elif fs == "exFAT":
+        if size <= 256 * MiB:
+            cluster = 4 * KiB
+        elif size <= 32 * 1024 * MiB:
+            cluster = 32 * KiB
+        else:
+            cluster = 64 * KiB
+    elif fs == "NTFS":
+        cluster = 4 * KiB
+    else:
+        cluster = 4 * KiB
+    return min(cluster, erase)
+
+
+# Plans the layout of a fresh filesystem on a device.
+#
+# Returns a dict with:
+#   erase_block, erase_source   assumed erase block size and its origin
+#   start, end                  partition byte range [start, end), both on
+#                               erase block boundaries
+#   cluster_size                recommended cluster/block size
+#   mkfs_args                   alignment options for mkfs, given the
+#                               cluster size actually used
+#   summary                     one line for the GUI
+def plan(device_path, fs, size_limit=None, probed=None, cluster_size=None):
+    limits = device_limits(device_path)
+    erase, source = erase_block(limits, probed)
+    size = limits["size"]
+    if size_limit:
+        size = min(size, size_limit) if size else size_limit
+
+    # First erase block holds the partition table; a full erase block keeps
+    # every later structure on a boundary, 1 MiB is what everyone else uses
+    start = max(erase, 1 * MiB)
+    end = (size - GPT_BACKUP) // erase * erase
+    usable = max(end - start, 0)
+
+    recommended = recommended_cluster(fs, usable, erase)
+    cluster = int(cluster_size or recommended)
+    return {
+        "fs": fs,
+        "erase_block": erase,
+        "erase_source": source,
+        "start": start,
+        "end": end,
+        "cluster_size": recommended,
+        "mkfs_args": mkfs_args(fs, cluster, erase, limits["logical_block_size"]),
+        "summary": summary(fs, erase, source, start, recommended),
+    }
+
+
+# mkfs options that put filesystem metadata and data on erase block
+# boundaries, relative to an erase block aligned partition start
+def mkfs_args(fs, cluster_size, erase, sector_size=512):
+    if fs == "FAT32":
+        # Reserved sectors up to the next erase block put the FATs on a
+        # boundary; mkfs.vfat then pads the FATs to whole clusters
+        return ["-R", str(min(erase // sector_size, 65535))]
+    if fs == "exFAT":
+        # Cluster heap starts on an erase block boundary
+        return ["-b", str(erase)]
+    if fs == "ext4":
+        # RAID-style hints make the allocator write whole erase blocks
+        stride = max(erase // cluster_size, 1)
+        return ["-E", f"stride={stride},stripe_width={stride}"]
+    # mkfs.ntfs has no alignment options; the partition start does it
+    return []
+
+
+def _size_text(nbytes):
+    if nbytes >= MiB:
+        return f"{nbytes // MiB} MiB"
+    if nbytes >= KiB:
+        return f"{nbytes // KiB} KiB"
+    return f"{nbytes} bytes"
+
+
+def summary(fs, erase, source, start, cluster):
+    text = (
+        f"Erase block {_size_text(erase)} ({source}): partition at "
+        f"{_size_text(start)}, {_size_text(cluster)} clusters"
+    )
+    if fs in ("FAT32", "exFAT"):
+        text += ", metadata aligned"
+    elif fs == "ext4":
+        text += ", stride aligned"
+    return text
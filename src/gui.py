@@ -21,15 +21,19 @@ import gi
 
 gi.require_version("Gtk", "3.0")
 from gi.repository import Gtk, GLib
+import os
 import threading
-import logic
+import dashboard, geometry, logic
+from jobs import JobManager, JobProgress
 
 # Main application window with tabs for burning, formatting, and verifying hashes
 class Tuxus(Gtk.Window):
 
-    # Initialize window and build UI layout
-    def __init__(self):
+    # Initialize window and build UI layout. jobs is the JobManager shown in
+    # the Jobs tab (shared with the local API when it runs).
+    def __init__(self, jobs=None):
         super().__init__(title="Tuxus")
+        self.jobs = jobs or JobManager()
 
         # Define window size
         self.set_border_width(10)
@@ -73,6 +77,16 @@ class Tuxus(Gtk.Window):
         refresh_burn_btn.set_image(icon)
         refresh_burn_btn.connect("clicked", self.on_refresh_burn)
         drive_row.pack_start(refresh_burn_btn, False, False, 0)
+
+        # Benchmark button: measures the drive and stores it in the history
+        self.benchmark_button = Gtk.Button()
+        self.benchmark_button.set_tooltip_text("Benchmark drive speed")
+        bench_icon = Gtk.Image.new_from_icon_name(
+            "utilities-system-monitor-symbolic", Gtk.IconSize.BUTTON
+        )
+        self.benchmark_button.set_image(bench_icon)
+        self.benchmark_button.connect("clicked", self.on_benchmark_clicked)
+        drive_row.pack_start(self.benchmark_button, False, False, 0)
         drive_row.set_margin_bottom(20)
         burn_tab.pack_start(drive_row, False, False, 0)
 
@@ -89,7 +103,27 @@ class Tuxus(Gtk.Window):
         self.iso_button.set_margin_bottom(20)
         burn_tab.pack_start(self.iso_button, False, False, 0)
 
+        # Durability mode
+        durability_label = Gtk.Label()
+        durability_label.set_markup("<b>Write mode:</b>")
+        durability_label.set_xalign(0)
+        burn_tab.pack_start(durability_label, False, False, 5)
+
+        self.durability_combo = Gtk.ComboBoxText()
+        for mode, text in logic.DURABILITY_MODES.items():
+            self.durability_combo.append(mode, text)
+        self.durability_combo.set_active_id("periodic")
+        burn_tab.pack_start(self.durability_combo, False, False, 0)
+
+        self.burn_discard_check = Gtk.CheckButton(label="Discard drive first (TRIM)")
+        self.burn_discard_check.set_tooltip_text(
+            "Tells the drive all old data is free before writing, which makes "
+            "writes faster on many sticks and SD cards. Skipped if unsupported."
+        )
+        burn_tab.pack_start(self.burn_discard_check, False, False, 5)
+
         # Connect signals for validation
+        self.iso_button.connect("file-set", self.on_iso_selected)
         self.iso_button.connect("file-set", self.check_burn_ready)
         self.drive_combo.connect("changed", self.check_burn_ready)
 
@@ -101,6 +135,27 @@ class Tuxus(Gtk.Window):
         self.start_button.connect("clicked", self.on_start_clicked)
         burn_tab.pack_start(self.start_button, False, False, 0)
 
+        # Background burn: runs as a job so several drives can burn at once
+        self.queue_button = Gtk.Button(label="Run in background")
+        self.queue_button.set_relief(Gtk.ReliefStyle.NONE)
+        self.queue_button.set_halign(Gtk.Align.CENTER)
+        self.queue_button.set_sensitive(False)
+        self.queue_button.set_tooltip_text(
+            "Burn as a background job and follow it in the Jobs tab"
+        )
+        self.queue_button.connect("clicked", self.on_queue_burn_clicked)
+        burn_tab.pack_start(self.queue_button, False, False, 0)
+
+        # Drive duplication button
+        duplicate_button = Gtk.Button(label="Duplicate a drive...")
+        duplicate_button.set_relief(Gtk.ReliefStyle.NONE)
+        duplicate_button.set_halign(Gtk.Align.CENTER)
+        duplicate_button.set_tooltip_text(
+            "Copy a master drive straight onto several other drives"
+        )
+        duplicate_button.connect("clicked", self.on_duplicate_clicked)
+        burn_tab.pack_start(duplicate_button, False, False, 0)
+
         # Progress bar
         self.progressbar = Gtk.ProgressBar()
         self.progressbar.set_show_text(True)
@@ -180,16 +235,74 @@ class Tuxus(Gtk.Window):
         cluster_column.pack_start(cluster_label, False, False, 0)
 
         self.format_cluster_combo = Gtk.ComboBoxText()
+        self.format_cluster_combo.set_tooltip_text(
+            "Default: the flash geometry's recommendation when aligning, "
+            "otherwise 4096"
+        )
+        self.format_cluster_combo.append_text("Default")
         for size in ["512", "1024", "2048", "4096", "8192", "16384", "32768", "65536"]:
             self.format_cluster_combo.append_text(size)
-        # Set default value to 4096
-        self.format_cluster_combo.set_active(3)
+        self.format_cluster_combo.set_active(0)
         cluster_column.pack_start(self.format_cluster_combo, False, False, 5)
         fs_cluster_row.pack_start(cluster_column, False, False, 0)
 
         # Add the row to the format tab
         format_tab.pack_start(fs_cluster_row, False, False, 15)
 
+        # Optional surface scan before formatting
+        scan_row = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        scan_row.set_halign(Gtk.Align.CENTER)
+
+        scan_label = Gtk.Label()
+        scan_label.set_markup("<b>Surface scan:</b>")
+        scan_row.pack_start(scan_label, False, False, 0)
+
+        self.format_scan_combo = Gtk.ComboBoxText()
+        self.format_scan_combo.set_tooltip_text(
+            "Writes and reads back a test pattern before formatting to detect "
+            "bad blocks and fake capacity"
+        )
+        self.format_scan_combo.append("", "Off")
+        self.format_scan_combo.append("quick", "Quick capacity check")
+        self.format_scan_combo.append("full", "Full surface scan")
+        self.format_scan_combo.set_active(0)
+        scan_row.pack_start(self.format_scan_combo, False, False, 0)
+
+        self.format_discard_check = Gtk.CheckButton(label="Discard first (TRIM)")
+        self.format_discard_check.set_tooltip_text(
+            "Discards all old data before formatting so the drive starts clean "
+            "and mkfs can skip its own discard. Skipped if unsupported."
+        )
+        scan_row.pack_start(self.format_discard_check, False, False, 0)
+
+        format_tab.pack_start(scan_row, False, False, 0)
+
+        # Flash geometry: align partition and filesystem to erase blocks
+        geometry_row = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        geometry_row.set_halign(Gtk.Align.CENTER)
+
+        self.format_align_check = Gtk.CheckButton(label="Align to flash erase blocks")
+        self.format_align_check.set_active(True)
+        self.format_align_check.set_tooltip_text(
+            "Starts the partition and lays out clusters and filesystem metadata "
+            "on erase block boundaries, avoiding slow read-modify-write cycles"
+        )
+        self.format_align_check.connect("toggled", self.update_geometry)
+        geometry_row.pack_start(self.format_align_check, False, False, 0)
+
+        self.format_probe_check = Gtk.CheckButton(label="Measure erase block")
+        self.format_probe_check.set_tooltip_text(
+            "Measures the erase block size from read timings once the format "
+            "is confirmed, instead of trusting what the drive reports"
+        )
+        geometry_row.pack_start(self.format_probe_check, False, False, 0)
+
+        format_tab.pack_start(geometry_row, False, False, 0)
+
+        self.format_geometry_label = Gtk.Label()
+        self.format_geometry_label.set_line_wrap(True)
+        format_tab.pack_start(self.format_geometry_label, False, False, 0)
+
         # Connect signals
         self.format_drive_combo.connect("changed", self.on_format_drive_selected)
         self.format_drive_combo.connect("changed", self.check_format_ready)
@@ -204,6 +317,16 @@ class Tuxus(Gtk.Window):
         self.format_button.connect("clicked", self.on_format_clicked)
         format_tab.pack_start(self.format_button, False, False, 0)
 
+        # Batch format button
+        batch_button = Gtk.Button(label="Batch format...")
+        batch_button.set_relief(Gtk.ReliefStyle.NONE)
+        batch_button.set_halign(Gtk.Align.CENTER)
+        batch_button.set_tooltip_text(
+            "Format several drives at once with the filesystem and cluster size above"
+        )
+        batch_button.connect("clicked", self.on_batch_format_clicked)
+        format_tab.pack_start(batch_button, False, False, 0)
+
         # Format progress bar
         self.format_progressbar = Gtk.ProgressBar()
         self.format_progressbar.set_show_text(False)
@@ -289,6 +412,12 @@ class Tuxus(Gtk.Window):
 
         notebook.append_page(verify_tab, Gtk.Label(label="Verify hash"))
 
+        # =====================================================
+        # TAB 4: Jobs
+        # =====================================================
+        self.jobs_view = dashboard.JobsView(self.jobs)
+        notebook.append_page(self.jobs_view, Gtk.Label(label="Jobs"))
+
         # Footer area box
         footer_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
         footer_box.set_halign(Gtk.Align.CENTER)
@@ -314,16 +443,44 @@ class Tuxus(Gtk.Window):
     #  Handlers
     # =====================================================
 
+    # Returns size of the selected ISO, or None if none is selected
+    def burn_image_size(self):
+        iso_path = self.iso_button.get_filename()
+        return os.path.getsize(iso_path) if iso_path else None
+
     # Refreshes the list of drives in the Burn ISO tab
     def on_refresh_burn(self, button):
-        logic.refresh_drives(self.drive_combo)
+        logic.refresh_drives(self.drive_combo, image_size=self.burn_image_size())
         self.check_burn_ready(None)
 
+    # Updates expected burn times once an ISO is chosen
+    def on_iso_selected(self, widget):
+        logic.refresh_drives(self.drive_combo, image_size=self.burn_image_size())
+
+    # Benchmarks the selected drive in a background thread
+    def on_benchmark_clicked(self, button):
+        drive_info = self.drive_combo.get_active_text()
+        if not drive_info or "No USB" in drive_info:
+            self.status.set_text("Please select a USB drive")
+            return
+
+        self.status.set_text("Benchmarking drive... please wait")
+        self.progressbar.set_fraction(0.0)
+
+        threading.Thread(
+            target=logic.benchmark_drive,
+            args=(drive_info, self.status, self.progressbar),
+            kwargs={"on_done": lambda: self.on_refresh_burn(None)},
+            daemon=True,
+        ).start()
+
     # Enables "Write to USB" button if both ISO and drive are selected
     def check_burn_ready(self, widget):
         iso_path = self.iso_button.get_filename()
         drive_info = self.drive_combo.get_active_text()
-        self.start_button.set_sensitive(logic.is_burn_ready(iso_path, drive_info))
+        ready = logic.is_burn_ready(iso_path, drive_info)
+        self.start_button.set_sensitive(ready)
+        self.queue_button.set_sensitive(ready)
 
     # Starts ISO writing process after confirmation
     def on_start_clicked(self, button):
@@ -373,9 +530,52 @@ class Tuxus(Gtk.Window):
         threading.Thread(
             target=logic.write_iso,
             args=(iso_path, drive_info, self.status, self.progressbar),
+            kwargs={
+                "durability": self.durability_combo.get_active_id(),
+                "discard": self.burn_discard_check.get_active(),
+            },
             daemon=True,
         ).start()
 
+    # Burns the selected image as a background job, shown in the Jobs tab
+    def on_queue_burn_clicked(self, button):
+        iso_path = self.iso_button.get_filename()
+        device = logic.extract_device_path(self.drive_combo.get_active_text() or "")
+        if not iso_path or not device:
+            self.status.set_text("Please select an ISO and USB drive")
+            return
+
+        dialog = Gtk.MessageDialog(
+            transient_for=self,
+            flags=0,
+            message_type=Gtk.MessageType.WARNING,
+            buttons=Gtk.ButtonsType.OK_CANCEL,
+            text="This will erase all data on the selected USB drive!",
+        )
+        dialog.format_secondary_text(
+            f"ISO file: {iso_path}\nUSB drive: {device}\n\n"
+            "The burn runs in the background; follow it in the Jobs tab."
+        )
+        response = dialog.run()
+        dialog.destroy()
+        if response != Gtk.ResponseType.OK:
+            self.status.set_text("ISO writing cancelled")
+            return
+
+        try:
+            job = self.jobs.submit(
+                "burn",
+                {
+                    "device": device,
+                    "image": iso_path,
+                    "durability": self.durability_combo.get_active_id(),
+                    "discard": self.burn_discard_check.get_active(),
+                },
+            )
+            self.status.set_text(f"Burn started as job {job.id} (see the Jobs tab)")
+        except ValueError as e:
+            self.status.set_text(str(e))
+
     # Updates label length limit and cluster size options when filesystem changes
     def on_fs_changed(self, combo):
         if not hasattr(self, "format_cluster_combo"):
@@ -406,18 +606,43 @@ class Tuxus(Gtk.Window):
         else:
             sizes = ["4096"]
 
-        # Add them back to the combo
+        # Add them back to the combo, after the default
+        self.format_cluster_combo.append_text("Default")
         for size in sizes:
             self.format_cluster_combo.append_text(size)
 
         # Reset width so it shrinks back when not exFAT
         self.format_cluster_combo.set_size_request(-1, -1)
 
-        # Set default
-        if "4096" in sizes:
-            self.format_cluster_combo.set_active(sizes.index("4096"))
-        else:
-            self.format_cluster_combo.set_active(0)
+        self.format_cluster_combo.set_active(0)
+
+        self.update_geometry()
+
+    # Shows the recommended flash geometry for the selected drive; its
+    # cluster size is what "Default" stands for
+    def update_geometry(self, widget=None):
+        if not hasattr(self, "format_geometry_label"):
+            return  # Tab not built yet
+
+        align = self.format_align_check.get_active()
+        self.format_probe_check.set_sensitive(align)
+        device = logic.extract_device_path(
+            self.format_drive_combo.get_active_text() or ""
+        )
+        fs = self.format_fs_combo.get_active_text()
+        if not device or not align:
+            self.format_geometry_label.set_text("")
+            return
+
+        plan = geometry.plan(device, fs)
+        self.format_geometry_label.set_markup(
+            f"<small>{GLib.markup_escape_text(plan['summary'])}</small>"
+        )
+
+    # Returns the selected cluster size, or None for the default
+    def format_cluster_size(self):
+        cluster = self.format_cluster_combo.get_active_text()
+        return None if cluster == "Default" else cluster
 
     # Refreshes the list of drives in the Format tab
     def on_refresh_format(self, button):
@@ -432,6 +657,7 @@ class Tuxus(Gtk.Window):
         drive = self.format_drives_map[idx]
         label = logic.get_vendor_model(drive["device"])
         self.format_label_entry.set_text(label)
+        self.update_geometry()
         self.check_format_ready(None)
 
     # Enables "Format Drive" if drive, label, and cluster size are valid
@@ -447,7 +673,10 @@ class Tuxus(Gtk.Window):
         drive_info = self.format_drive_combo.get_active_text()
         label = self.format_label_entry.get_text().strip() or "UNTITLED"
         fs = self.format_fs_combo.get_active_text()
-        cluster = self.format_cluster_combo.get_active_text()
+        cluster = self.format_cluster_size()
+        align = self.format_align_check.get_active()
+        probe = align and self.format_probe_check.get_active()
+        scan_mode = self.format_scan_combo.get_active_id() or None
 
         if not drive_info or "No USB" in drive_info:
             self.format_status.set_text("Please select a USB drive.")
@@ -461,8 +690,19 @@ class Tuxus(Gtk.Window):
             buttons=Gtk.ButtonsType.OK_CANCEL,
             text="This will erase all data on the selected drive! ⚠️",
         )
+        scan_text = (
+            f"\nSurface scan: {self.format_scan_combo.get_active_text()}"
+            if scan_mode
+            else ""
+        )
+        if self.format_discard_check.get_active():
+            scan_text += "\nDiscard (TRIM) before formatting"
+        if align:
+            scan_text += "\nAligned to flash erase blocks"
+        if probe:
+            scan_text += " (measured first)"
         dialog.format_secondary_text(
-            f"Drive: {drive_info}\nFilesystem: {fs}\nNew label: {label}\n\nDo you want to continue?"
+            f"Drive: {drive_info}\nFilesystem: {fs}\nNew label: {label}{scan_text}\n\nDo you want to continue?"
         )
         response = dialog.run()
         dialog.destroy()
@@ -499,10 +739,349 @@ class Tuxus(Gtk.Window):
                 cluster,
                 self.format_status,
                 self.format_progressbar,
+                scan_mode,
             ),
+            kwargs={
+                "discard": self.format_discard_check.get_active(),
+                "align": align,
+                "probe": probe,
+            },
             daemon=True,
         ).start()
 
+    # Opens the batch format dialog: pick drives, label scheme and concurrency
+    def on_batch_format_clicked(self, button):
+        fs = self.format_fs_combo.get_active_text()
+        cluster = self.format_cluster_size()
+        discard = self.format_discard_check.get_active()
+        align = self.format_align_check.get_active()
+        probe = align and self.format_probe_check.get_active()
+
+        dialog = Gtk.Dialog(title="Batch format", transient_for=self, modal=True)
+        dialog.add_button("Close", Gtk.ResponseType.CLOSE)
+        start_button = dialog.add_button("Format selected", Gtk.ResponseType.OK)
+        dialog.set_default_size(560, 380)
+
+        box = dialog.get_content_area()
+        box.set_spacing(8)
+        box.set_border_width(10)
+
+        settings = Gtk.Label()
+        settings.set_xalign(0)
+        settings.set_markup(
+            f"<b>Filesystem:</b> {fs}    <b>Cluster size:</b> {cluster or 'Default'}"
+        )
+        box.pack_start(settings, False, False, 0)
+
+        # Drive list: selected, device, description, status
+        store = Gtk.ListStore(bool, str, str, str)
+        for d in logic.list_usb_drives():
+            description = f"{d['label']} {d['model']} ({d['size']})".strip()
+            store.append([True, d["device"], description, ""])
+
+        view = Gtk.TreeView(model=store)
+        toggle = Gtk.CellRendererToggle()
+
+        def on_toggled(renderer, path):
+            store[path][0] = not store[path][0]
+
+        toggle.connect("toggled", on_toggled)
+        view.append_column(Gtk.TreeViewColumn("", toggle, active=0))
+        for title, column in (("Drive", 1), ("Model", 2), ("Status", 3)):
+            renderer = Gtk.CellRendererText()
+            view_column = Gtk.TreeViewColumn(title, renderer, text=column)
+            view_column.set_resizable(True)
+            view.append_column(view_column)
+
+        scroller = Gtk.ScrolledWindow()
+        scroller.set_vexpand(True)
+        scroller.add(view)
+        box.pack_start(scroller, True, True, 0)
+
+        # Label scheme and concurrency
+        options_row = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        scheme_label = Gtk.Label()
+        scheme_label.set_markup("<b>Label scheme:</b>")
+        options_row.pack_start(scheme_label, False, False, 0)
+        scheme_entry = Gtk.Entry()
+        scheme_entry.set_text("MYUSB_##")
+        scheme_entry.set_tooltip_text(
+            "# is replaced by the drive number, e.g. MYUSB_01"
+        )
+        options_row.pack_start(scheme_entry, True, True, 0)
+
+        concurrency_label = Gtk.Label()
+        concurrency_label.set_markup("<b>At once:</b>")
+        options_row.pack_start(concurrency_label, False, False, 0)
+        concurrency_spin = Gtk.SpinButton.new_with_range(1, 16, 1)
+        concurrency_spin.set_value(4)
+        options_row.pack_start(concurrency_spin, False, False, 0)
+        box.pack_start(options_row, False, False, 0)
+
+        summary = Gtk.Label(label="")
+        summary.set_xalign(0)
+        box.pack_start(summary, False, False, 0)
+
+        # Jobs tab rows of the running batch, by device
+        batch_jobs = {}
+
+        # Called in the main loop by logic.run_batch_format
+        def on_update(device, message):
+            for row in store:
+                if row[1] == device:
+                    row[3] = message.splitlines()[0] if message else ""
+            if device in batch_jobs:
+                batch_jobs[device].update(message=message)
+
+        running = [False]
+
+        def on_done(results):
+            running[0] = False
+            for device, success in results.items():
+                if device in batch_jobs:
+                    batch_jobs[device].finish(success)
+            batch_jobs.clear()
+            ok = sum(1 for success in results.values() if success)
+            failed = len(results) - ok
+            summary.set_markup(
+                f"<b>Batch finished:</b> {ok} formatted, {failed} failed"
+            )
+            start_button.set_sensitive(True)
+            self.on_refresh_format(None)
+
+        def on_response(dialog, response):
+            if running[0]:
+                return  # Keep the dialog open until the batch has finished
+            if response != Gtk.ResponseType.OK:
+                dialog.destroy()
+                return
+
+            devices = [row[1] for row in store if row[0]]
+            if not devices:
+                summary.set_text("Select at least one drive.")
+                return
+            try:
+                scheme = scheme_entry.get_text().strip() or "UNTITLED_##"
+                first = logic.batch_label(scheme, 1, fs)
+                last = logic.batch_label(scheme, len(devices), fs)
+            except ValueError as e:
+                summary.set_text(str(e))
+                return
+
+            confirm = Gtk.MessageDialog(
+                transient_for=dialog,
+                flags=0,
+                message_type=Gtk.MessageType.WARNING,
+                buttons=Gtk.ButtonsType.OK_CANCEL,
+                text=f"This will erase all data on {len(devices)} drives! ⚠️",
+            )
+            confirm.format_secondary_text(
+                "\n".join(devices)
+                + f"\n\nFilesystem: {fs}\nLabels: {first} … {last}"
+                + "\n\nDo you want to continue?"
+            )
+            answer = confirm.run()
+            confirm.destroy()
+            if answer != Gtk.ResponseType.OK:
+                return
+
+            try:
+                tracked = self.jobs.track(
+                    "format",
+                    [
+                        {
+                            "device": device,
+                            "fs": fs,
+                            "label": logic.batch_label(scheme, index, fs),
+                        }
+                        for index, device in enumerate(devices, 1)
+                    ],
+                )
+            except ValueError as e:
+                summary.set_text(str(e))
+                return
+            batch_jobs.update(zip(devices, tracked))
+
+            running[0] = True
+            start_button.set_sensitive(False)
+            summary.set_text(f"Formatting {len(devices)} drives...")
+            for row in store:
+                row[3] = "Waiting..." if row[0] else ""
+
+            threading.Thread(
+                target=logic.run_batch_format,
+                args=(devices, fs, cluster, scheme, on_update, on_done),
+                kwargs={
+                    "concurrency": concurrency_spin.get_value_as_int(),
+                    "discard": discard,
+                    "align": align,
+                    "probe": probe,
+                    "cancels": {d: job.cancel_event for d, job in batch_jobs.items()},
+                },
+                daemon=True,
+            ).start()
+
+        dialog.connect("response", on_response)
+        dialog.show_all()
+
+    # Opens the duplication dialog: pick a master drive and the target drives
+    def on_duplicate_clicked(self, button):
+        dialog = Gtk.Dialog(title="Duplicate drive", transient_for=self, modal=True)
+        dialog.add_button("Close", Gtk.ResponseType.CLOSE)
+        start_button = dialog.add_button("Duplicate", Gtk.ResponseType.OK)
+        dialog.set_default_size(560, 400)
+
+        box = dialog.get_content_area()
+        box.set_spacing(8)
+        box.set_border_width(10)
+
+        drives = logic.list_usb_drives()
+
+        source_label = Gtk.Label()
+        source_label.set_markup("<b>Master drive:</b>")
+        source_label.set_xalign(0)
+        box.pack_start(source_label, False, False, 0)
+
+        source_combo = Gtk.ComboBoxText()
+        for d in drives:
+            description = f"{d['label']} {d['model']} ({d['size']})".strip()
+            source_combo.append(d["device"], f"{description} - {d['device']}")
+        box.pack_start(source_combo, False, False, 0)
+
+        targets_label = Gtk.Label()
+        targets_label.set_markup("<b>Copy onto:</b>")
+        targets_label.set_xalign(0)
+        box.pack_start(targets_label, False, False, 0)
+
+        # Target list: selected, device, description, progress, status
+        store = Gtk.ListStore(bool, str, str, int, str)
+        for d in drives:
+            description = f"{d['label']} {d['model']} ({d['size']})".strip()
+            store.append([True, d["device"], description, 0, ""])
+
+        view = Gtk.TreeView(model=store)
+        toggle = Gtk.CellRendererToggle()
+
+        def on_toggled(renderer, path):
+            if store[path][1] != source_combo.get_active_id():
+                store[path][0] = not store[path][0]
+
+        toggle.connect("toggled", on_toggled)
+        view.append_column(Gtk.TreeViewColumn("", toggle, active=0))
+        for title, column in (("Drive", 1), ("Model", 2)):
+            renderer = Gtk.CellRendererText()
+            view_column = Gtk.TreeViewColumn(title, renderer, text=column)
+            view_column.set_resizable(True)
+            view.append_column(view_column)
+        view.append_column(
+            Gtk.TreeViewColumn("Progress", Gtk.CellRendererProgress(), value=3)
+        )
+        view.append_column(
+            Gtk.TreeViewColumn("Status", Gtk.CellRendererText(), text=4)
+        )
+
+        # The master drive is never a target
+        def on_source_changed(combo):
+            for row in store:
+                if row[1] == combo.get_active_id():
+                    row[0] = False
+
+        source_combo.connect("changed", on_source_changed)
+        if drives:
+            source_combo.set_active(0)
+
+        scroller = Gtk.ScrolledWindow()
+        scroller.set_vexpand(True)
+        scroller.add(view)
+        box.pack_start(scroller, True, True, 0)
+
+        summary = Gtk.Label(label="")
+        summary.set_xalign(0)
+        summary.set_line_wrap(True)
+        box.pack_start(summary, False, False, 0)
+
+        # Called in the main loop by logic.duplicate_drive
+        def on_update(device, fraction, message):
+            for row in store:
+                if row[1] == device:
+                    row[3] = int(fraction * 100)
+                    row[4] = message
+
+        running = [False]
+
+        # Runs on a worker thread; the job shows the copy in the Jobs tab
+        def duplicate(source, targets, job):
+            results = logic.duplicate_drive(
+                source,
+                targets,
+                summary,
+                JobProgress(job),
+                on_update=on_update,
+                cancel=job.cancel_event,
+            )
+            ok = sum(results.values())
+            job.finish(
+                bool(results) and ok == len(results),
+                f"Copied to {ok} of {len(results)} drive(s)",
+            )
+            logic.ui(finish)
+
+        def finish():
+            running[0] = False
+            start_button.set_sensitive(True)
+            self.on_refresh_burn(None)
+
+        def on_response(dialog, response):
+            if running[0]:
+                return  # Keep the dialog open until the copy has finished
+            if response != Gtk.ResponseType.OK:
+                dialog.destroy()
+                return
+
+            source = source_combo.get_active_id()
+            targets = [row[1] for row in store if row[0] and row[1] != source]
+            if not source or not targets:
+                summary.set_text("Select a master drive and at least one target.")
+                return
+
+            confirm = Gtk.MessageDialog(
+                transient_for=dialog,
+                flags=0,
+                message_type=Gtk.MessageType.WARNING,
+                buttons=Gtk.ButtonsType.OK_CANCEL,
+                text=f"This will erase all data on {len(targets)} drives! ⚠️",
+            )
+            confirm.format_secondary_text(
+                f"Master: {source}\nTargets:\n"
+                + "\n".join(targets)
+                + "\n\nDo you want to continue?"
+            )
+            answer = confirm.run()
+            confirm.destroy()
+            if answer != Gtk.ResponseType.OK:
+                return
+
+            try:
+                job = self.jobs.track(
+                    "duplicate", [{"device": source, "targets": targets}]
+                )[0]
+            except ValueError as e:
+                summary.set_text(str(e))
+                return
+
+            running[0] = True
+            start_button.set_sensitive(False)
+            for row in store:
+                row[3] = 0
+                row[4] = "Waiting..." if row[1] in targets else ""
+
+            threading.Thread(
+                target=duplicate, args=(source, targets, job), daemon=True
+            ).start()
+
+        dialog.connect("response", on_response)
+        dialog.show_all()
+
     # Enables "Verify hash" if file, hash, and algorithm are provided
     def check_verify_ready(self, widget):
         file_path = self.file_button.get_filename()
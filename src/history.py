@@ -0,0 +1,224 @@
+"""
+    Tuxus - ISO burning & USB drive formatting app for Linux
+    Copyright © 2025 santofrancesco
+    Full notice can be found on https://www.github.com/santofrancesco/tuxus/blob/main/LICENSE
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# Local drive performance history: benchmark results, the real throughput
+# of every burn and the duration of every format, keyed by vendor/model/serial,
+# in a small SQLite database.
+
+import os, sqlite3, statistics, threading, time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS benchmarks (
+    vendor TEXT NOT NULL,
+    model TEXT NOT NULL,
+    serial TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    seq_read_mbps REAL,
+    seq_write_mbps REAL,
+    rand_read_iops REAL,
+    rand_write_iops REAL
+);
+CREATE TABLE IF NOT EXISTS burns (
+    vendor TEXT NOT NULL,
+    model TEXT NOT NULL,
+    serial TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    image TEXT,
+    bytes INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    discarded INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS formats (
+    vendor TEXT NOT NULL,
+    model TEXT NOT NULL,
+    serial TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    fs TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    discarded INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS benchmarks_drive ON benchmarks (vendor, model, serial);
+CREATE INDEX IF NOT EXISTS burns_drive ON burns (vendor, model, serial);
+CREATE INDEX IF NOT EXISTS formats_drive ON formats (vendor, model, serial);
+"""
+
+# Number of most recent burns used for the expected write speed
+RECENT_BURNS = 10
+
+_lock = threading.Lock()
+
+
+# Returns path of the history database, following the XDG base directory spec
+def db_path():
+    base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    return os.path.join(base, "tuxus", "history.db")
+
+
+# Opens (and creates if needed) the history database
+def connect(path=None):
+    path = path or db_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    conn.executescript(SCHEMA)
+    # Databases from before discard support lack the burns.discarded column
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(burns)")}
+    if "discarded" not in columns:
+        conn.execute(
+            "ALTER TABLE burns ADD COLUMN discarded INTEGER NOT NULL DEFAULT 0"
+        )
+    return conn
+
+
+# Normalizes a drive identity dict into the (vendor, model, serial) key
+def drive_key(identity):
+    return tuple(
+        (identity.get(field) or "").strip() for field in ("vendor", "model", "serial")
+    )
+
+
+# Stores a benchmark result from blockio.py bench
+def record_benchmark(identity, result, path=None):
+    with _lock, connect(path) as conn:
+        conn.execute(
+            "INSERT INTO benchmarks VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            drive_key(identity)
+            + (
+                time.time(),
+                result.get("seq_read_mbps"),
+                result.get("seq_write_mbps"),
+                result.get("rand_read_iops"),
+                result.get("rand_write_iops"),
+            ),
+        )
+
+
+# Stores the measured throughput of a finished burn. discarded marks burns
+# that ran right after a full-drive discard.
+def record_burn(identity, nbytes, seconds, image=None, discarded=False, path=None):
+    if nbytes <= 0 or seconds <= 0:
+        return
+    with _lock, connect(path) as conn:
+        conn.execute(
+            "INSERT INTO burns VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            drive_key(identity)
+            + (time.time(), image, nbytes, seconds, int(discarded)),
+        )
+
+
+# Stores how long a format took, from partitioning to mkfs. discarded marks
+# formats that ran right after a full-drive discard.
+def record_format(identity, fs, seconds, discarded=False, path=None):
+    if seconds <= 0:
+        return
+    with _lock, connect(path) as conn:
+        conn.execute(
+            "INSERT INTO formats VALUES (?, ?, ?, ?, ?, ?, ?)",
+            drive_key(identity) + (time.time(), fs, seconds, int(discarded)),
+        )
+
+
+# Returns the latest benchmark of a drive as a dict, or None
+def latest_benchmark(identity, path=None):
+    with _lock, connect(path) as conn:
+        row = conn.execute(
+            "SELECT seq_read_mbps, seq_write_mbps, rand_read_iops, rand_write_iops"
+            " FROM benchmarks WHERE vendor = ? AND model = ? AND serial = ?"
+            " ORDER BY timestamp DESC LIMIT 1",
+            drive_key(identity),
+        ).fetchone()
+    if not row:
+        return None
+    keys = ("seq_read_mbps", "seq_write_mbps", "rand_read_iops", "rand_write_iops")
+    return dict(zip(keys, row))
+
+
+# Returns expected sequential write speed in MB/s, or None if unknown.
+# Real burns of this exact drive win over its benchmark; drives never seen
+# before fall back to other sticks of the same vendor/model.
+def expected_write_speed(identity, path=None):
+    vendor, model, serial = drive_key(identity)
+    with _lock, connect(path) as conn:
+        queries = [
+            (
+                "SELECT bytes / seconds FROM burns"
+                " WHERE vendor = ? AND model = ? AND serial = ?",
+                (vendor, model, serial),
+            ),
+            (
+                "SELECT seq_write_mbps * 1000000 FROM benchmarks"
+                " WHERE vendor = ? AND model = ? AND serial = ?"
+                " AND seq_write_mbps IS NOT NULL",
+                (vendor, model, serial),
+            ),
+            (
+                "SELECT bytes / seconds FROM burns WHERE vendor = ? AND model = ?",
+                (vendor, model),
+            ),
+            (
+                "SELECT seq_write_mbps * 1000000 FROM benchmarks"
+                " WHERE vendor = ? AND model = ? AND seq_write_mbps IS NOT NULL",
+                (vendor, model),
+            ),
+        ]
+        for query, args in queries:
+            rows = conn.execute(
+                query + f" ORDER BY timestamp DESC LIMIT {RECENT_BURNS}", args
+            ).fetchall()
+            if rows:
+                return statistics.median(r[0] for r in rows) / 1e6
+    return None
+
+
+# Returns median MB/s of recent burns that were not preceded by a discard, for
+# this drive or else its model, or None. The baseline for discard savings.
+def plain_burn_speed(identity, path=None):
+    vendor, model, serial = drive_key(identity)
+    with _lock, connect(path) as conn:
+        for where, args in (
+            ("vendor = ? AND model = ? AND serial = ?", (vendor, model, serial)),
+            ("vendor = ? AND model = ?", (vendor, model)),
+        ):
+            rows = conn.execute(
+                f"SELECT bytes / seconds FROM burns WHERE {where}"
+                f" AND discarded = 0 ORDER BY timestamp DESC LIMIT {RECENT_BURNS}",
+                args,
+            ).fetchall()
+            if rows:
+                return statistics.median(r[0] for r in rows) / 1e6
+    return None
+
+
+# Returns median seconds of recent formats to fs that were not preceded by a
+# discard, for this drive or else its model, or None. The baseline for
+# discard savings on formats.
+def plain_format_seconds(identity, fs, path=None):
+    vendor, model, serial = drive_key(identity)
+    with _lock, connect(path) as conn:
+        for where, args in (
+            ("vendor = ? AND model = ? AND serial = ?", (vendor, model, serial)),
+            ("vendor = ? AND model = ?", (vendor, model)),
+        ):
+            rows = conn.execute(
+                f"SELECT seconds FROM formats WHERE {where} AND fs = ?"
+                f" AND discarded = 0 ORDER BY timestamp DESC LIMIT {RECENT_BURNS}",
+                args + (fs,),
+            ).fetchall()
+            if rows:
+                return statistics.median(r[0] for r in rows)
+    return None
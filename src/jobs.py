@@ -0,0 +1,535 @@
+"""
+    Tuxus - ISO burning & USB drive formatting app for Linux
+    Copyright © 2025 santofrancesco
+    Full notice can be found on https://www.github.com/santofrancesco/tuxus/blob/main/LICENSE
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# Background jobs (burn, format, verify, hash) that run the same logic
+# functions as the GUI tabs, without any widgets involved.
+#
+# The logic functions report through a "status label" and a "progress bar";
+# JobStatus and JobProgress stand in for those widgets and turn every update
+# into a job event that subscribers (e.g. the local API) receive.
+
+import itertools, queue, re, threading, time
+import logic, tracing
+
+# How often the auto rules look for newly inserted drives, in seconds
+WATCH_INTERVAL = 2.0
+
+
+# Label-like sink for the status messages of a job. Job sinks are thread-safe:
+# logic.ui() calls them straight from the worker instead of queueing a main
+# loop callback, and the Jobs tab batches the resulting events per frame.
+class JobStatus:
+    threadsafe = True
+
+    def __init__(self, job):
+        self.job = job
+
+    def set_text(self, text):
+        self.job.update(message=text)
+
+    def set_markup(self, markup):
+        self.job.update(message=re.sub(r"<[^>]+>", "", markup))
+
+
+# Progress bar-like sink for the progress of a job
+class JobProgress:
+    threadsafe = True
+
+    def __init__(self, job):
+        self.job = job
+        self.last = None  # (time, bytes) of the previous byte count
+
+    def set_fraction(self, fraction):
+        self.job.update(fraction=round(fraction, 4))
+
+    def set_text(self, text):
+        self.job.update(progress_text=text)
+
+    # Byte counts from logic.report_bytes; tracks throughput and time left
+    def set_bytes(self, phase, done, total):
+        job = self.job
+        now = time.monotonic()
+        if phase != job.phase or self.last is None:
+            rate = 0.0
+        else:
+            elapsed = now - self.last[0]
+            if elapsed < 0.2:
+                return
+            current = (done - self.last[1]) / elapsed / 1e6
+            rate = current if not job.rate_mbps else 0.7 * job.rate_mbps + 0.3 * current
+        self.last = (now, done)
+        eta = (total - done) / (rate * 1e6) if rate > 0 else None
+        job.update(
+            phase=phase,
+            bytes_done=done,
+            bytes_total=total,
+            rate_mbps=round(rate, 1),
+            eta=round(eta) if eta is not None else None,
+        )
+
+    def pulse(self):
+        pass
+
+
+# One burn/format/verify/hash operation and its current state
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(self, manager, op, params):
+        self.manager = manager
+        self.id = next(Job._ids)
+        self.op = op
+        self.params = dict(params)
+        self.device = params.get("device")
+        # Drives the job writes and drives it only reads, for the busy check.
+        # Jobs may share a drive they all only read, e.g. a duplicate source.
+        if op in READ_ONLY:
+            self.devices = []
+            self.reads = [self.device] if self.device else []
+        else:
+            self.devices = [self.device] if self.device else []
+            self.reads = []
+        self.devices += params.get("targets") or []
+        self.state = "queued"
+        self.fraction = 0.0
+        self.message = ""
+        self.progress_text = ""
+        self.phase = None
+        self.bytes_done = 0
+        self.bytes_total = 0
+        self.rate_mbps = 0.0
+        self.eta = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+
+    # Changes job fields and notifies subscribers
+    def update(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.manager.publish(self)
+
+    # Ends the job as done, cancelled or failed
+    def finish(self, ok, message=None):
+        if ok:
+            state = "done"
+        elif self.cancel_event.is_set():
+            state = "cancelled"
+        else:
+            state = "failed"
+        fields = {"state": state, "finished": time.time()}
+        if message is not None:
+            fields["message"] = message
+        if ok:
+            fields["fraction"] = 1.0
+        self.update(**fields)
+
+    @property
+    def active(self):
+        return self.state in ("queued", "running")
+
+    # Returns the drives this job and another one cannot use at the same time
+    def conflicts(self, other):
+        return (set(self.devices) & set(other.devices + other.reads)) | (
+            set(self.reads) & set(other.devices)
+        )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "op": self.op,
+            "device": self.device,
+            "params": self.params,
+            "state": self.state,
+            "fraction": self.fraction,
+            "message": self.message,
+            "progress_text": self.progress_text,
+            "phase": self.phase,
+            "bytes_done": self.bytes_done,
+            "bytes_total": self.bytes_total,
+            "rate_mbps": self.rate_mbps,
+            "eta": self.eta,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+# =====================================================
+#  Operations
+# =====================================================
+
+# Burns params["image"], then optionally reads the drive back to verify it
+def run_burn(job, status, progress):
+    params = job.params
+    ok = logic.write_iso(
+        params["image"],
+        job.device,
+        status,
+        progress,
+        durability=params.get("durability", "periodic"),
+        flush_every=params.get("flush_every") or 64,
+        cancel=job.cancel_event,
+        discard=bool(params.get("discard")),
+        check_image=bool(params.get("check_image", True)),
+    )
+    if ok and params.get("verify"):
+        ok = logic.verify_drive(
+            params["image"], job.device, status, progress, job.cancel_event
+        )
+    return ok
+
+
+# Formats a drive with the same options as the Format tab
+def run_format(job, status, progress):
+    params = job.params
+    return logic.run_format(
+        job.device,
+        params.get("fs", "FAT32"),
+        params.get("label") or "UNTITLED",
+        params.get("cluster_size"),
+        status,
+        progress,
+        scan_mode=params.get("scan"),
+        cancel=job.cancel_event,
+        discard=bool(params.get("discard")),
+        align=bool(params.get("align", True)),
+        erase_block=params.get("erase_block"),
+        probe=bool(params.get("probe")),
+    )
+
+
+# Compares a drive against an image
+def run_verify(job, status, progress):
+    return logic.verify_drive(
+        job.params["image"], job.device, status, progress, job.cancel_event
+    )
+
+
+# Copies params["device"] onto every drive in params["targets"]
+def run_duplicate(job, status, progress):
+    results = logic.duplicate_drive(
+        job.device, job.params["targets"], status, progress, cancel=job.cancel_event
+    )
+    return bool(results) and all(results.values())
+
+
+# Checks a file against a known hash, as in the Verify hash tab
+def run_hash(job, status, progress):
+    params = job.params
+    return logic.verify_hash(
+        params["file"],
+        params.get("algo", "SHA-256"),
+        params["hash"].strip().lower(),
+        status,
+    )
+
+
+# Operation name → (function, required parameters)
+OPERATIONS = {
+    "burn": (run_burn, ("device", "image")),
+    "format": (run_format, ("device",)),
+    "verify": (run_verify, ("device", "image")),
+    "duplicate": (run_duplicate, ("device", "targets")),
+    "hash": (run_hash, ("file", "hash")),
+}
+
+# Operations that only read params["device"]
+READ_ONLY = {"verify", "duplicate"}
+
+# Parameters that take a positive whole number (bytes, or MiB for flush_every)
+NUMERIC_PARAMS = ("cluster_size", "erase_block", "flush_every")
+
+
+# =====================================================
+#  Job manager
+# =====================================================
+
+# Runs jobs on background threads and fans their events out to subscribers
+class JobManager:
+    def __init__(self):
+        self.jobs = {}
+        self.rules = {}
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self._rule_ids = itertools.count(1)
+        self._watcher = None
+
+    # Validates and starts a job. Raises ValueError for bad requests.
+    def submit(self, op, params):
+        job = self._add(op, [params])[0]
+        threading.Thread(target=self._run, args=(job,), daemon=True).start()
+        return job
+
+    # Registers jobs that run elsewhere, e.g. the drives of a GUI batch, so
+    # they show up in the Jobs tab and count for the busy check. They start
+    # out running; the caller reports through JobStatus/JobProgress and ends
+    # them with Job.finish(). Raises ValueError like submit, registering none.
+    def track(self, op, params_list):
+        jobs = self._add(op, params_list)
+        for job in jobs:
+            job.update(state="running", started=time.time())
+        return jobs
+
+    # Validates jobs and adds them all, or none if any is refused
+    def _add(self, op, params_list):
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {op}")
+        jobs = []
+        for params in params_list:
+            missing = [p for p in OPERATIONS[op][1] if not params.get(p)]
+            if missing:
+                missing = ", ".join(missing)
+                raise ValueError(f"Missing parameter(s) for {op}: {missing}")
+            params = dict(params)
+            if isinstance(params.get("targets"), str):
+                params["targets"] = [t for t in params["targets"].split(",") if t]
+            self.check_numbers(params)
+            self.check_drives(params)
+            jobs.append(Job(self, op, params))
+
+        with self.lock:
+            others = [job for job in self.jobs.values() if job.active]
+            for job in jobs:
+                for other in others:
+                    shared = job.conflicts(other)
+                    if shared and other in jobs:
+                        raise ValueError(f"{sorted(shared)[0]} is used twice")
+                    if shared:
+                        raise ValueError(
+                            f"{sorted(shared)[0]} is busy with job {other.id}"
+                        )
+                others.append(job)
+            for job in jobs:
+                self.jobs[job.id] = job
+
+        for job in jobs:
+            self.publish(job)
+        return jobs
+
+    # Turns numeric parameters into ints, refusing anything but a positive
+    # whole number
+    @staticmethod
+    def check_numbers(params):
+        for name in NUMERIC_PARAMS:
+            value = params.get(name)
+            if value is None:
+                continue
+            if isinstance(value, str) and value.strip().isdigit():
+                value = int(value)
+            if isinstance(value, bool) or not isinstance(value, int):
+                raise ValueError(f"{name} must be a whole number")
+            if value <= 0:
+                raise ValueError(f"{name} must be positive")
+            params[name] = value
+
+    # Only removable drives from the same enumeration as the GUI drive lists
+    # may be written or read, never e.g. the system disk
+    @staticmethod
+    def check_drives(params):
+        drives = [params["device"]] if params.get("device") else []
+        targets = params.get("targets") or []
+        if not isinstance(targets, list):
+            raise ValueError("targets must be a list of devices")
+        drives += targets
+        if not drives:
+            return
+        removable = {d["device"] for d in logic.list_usb_drives()}
+        for drive in drives:
+            if drive not in removable:
+                raise ValueError(f"{drive} is not a removable USB drive")
+
+    def _run(self, job):
+        job.update(state="running", started=time.time())
+        function = OPERATIONS[job.op][0]
+        with tracing.span(
+            f"job {job.op}", "job", job=job.id, device=job.device
+        ) as span:
+            try:
+                drives = job.reads + job.devices
+                if drives:
+                    # Jobs on drives sharing a hub or root port take turns
+                    job.update(message="Waiting for USB bandwidth...")
+                    with logic.job_slot(drives, job.cancel_event):
+                        ok = function(job, JobStatus(job), JobProgress(job))
+                else:
+                    ok = function(job, JobStatus(job), JobProgress(job))
+            except Exception as e:
+                cancelled = job.cancel_event.is_set()
+                job.message = str(e) if cancelled else f"Error: {e}"
+                ok = False
+            span.set(ok=ok)
+        job.finish(ok)
+
+    def get(self, job_id):
+        with self.lock:
+            if job_id not in self.jobs:
+                raise ValueError(f"No such job: {job_id}")
+            return self.jobs[job_id]
+
+    def list(self):
+        with self.lock:
+            return list(self.jobs.values())
+
+    # Asks a job to stop; it ends up "cancelled" once its helper exits
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job.active:
+            job.cancel_event.set()
+        return job
+
+    # Returns a queue that receives an event dict for every job change
+    def subscribe(self):
+        events = queue.Queue()
+        with self.lock:
+            self.subscribers.add(events)
+        return events
+
+    def unsubscribe(self, events):
+        with self.lock:
+            self.subscribers.discard(events)
+
+    # Sends a job change to subscribers, unless the job was cleared. Events
+    # are queued under the lock so none can follow the "cleared" event.
+    def publish(self, job):
+        event = {"event": "job", "job": job.to_dict()}
+        with self.lock:
+            if self.jobs.get(job.id) is not job:
+                return
+            for events in self.subscribers:
+                events.put(event)
+
+    # Forgets finished jobs, so a long-running instance does not keep every
+    # job it ever ran. Returns the ids of the cleared jobs.
+    def clear_finished(self):
+        with self.lock:
+            cleared = [job.id for job in self.jobs.values() if not job.active]
+            for job_id in cleared:
+                del self.jobs[job_id]
+            if cleared:
+                for events in self.subscribers:
+                    events.put({"event": "cleared", "jobs": cleared})
+        return cleared
+
+    # =====================================================
+    #  Auto rules: run a job on every newly inserted drive
+    # =====================================================
+
+    def add_rule(self, op, params):
+        if op not in OPERATIONS or "device" not in OPERATIONS[op][1]:
+            raise ValueError(f"Operation {op} cannot run on inserted drives")
+        if op == "duplicate" and not params.get("device"):
+            raise ValueError("Auto duplicate needs the source drive as device")
+        rule = {
+            "id": next(self._rule_ids),
+            "op": op,
+            "params": dict(params),
+            # Drives already present are not new
+            "seen": {d["device"] for d in logic.list_usb_drives()},
+            # New drives that could not be submitted yet, with the reason
+            "skipped": {},
+        }
+        with self.lock:
+            self.rules[rule["id"]] = rule
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, daemon=True)
+                self._watcher.start()
+        return self.rule_dict(rule)
+
+    def remove_rule(self, rule_id):
+        with self.lock:
+            if rule_id not in self.rules:
+                raise ValueError(f"No such rule: {rule_id}")
+            return self.rule_dict(self.rules.pop(rule_id))
+
+    def list_rules(self):
+        with self.lock:
+            return [self.rule_dict(r) for r in self.rules.values()]
+
+    @staticmethod
+    def rule_dict(rule):
+        return {"id": rule["id"], "op": rule["op"], "params": rule["params"]}
+
+    def _watch(self):
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            self.check_rules()
+
+    # One pass of the auto rules over the drives present right now
+    def check_rules(self):
+        with self.lock:
+            rules = list(self.rules.values())
+        if not rules:
+            return
+        present = {d["device"] for d in logic.list_usb_drives()}
+        for rule in rules:
+            # Forget removed drives so re-inserting them triggers again
+            rule["seen"] &= present
+            for device in set(rule["skipped"]) - present:
+                del rule["skipped"][device]
+            new = sorted(present - rule["seen"] - {rule["params"].get("device")})
+            # Inserted drives are the targets of a duplicate rule, all
+            # copied in one pass over the source. A busy drive waits
+            # for the next pass instead of holding up the others.
+            if rule["op"] == "duplicate" and new:
+                busy = self.busy_devices()
+                for device in new:
+                    if device in busy:
+                        self._skip(rule, device, f"{device} is busy")
+                free = [device for device in new if device not in busy]
+                batches = [free] if free else []
+            else:
+                batches = [[device] for device in new]
+            for devices in batches:
+                self._apply_rule(rule, devices)
+
+    # Returns every drive an active job writes or reads
+    def busy_devices(self):
+        with self.lock:
+            return {
+                device
+                for job in self.jobs.values()
+                if job.active
+                for device in job.devices + job.reads
+            }
+
+    # Submits the job of a rule for new drives; drives that were refused
+    # (e.g. busy) stay new and are tried again on the next pass
+    def _apply_rule(self, rule, devices):
+        if rule["op"] == "duplicate":
+            params = dict(rule["params"], targets=devices)
+        else:
+            params = dict(rule["params"], device=devices[0])
+        try:
+            self.submit(rule["op"], params)
+        except ValueError as e:
+            for device in devices:
+                self._skip(rule, device, str(e))
+            return
+        rule["seen"].update(devices)
+        for device in devices:
+            rule["skipped"].pop(device, None)
+
+    # Reports a refused drive once per reason
+    @staticmethod
+    def _skip(rule, device, reason):
+        if rule["skipped"].get(device) != reason:
+            print(f"Auto rule {rule['id']} waiting for {device}: {reason}")
+        rule["skipped"][device] = reason
@@ -17,33 +17,62 @@
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
-import subprocess, json, os, re
+import subprocess, json, os, re, sys, threading, time, itertools, contextlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
 from gi.repository import GLib
+import checksums, geometry, history, supervisor, topology, tracing
+
+# Privileged helper that performs raw block device I/O (see blockio.py)
+HELPER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "blockio.py")
+
+MiB = 1024 * 1024
+
+# Schedules a GUI update on the GTK main loop, traced when tracing is on.
+# Methods of thread-safe sinks (jobs.JobStatus/JobProgress) run right away.
+def ui(function, *args):
+    if getattr(getattr(function, "__self__", None), "threadsafe", False):
+        function(*args)
+        return
+    GLib.idle_add(tracing.dispatch(function), *args)
+
 
 # Run shell command, handle errors, and optionally update status label
-def run_cmd(cmd, status_label=None, critical=True, **kwargs):
+def run_cmd(cmd, status_label=None, critical=True, timeout=None, **kwargs):
     """
-    Run a shell command with subprocess.
+    Run a shell command under the process supervisor.
 
     Args:
         cmd (list): Command and arguments as list, e.g. ["lsblk", "-J"].
         status_label (Gtk.Label, optional): Label to display messages in GUI.
         critical (bool): If True, failures raise CalledProcessError.
                          If False, return the exit code instead.
-        kwargs: Extra arguments passed to subprocess.run.
+        timeout (float, optional): Seconds before the command is stopped and
+                         subprocess.TimeoutExpired is raised.
+        kwargs: Extra arguments passed to supervisor.spawn (env, cwd, cancel).
 
     Returns:
         - If critical=True: completed process (raises on error).
         - If critical=False: returncode (int).
     """
+    session = current_session()
+    if cmd[0] == "pkexec" and session is not None:
+        result = session.run(cmd[1:], timeout=timeout)
+    else:
+        result = supervisor.run(cmd, timeout=timeout, **kwargs)
+    if result.timed_out:
+        raise subprocess.TimeoutExpired(cmd, timeout, result.stdout, result.stderr)
+
     try:
         if critical:
-            result = subprocess.run(
-                cmd, check=True, text=True, capture_output=True, **kwargs
+            if result.returncode != 0:
+                raise subprocess.CalledProcessError(
+                    result.returncode, cmd, result.stdout, result.stderr
+                )
+            return subprocess.CompletedProcess(
+                cmd, result.returncode, result.stdout, result.stderr
             )
-            return result
         else:
-            result = subprocess.run(cmd, text=True, capture_output=True, **kwargs)
             return result.returncode
 
     except subprocess.CalledProcessError as e:
@@ -53,12 +82,277 @@ def run_cmd(cmd, status_label=None, critical=True, **kwargs):
             f"Error: {e.stderr.strip() if e.stderr else 'No message'}"
         )
         if status_label:
-            GLib.idle_add(status_label.set_text, msg)
+            ui(status_label.set_text, msg)
         else:
             print(msg)
         raise
 
 
+# Prefixes a command with pkexec unless Tuxus already runs as root
+def elevated(cmd):
+    return list(cmd) if os.geteuid() == 0 else ["pkexec"] + list(cmd)
+
+
+# Runs a blockio.py command as root, passing its progress events to on_event.
+# Setting the optional cancel event (threading.Event) stops the helper, and
+# on_spawn(process) may send it further control commands.
+# Returns the final "result" event, raises RuntimeError if the helper fails.
+def run_helper(args, on_event=None, cancel=None, on_spawn=None):
+    cmd = elevated([sys.executable, HELPER] + list(args))
+    outcome = {}
+
+    # Trace the wait for authorization and each I/O phase of the helper
+    tid = tracing.thread_id() if tracing.enabled() else None
+    started = tracing.now()
+    phase = {}
+
+    def end_phase(when):
+        if phase:
+            name = phase["name"]
+            tracing.complete(
+                name if name == args[0] else f"{args[0]} {name}",
+                "io",
+                phase["start"],
+                when,
+                tid,
+                bytes=phase["last"] - phase["first"],
+            )
+            phase.clear()
+
+    def trace(event):
+        when = tracing.now()
+        if event.get("event") == "started":
+            tracing.complete("authorization", "elevation", started, when, tid)
+        elif event.get("event") == "progress":
+            if event.get("phase") != phase.get("name"):
+                end_phase(when)
+                phase.update(name=event.get("phase"), start=when, first=event["done"])
+            phase["last"] = event["done"]
+        else:
+            end_phase(when)
+
+    def on_line(line):
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return
+        if tid is not None:
+            trace(event)
+        if event.get("event") in ("result", "error"):
+            outcome[event["event"]] = event
+        elif on_event:
+            on_event(event)
+
+    session = current_session()
+    if session is not None:
+        # A batch runs the helper through its broker, without another prompt
+        result = session.run_helper(args, on_line, cancel, on_spawn)
+    else:
+        # The helper runs as root and cannot be signalled, ask it via stdin
+        process = supervisor.spawn(
+            cmd,
+            on_stdout=on_line,
+            cancel=cancel,
+            cancel_input="cancel\n",
+            capture=False,
+        )
+        # Lets callers send further control commands (e.g. "commit")
+        if on_spawn:
+            on_spawn(process)
+        result = process.wait()
+
+    if result.returncode in (126, 127) and session is None and cmd[0] == "pkexec":
+        raise RuntimeError("Authorization was cancelled or denied")
+    if result.returncode != 0 or "result" not in outcome:
+        error = outcome.get("error", {}).get("message") or result.stderr.strip()
+        raise RuntimeError(error or f"helper exited with code {result.returncode}")
+    return outcome["result"]
+
+
+# Seconds a brokered command may take when the caller sets no timeout
+BROKER_TIMEOUT = 30 * 60
+
+
+# Root command broker (blockio.py broker) that runs the pkexec commands of one
+# batch, so the batch asks for authorization once
+class ElevationSession:
+    def __init__(self):
+        self.pending = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.closed = False
+        self.outputs = {}  # request id -> on_line of a helper command
+        self.process = supervisor.spawn(
+            elevated([sys.executable, HELPER, "broker"]),
+            on_stdout=self.on_line,
+            stdin=True,
+            capture=False,
+        )
+        self.process.future.add_done_callback(self.on_exit)
+
+    def on_line(self, line):
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return
+        if event.get("event") == "started":
+            self.ready.set()
+        elif event.get("event") == "output":
+            on_line = self.outputs.get(event.get("id"))
+            if on_line:
+                on_line(event.get("line", ""))
+        elif event.get("event") == "exec":
+            with self.lock:
+                future = self.pending.pop(event.get("id"), None)
+                self.outputs.pop(event.get("id"), None)
+            if future:
+                future.set_result(event)
+
+    # Fails whatever is still waiting once the broker is gone
+    def on_exit(self, _):
+        with self.lock:
+            self.closed = True
+            pending, self.pending = self.pending, {}
+        for future in pending.values():
+            future.set_exception(RuntimeError("Elevated command broker exited"))
+
+    def wait_ready(self):
+        while not self.ready.wait(0.2):
+            if self.process.done():
+                raise RuntimeError("Authorization was cancelled or denied")
+
+    # Registers a request; its reply completes the returned future
+    def request(self, message, on_line=None):
+        future = Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("Elevated command broker exited")
+            request_id = next(self.ids)
+            self.pending[request_id] = future
+            if on_line:
+                self.outputs[request_id] = on_line
+        self.process.write(json.dumps(dict(message, id=request_id)) + "\n")
+        return request_id, future
+
+    # Runs argv as root and returns a supervisor.Result
+    def run(self, argv, timeout=None):
+        self.wait_ready()
+        with tracing.span(f"broker {os.path.basename(argv[0])}", "elevation") as s:
+            request_id, future = self.request({"argv": argv})
+            try:
+                reply = future.result(timeout or BROKER_TIMEOUT)
+            except FutureTimeout:
+                with self.lock:
+                    self.pending.pop(request_id, None)
+                s.set(cmd=" ".join(argv), reason="timeout")
+                return supervisor.Result(
+                    ["pkexec"] + list(argv), None, "", "", reason="timeout"
+                )
+            s.set(cmd=" ".join(argv), exit_code=reply["returncode"])
+        return supervisor.Result(
+            ["pkexec"] + list(argv),
+            reply["returncode"],
+            reply.get("stdout", ""),
+            reply.get("stderr", ""),
+        )
+
+    # Runs a blockio.py command in the broker like run_helper(): on_line gets
+    # its event lines, cancel stops it and on_spawn(process) gets an object
+    # whose write() sends control commands. Returns a supervisor.Result.
+    def run_helper(self, args, on_line, cancel=None, on_spawn=None):
+        self.wait_ready()
+        request_id, future = self.request({"helper": list(args)}, on_line)
+        control = _BrokerInput(self, request_id)
+        if on_spawn:
+            on_spawn(control)
+        reason = None
+        while True:
+            try:
+                reply = future.result(supervisor.CANCEL_POLL)
+                break
+            except FutureTimeout:
+                if cancel is not None and cancel.is_set() and reason is None:
+                    reason = "cancelled"
+                    control.write("cancel\n")
+                    tracing.instant(reason, "elevation", cmd=" ".join(args))
+        return supervisor.Result(
+            ["blockio.py"] + list(args),
+            reply["returncode"],
+            "",
+            reply.get("stderr", ""),
+            reason,
+        )
+
+    # Lets running commands finish; later requests fail at once
+    def close(self):
+        with self.lock:
+            self.closed = True
+        self.process.close_stdin()
+
+
+# Control channel of a helper command running in a broker
+class _BrokerInput:
+    def __init__(self, session, request_id):
+        self.session = session
+        self.request_id = request_id
+
+    def write(self, text):
+        message = {"id": self.request_id, "input": text}
+        self.session.process.write(json.dumps(message) + "\n")
+
+
+# Session of the batch the calling thread works for
+_local = threading.local()
+
+
+def current_session():
+    return getattr(_local, "session", None)
+
+
+# Runs the pkexec commands of the calling thread through session (None: pkexec)
+@contextlib.contextmanager
+def use_session(session):
+    previous = current_session()
+    _local.session = session
+    try:
+        yield session
+    finally:
+        _local.session = previous
+
+
+# Opens an ElevationSession for the calling thread, which hands it to its
+# workers with use_session(). A thread that already works for a batch keeps
+# that batch's session; other threads never see it.
+@contextlib.contextmanager
+def elevation_session():
+    session = current_session()
+    if session is not None or os.geteuid() == 0:
+        yield session
+        return
+    session = ElevationSession()
+    try:
+        with use_session(session):
+            yield session
+    finally:
+        session.close()
+
+
+# Returns partition node for a device, e.g. /dev/sdb1 or /dev/mmcblk0p1
+def partition_path(device_path, number=1):
+    separator = "p" if device_path[-1].isdigit() else ""
+    return f"{device_path}{separator}{number}"
+
+
+# Formats a byte count for status messages
+def human_size(nbytes):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(nbytes) < 1024:
+            return f"{nbytes:.1f} {unit}" if unit != "B" else f"{nbytes} B"
+        nbytes /= 1024
+    return f"{nbytes:.1f} TiB"
+
+
 # File filter for selecting ISO images
 def iso_filter():
     from gi.repository import Gtk
@@ -85,11 +379,29 @@ def get_vendor_model(device_path):
         return "UnknownModel"
 
 
+# Returns vendor/model/serial of a device, the key of the drive history
+def get_drive_identity(device_path):
+    try:
+        result = run_cmd(
+            ["lsblk", "-J", "-d", "-o", "VENDOR,MODEL,SERIAL", device_path],
+            status_label=None,
+            critical=True,
+        )
+        d = json.loads(result.stdout)["blockdevices"][0]
+        return {
+            "vendor": (d.get("vendor") or "").strip(),
+            "model": (d.get("model") or "").strip(),
+            "serial": (d.get("serial") or "").strip(),
+        }
+    except Exception:
+        return {"vendor": "", "model": "", "serial": ""}
+
+
 # Lists removable USB drives with model, label, size, and path
 def list_usb_drives():
     try:
         result = run_cmd(
-            ["lsblk", "-J", "-o", "NAME,RM,SIZE,MODEL,VENDOR,LABEL"],
+            ["lsblk", "-J", "-o", "NAME,RM,SIZE,MODEL,VENDOR,SERIAL,LABEL"],
             status_label=None,
             critical=True,
         )
@@ -100,6 +412,12 @@ def list_usb_drives():
                 "model": f"{d.get('vendor','').strip()} {d.get('model','').strip()}".strip(),
                 "label": (d.get("label") or "").strip(),
                 "size": d.get("size", "?"),
+                "identity": {
+                    "vendor": (d.get("vendor") or "").strip(),
+                    "model": (d.get("model") or "").strip(),
+                    "serial": (d.get("serial") or "").strip(),
+                },
+                "topology": topology.usb_topology(d["name"]),
             }
             for d in devices["blockdevices"]
             if d["rm"]
@@ -109,22 +427,108 @@ def list_usb_drives():
         return []
 
 
-# Refreshes combo box with currently available USB drives
-def refresh_drives(combo, drives_map=None):
+# Formats a duration in seconds as e.g. "45 s" or "12 min"
+def human_duration(seconds):
+    if seconds < 90:
+        return f"{seconds:.0f} s"
+    return f"{seconds / 60:.0f} min"
+
+
+# Passes byte counts of a helper phase to progress sinks that track
+# throughput (jobs.JobProgress, called from the worker like every update of
+# a thread-safe sink); GTK progress bars only take fractions
+def report_bytes(progressbar, phase, done, total):
+    set_bytes = getattr(progressbar, "set_bytes", None)
+    if set_bytes:
+        set_bytes(phase, done, total)
+
+
+# Returns " [~25 MB/s, ~4 min]" hint from the drive history, or ""
+def speed_hint(drive, image_size=None):
+    try:
+        speed = history.expected_write_speed(drive["identity"])
+    except Exception as e:
+        print("Error reading drive history:", e)
+        return ""
+    if not speed:
+        return ""
+    hint = f"~{speed:.0f} MB/s"
+    if image_size:
+        hint += f", ~{human_duration(image_size / (speed * 1e6))}"
+    return f" [{hint}]"
+
+
+# Returns e.g. "read 90 MB/s, write 25 MB/s, 4K 1500/300 IOPS" from the
+# latest benchmark of a drive, or ""
+def benchmark_summary(drive):
+    try:
+        result = history.latest_benchmark(drive["identity"])
+    except Exception as e:
+        print("Error reading drive history:", e)
+        return ""
+    if not result or None in result.values():
+        return ""
+    return (
+        f"read {result['seq_read_mbps']:.0f} MB/s, "
+        f"write {result['seq_write_mbps']:.0f} MB/s, "
+        f"4K {result['rand_read_iops']:.0f}/{result['rand_write_iops']:.0f} IOPS"
+    )
+
+
+# Refreshes combo box with currently available USB drives.
+# With image_size set, each drive shows its expected speed and burn time.
+def refresh_drives(combo, drives_map=None, image_size=None):
+    previous = extract_device_path(combo.get_active_text() or "")
     combo.remove_all()
     drives = list_usb_drives()
     if drives_map is not None:
         drives_map.clear()
 
+    active = 0
     if not drives:
         combo.append_text("No USB drives found")
     else:
         for idx, d in enumerate(drives):
-            label = f"{d['label']} {d['model']} ({d['size']}) - {d['device']}"
+            label = f"{d['label']} {d['model']} ({d['size']})"
+            label += f"{speed_hint(d, image_size)} - {d['device']}"
+            if d.get("topology") and d["topology"]["warnings"]:
+                label += " ⚠ slow link"
             combo.append_text(label)
             if drives_map is not None:
                 drives_map[idx] = d
-    combo.set_active(0)
+            if d["device"] == previous:
+                active = idx
+    # Tooltip: slow links and the latest benchmark of every drive
+    notes = []
+    for d in drives:
+        for warning in d["topology"]["warnings"] if d.get("topology") else []:
+            notes.append(f"{d['device']}: {warning}")
+        benchmark = benchmark_summary(d)
+        if benchmark:
+            notes.append(f"{d['device']}: last benchmark {benchmark}")
+    combo.set_tooltip_text("\n".join(notes) or None)
+    combo.set_active(active)
+
+
+# Context manager that waits until a job on the given drives fits the
+# bandwidth of their USB hubs and root ports, raising topology.Cancelled if
+# cancel is set first. The expected speed of each drive comes from the drive
+# history; without it the drive's own link speed is assumed.
+def job_slot(devices, cancel=None):
+    if isinstance(devices, str):
+        devices = [devices]
+    drives = []
+    for device_path in devices:
+        info = topology.usb_topology(device_path)
+        demand = None
+        if info:
+            try:
+                identity = get_drive_identity(device_path)
+                demand = history.expected_write_speed(identity)
+            except Exception as e:
+                print("Error reading drive history:", e)
+        drives.append((info, demand))
+    return topology.scheduler.slot(drives, cancel)
 
 
 # Extracts /dev/... path from drive info string
@@ -142,52 +546,488 @@ def is_burn_ready(iso_path, drive_info):
     return bool(iso_path and drive_info and "No USB" not in drive_info)
 
 
-# Writes ISO image to USB drive using dd, updating progress bar
-def write_iso(iso, drive_info, status_label, progressbar):
+# Durability modes for write_iso, see blockio.write_image
+DURABILITY_MODES = {
+    "sync": "Sync every block (slowest)",
+    "periodic": "Flush every 64 MiB",
+    "final": "Single flush at the end (fastest)",
+}
+
+
+# Writes ISO image to USB drive, updating progress bar with written and
+# durably flushed bytes. Returns True on success.
+#
+# With check_image set and a published checksum found (sidecar file or
+# implanted ISO MD5), the image is hashed from the start, alongside unmount
+# and write. The helper holds the final flush until the hash matched and
+# wipes the start of the drive if it did not.
+@tracing.traced("engine")
+def write_iso(
+    iso,
+    drive_info,
+    status_label,
+    progressbar,
+    durability="periodic",
+    flush_every=64,
+    cancel=None,
+    discard=False,
+    check_image=True,
+):
     device_path = extract_device_path(drive_info)
     if not device_path:
-        GLib.idle_add(status_label.set_text, "Error: Could not determine device path.")
-        return
+        ui(status_label.set_text, "Error: Could not determine device path.")
+        return False
 
     total_size = os.path.getsize(iso)
 
+    # The helper gets "commit" or "abort" once both it and the verdict exist
+    control = {"process": None, "decision": None, "sent": False}
+    control_lock = threading.Lock()
+
+    def send(process=None, decision=None):
+        with control_lock:
+            control["process"] = process or control["process"]
+            control["decision"] = decision or control["decision"]
+            if control["process"] and control["decision"] and not control["sent"]:
+                control["sent"] = True
+                control["process"].write(f"{control['decision']}\n")
+                tracing.instant(f"image {control['decision']}", "check")
+
+    check = None
+    checksum = checksums.find_checksum(iso) if check_image else None
+    if checksum:
+        check = checksums.ImageCheck(
+            iso, checksum, lambda c: send(decision="commit" if c.ok else "abort")
+        )
+
+    def on_event(event):
+        if event.get("event") != "progress":
+            return
+        report_bytes(progressbar, event["phase"], event["done"], total_size)
+        written = event["done"] / max(total_size, 1)
+        flushed = event.get("flushed", 0) / max(total_size, 1)
+        # The bar only reaches 100% once the final flush has returned
+        if event["phase"] != "done":
+            written = min(written, 0.99)
+        text = f"{written:.0%} written, {flushed:.0%} flushed"
+        if check and not check.done.is_set():
+            text += f", image {check.fraction:.0%} checked"
+        ui(progressbar.set_fraction, written)
+        ui(progressbar.set_text, text)
+        if event["phase"] == "commit":
+            ui(status_label.set_text, "Waiting for the image checksum...")
+        elif event["phase"] == "flush":
+            ui(status_label.set_text, "Flushing data to the drive...")
+
+    def rejected():
+        return check is not None and check.done.is_set() and not check.ok
+
     try:
         unmount_drive(device_path)
-        cmd = [
-            "pkexec",
-            "dd",
-            f"if={iso}",
-            f"of={device_path}",
-            "bs=4M",
-            "status=progress",
-            "oflag=sync",
-        ]
-        process = subprocess.Popen(cmd, stderr=subprocess.PIPE, universal_newlines=True)
+        # A corrupt image found this early never touches the drive
+        if rejected():
+            raise ValueError("drive left untouched")
+        discard_seconds = None
+        if discard:
+            discard_seconds = discard_drive(device_path, status_label, cancel)
+            if cancel is not None and cancel.is_set():
+                ui(status_label.set_text, "Burn cancelled")
+                return False
+            ui(status_label.set_text, "Writing image...")
+        if rejected():
+            raise ValueError("drive left untouched")
 
-        while True:
-            line = process.stderr.readline()
-            if not line and process.poll() is not None:
-                break
-            if not line:
-                continue
-            if "bytes" in line and "copied" in line:
-                try:
-                    copied = int(line.split()[0])
-                    fraction = copied / total_size
-                    GLib.idle_add(progressbar.set_fraction, min(fraction, 1.0))
-                    GLib.idle_add(progressbar.set_text, f"{fraction:.0%}")
-                except ValueError:
-                    pass
-
-        if process.returncode == 0:
-            GLib.idle_add(status_label.set_text, "Write complete")
-            GLib.idle_add(progressbar.set_fraction, 1.0)
-            GLib.idle_add(progressbar.set_text, "100%")
+        args = ["write", "--durability", durability]
+        args += ["--flush-every", str(flush_every)]
+        if check:
+            args += ["--await-commit"]
+        result = run_helper(
+            args + [iso, device_path],
+            on_event,
+            cancel,
+            on_spawn=lambda process: send(process=process),
+        )
+        message = "Write complete"
+        if check:
+            message += f", image checksum verified ({checksum_name(checksum)})"
+        if discard_seconds is not None:
+            message += discard_savings(
+                device_path, result["bytes"], result["seconds"], discard_seconds
+            )
+        ui(status_label.set_text, message)
+        ui(progressbar.set_fraction, 1.0)
+        ui(progressbar.set_text, "100%")
+        record_burn(
+            device_path,
+            result["bytes"],
+            result["seconds"],
+            iso,
+            discarded=discard_seconds is not None,
+        )
+        return True
+
+    except Exception as e:
+        if rejected() and check.error:
+            ui(
+                status_label.set_text,
+                f"Could not read the image to check it: {check.error} ({e})",
+            )
+        elif rejected():
+            ui(
+                status_label.set_text,
+                f"Image is corrupt: it does not match the "
+                f"{checksum_name(checksum)} ({e})",
+            )
         else:
-            GLib.idle_add(status_label.set_text, f"Error (exit {process.returncode})")
+            ui(status_label.set_text, f"Error: {e}")
+        return False
+
+    finally:
+        if check:
+            check.stop()
+
 
+# Describes where an image checksum came from, e.g. "SHA256 from SHA256SUMS"
+def checksum_name(checksum):
+    if checksum["algo"] == "isomd5":
+        return checksum["source"]
+    source = os.path.basename(checksum["source"])
+    return f"{checksum['algo'].upper()} from {source}"
+
+
+# Reads the drive back and compares it with the image. Returns True on match.
+@tracing.traced("engine")
+def verify_drive(iso, drive_info, status_label, progressbar, cancel=None):
+    device_path = extract_device_path(drive_info)
+    if not device_path:
+        ui(status_label.set_text, "Error: Could not determine device path.")
+        return False
+
+    def on_event(event):
+        if event.get("event") != "progress":
+            return
+        report_bytes(progressbar, "verify", event["done"], event["total"])
+        fraction = event["done"] / max(event["total"], 1)
+        ui(progressbar.set_fraction, min(fraction, 1.0))
+        ui(progressbar.set_text, f"Verifying {fraction:.0%}")
+
+    try:
+        # The helper reads the drive without claiming it, so nothing mounted
+        # may change it meanwhile
+        unmount_drive(device_path)
+        ui(status_label.set_text, "Verifying drive against image...")
+        run_helper(["verify", iso, device_path], on_event, cancel)
+        ui(status_label.set_text, "Verification passed")
+        ui(progressbar.set_text, "100%")
+        return True
+    except Exception as e:
+        ui(status_label.set_text, f"Verification failed: {e}")
+        return False
+
+
+# Adds a finished burn to the drive history
+def record_burn(device_path, nbytes, seconds, image, discarded=False):
+    try:
+        identity = get_drive_identity(device_path)
+        history.record_burn(
+            identity, nbytes, seconds, os.path.basename(image), discarded
+        )
     except Exception as e:
-        GLib.idle_add(status_label.set_text, f"Error: {e}")
+        print("Error recording burn:", e)
+
+
+# Adds a finished format to the drive history
+def record_format(device_path, fs, seconds, discarded=False):
+    try:
+        history.record_format(get_drive_identity(device_path), fs, seconds, discarded)
+    except Exception as e:
+        print("Error recording format:", e)
+
+
+# =====================================================
+#  Duplicate
+# =====================================================
+
+# Copies the used part of a source drive (up to its last partition) onto
+# every target in one read pass, verifying each target as it goes.
+# on_update(device, fraction, message) is called in the GTK main loop for
+# the targets. Returns {target: True/False}.
+@tracing.traced("engine")
+def duplicate_drive(
+    source, targets, status_label, progressbar=None, on_update=None, cancel=None
+):
+    targets = [t for t in targets if t != source]
+    if not targets:
+        ui(status_label.set_text, "Select at least one target drive.")
+        return {}
+
+    def on_event(event):
+        if event.get("event") != "progress":
+            return
+        total = max(event["total"], 1)
+        fraction = event["done"] / total
+        ui(status_label.set_text, f"Duplicating {human_size(total)}...")
+        if progressbar:
+            report_bytes(progressbar, "copy", event["done"], event["total"])
+            ui(progressbar.set_fraction, min(fraction, 1.0))
+            ui(progressbar.set_text, f"{fraction:.0%}")
+        if not on_update:
+            return
+        for device, state in event.get("targets", {}).items():
+            if state["error"]:
+                ui(on_update, device, 0.0, f"Failed: {state['error']}")
+            else:
+                ui(
+                    on_update,
+                    device,
+                    state["written"] / total,
+                    f"{state['verified'] / total:.0%} verified",
+                )
+
+    try:
+        for device in [source] + targets:
+            unmount_drive(device)
+        result = run_helper(["clone", source] + targets, on_event, cancel)
+    except Exception as e:
+        ui(status_label.set_text, f"Duplication error: {e}")
+        for device in targets:
+            if on_update:
+                ui(on_update, device, 0.0, "Not written")
+        return {device: False for device in targets}
+
+    results = {}
+    for device, outcome in result["targets"].items():
+        results[device] = outcome["ok"]
+        if on_update:
+            if outcome["ok"]:
+                ui(on_update, device, 1.0, "Done, verified")
+            else:
+                ui(on_update, device, 0.0, f"Failed: {outcome['error']}")
+    ok = sum(results.values())
+    if progressbar:
+        ui(progressbar.set_fraction, 1.0)
+        ui(progressbar.set_text, "100%")
+    ui(
+        status_label.set_text,
+        f"Duplicated {human_size(result['bytes'])} to {ok} of {len(results)} "
+        f"drive(s) in {human_duration(result['seconds'])}",
+    )
+    return results
+
+
+# =====================================================
+#  Benchmark
+# =====================================================
+
+# Benchmarks a drive and stores the result in the drive history.
+# on_done is called in the GTK main loop once the result has been stored.
+@tracing.traced("engine")
+def benchmark_drive(drive_info, status_label, progressbar, on_done=None):
+    device_path = extract_device_path(drive_info)
+    if not device_path:
+        ui(status_label.set_text, "Error: Could not determine device path.")
+        return
+
+    tests = {
+        "seq_read": "sequential read",
+        "seq_write": "sequential write",
+        "rand_read": "4K random read",
+        "rand_write": "4K random write",
+    }
+
+    def on_event(event):
+        if event.get("event") != "progress":
+            return
+        fraction = event["done"] / max(event["total"], 1)
+        ui(progressbar.set_fraction, min(fraction, 1.0))
+        ui(progressbar.set_text, f"{fraction:.0%}")
+        test = tests.get(event.get("test"), "benchmark")
+        ui(status_label.set_text, f"Benchmarking ({test})...")
+
+    try:
+        unmount_drive(device_path)
+        result = run_helper(["bench", device_path], on_event)
+        history.record_benchmark(get_drive_identity(device_path), result)
+        ui(
+            status_label.set_text,
+            f"Read {result['seq_read_mbps']} MB/s, "
+            f"write {result['seq_write_mbps']} MB/s, "
+            f"4K read {result['rand_read_iops']} IOPS, "
+            f"4K write {result['rand_write_iops']} IOPS",
+        )
+        ui(progressbar.set_fraction, 1.0)
+        ui(progressbar.set_text, "100%")
+        if on_done:
+            ui(on_done)
+    except Exception as e:
+        ui(status_label.set_text, f"Benchmark error: {e}")
+
+
+# =====================================================
+#  Surface scan
+# =====================================================
+
+# Runs a destructive write/read-back scan ("quick" or "full") and returns its
+# report: size, real_capacity, bad/aliased regions and per-region throughput
+@tracing.traced("engine")
+def surface_scan(device_path, mode, status_label, cancel=None):
+    phases = {"write": "Writing test pattern", "read": "Reading back test pattern"}
+
+    def on_event(event):
+        if event.get("event") != "progress":
+            return
+        fraction = event["done"] / max(event["total"], 1)
+        phase = phases.get(event["phase"], "Scanning")
+        ui(status_label.set_text, f"{phase}... {fraction:.0%}")
+
+    ui(status_label.set_text, "Starting surface scan...")
+    return run_helper(["scan", "--mode", mode, device_path], on_event, cancel)
+
+
+# Decides what the format step may do with a scan report.
+# Returns (usable bytes, message); usable bytes is None if the drive is unusable.
+def scan_verdict(report):
+    size = report["size"]
+    capacity = report["real_capacity"]
+
+    # Pages beyond the real capacity wrap onto the start of a fake drive;
+    # anything else failing below the real capacity is a genuine defect
+    defects = [
+        r
+        for r in report["regions"]
+        if r["start"] < capacity
+        and (r["kind"] == "bad" or r.get("alias_of", capacity) < capacity)
+    ]
+    if defects:
+        return None, (
+            f"{len(defects)} bad region(s) found, "
+            f"first at {human_size(defects[0]['start'])}"
+        )
+    if capacity < 16 * MiB:
+        return None, (
+            f"drive holds only {human_size(capacity)} "
+            f"of the reported {human_size(size)}"
+        )
+    if capacity < size:
+        return capacity, (
+            f"real capacity is {human_size(capacity)} "
+            f"of the reported {human_size(size)}"
+        )
+    return size, "no bad regions found"
+
+
+# =====================================================
+#  Discard
+# =====================================================
+
+# Returns the discard capabilities of a drive from sysfs as
+# {"max_bytes", "granularity"}, or None when the kernel reports no support
+def discard_support(device_path):
+    name = os.path.basename(os.path.realpath(device_path))
+    queue = f"/sys/class/block/{name}/queue"
+    try:
+        with open(os.path.join(queue, "discard_max_bytes")) as f:
+            max_bytes = int(f.read())
+        with open(os.path.join(queue, "discard_granularity")) as f:
+            granularity = int(f.read())
+    except (OSError, ValueError):
+        return None
+    if not max_bytes:
+        return None
+    return {"max_bytes": max_bytes, "granularity": granularity}
+
+
+# Discards every block of an unmounted drive before a format or burn.
+# Returns the seconds it took, or None if the drive cannot discard; callers
+# then simply carry on without it.
+@tracing.traced("engine")
+def discard_drive(device_path, status_label, cancel=None):
+    if not discard_support(device_path):
+        ui(status_label.set_text, "Drive does not support discard, skipping it")
+        return None
+
+    def on_event(event):
+        if event.get("event") != "progress":
+            return
+        fraction = event["done"] / max(event["total"], 1)
+        ui(status_label.set_text, f"Discarding old data... {fraction:.0%}")
+
+    try:
+        ui(status_label.set_text, "Discarding old data...")
+        result = run_helper(["discard", device_path], on_event, cancel)
+        return result["seconds"]
+    except Exception as e:
+        ui(status_label.set_text, f"Discard failed ({e}), continuing without it")
+        return None
+
+
+# Returns e.g. " (discard took 2 s, ~40 s faster than usual)" for a burn that
+# followed a discard, comparing with the drive's burns without one
+def discard_savings(device_path, nbytes, seconds, discard_seconds):
+    message = f"discard took {human_duration(discard_seconds)}"
+    try:
+        speed = history.plain_burn_speed(get_drive_identity(device_path))
+    except Exception as e:
+        print("Error reading drive history:", e)
+        speed = None
+    if speed:
+        message += _compared_to_usual(
+            nbytes / (speed * 1e6) - seconds - discard_seconds
+        )
+    return f" ({message})"
+
+
+# Returns e.g. "discard took 2 s, format 5 s, ~12 s faster than usual" for a
+# format that followed a discard, comparing with the drive's formats to the
+# same filesystem without one
+def format_savings(device_path, fs, seconds, discard_seconds):
+    message = (
+        f"discard took {human_duration(discard_seconds)}, "
+        f"format {human_duration(seconds)}"
+    )
+    try:
+        usual = history.plain_format_seconds(get_drive_identity(device_path), fs)
+    except Exception as e:
+        print("Error reading drive history:", e)
+        usual = None
+    if usual:
+        message += _compared_to_usual(usual - seconds - discard_seconds)
+    return message
+
+
+def _compared_to_usual(saved):
+    if saved >= 1:
+        return f", ~{human_duration(saved)} faster than usual"
+    return ", no faster than usual"
+
+
+# =====================================================
+#  Erase block probe
+# =====================================================
+
+# Measures the flash erase block size of a drive from read timings. Only
+# reads, so the caller decides when the drive is unmounted. Returns the size
+# in bytes, or None if the timings were inconclusive.
+@tracing.traced("engine")
+def probe_erase_block(device_path, status_label):
+    def on_event(event):
+        if event.get("event") != "progress":
+            return
+        fraction = event["done"] / max(event["total"], 1)
+        ui(status_label.set_text, f"Probing erase block size... {fraction:.0%}")
+
+    try:
+        ui(status_label.set_text, "Probing erase block size...")
+        result = run_helper(["probe", device_path], on_event)
+    except Exception as e:
+        ui(status_label.set_text, f"Probe error: {e}")
+        return None
+    erase = result.get("erase_block")
+    if erase:
+        ui(status_label.set_text, f"Erase block size: {human_size(erase)}")
+    else:
+        ui(status_label.set_text, "Erase block size could not be measured")
+    return erase
 
 
 # =====================================================
@@ -195,6 +1035,7 @@ def write_iso(iso, drive_info, status_label, progressbar):
 # =====================================================
 
 # Unmounts drive and its partitions if they are mounted
+@tracing.traced("engine")
 def unmount_drive(device_path):
     try:
         result = run_cmd(
@@ -221,25 +1062,95 @@ def unmount_drive(device_path):
         print(f"Unmount error: {e}")
 
 
-# Handles full formatting workflow: unmount, format, update GUI status
-def run_format(drive_info, fs, label, cluster_size, status_label, progressbar):
+# Handles full formatting workflow: unmount, optional surface scan, optional
+# discard, format, update GUI status. With align set the partition and
+# filesystem follow the flash erase blocks: erase_block if given, else a
+# measurement when probe is set, else what the drive reports. A cluster_size
+# of None picks the aligned geometry's recommendation (4096 without align).
+# Returns True on success.
+@tracing.traced("engine")
+def run_format(
+    drive_info,
+    fs,
+    label,
+    cluster_size,
+    status_label,
+    progressbar,
+    scan_mode=None,
+    cancel=None,
+    discard=False,
+    align=False,
+    erase_block=None,
+    probe=False,
+):
 
     device_path = extract_device_path(drive_info)
     success = False
 
     if not device_path:
-        GLib.idle_add(status_label.set_text, "Error: Could not determine device path.")
-        return
+        ui(status_label.set_text, "Error: Could not determine device path.")
+        return False
     try:
         unmount_drive(device_path)
-        success = format_drive(device_path, fs, label, cluster_size, status_label)
+
+        # Measured before scan or discard change what the reads see
+        if align and probe and not erase_block:
+            erase_block = probe_erase_block(device_path, status_label)
+
+        size_limit = None
+        if scan_mode:
+            report = surface_scan(device_path, scan_mode, status_label, cancel)
+            size_limit, message = scan_verdict(report)
+            if size_limit is None:
+                ui(status_label.set_text, f"Format refused: {message}")
+                return False
+            if size_limit >= report["size"]:
+                size_limit = None
+
+        discard_seconds = None
+        if discard:
+            discard_seconds = discard_drive(device_path, status_label, cancel)
+
+        if cancel is not None and cancel.is_set():
+            ui(status_label.set_text, "Format cancelled")
+            return False
+
+        plan = None
+        if align:
+            plan = geometry.plan(
+                device_path, fs, size_limit, erase_block, cluster_size
+            )
+        if not cluster_size:
+            cluster_size = plan["cluster_size"] if plan else 4096
+
+        started = time.monotonic()
+        success = format_drive(
+            device_path,
+            fs,
+            label,
+            cluster_size,
+            status_label,
+            size_limit=size_limit,
+            discarded=discard_seconds is not None,
+            plan=plan,
+        )
+        seconds = time.monotonic() - started
+        notes = []
+        if size_limit:
+            notes.append(f"limited to real capacity {human_size(size_limit)}")
+        if discard_seconds is not None:
+            notes.append(format_savings(device_path, fs, seconds, discard_seconds))
         if success:
-            GLib.idle_add(status_label.set_text, "Format complete")
+            record_format(device_path, fs, seconds, discard_seconds is not None)
+        if success and notes:
+            ui(status_label.set_text, f"Format complete ({'; '.join(notes)})")
+        elif success:
+            ui(status_label.set_text, "Format complete")
         else:
-            GLib.idle_add(status_label.set_text, "Format failed")
+            ui(status_label.set_text, "Format failed")
 
     except Exception as e:
-        GLib.idle_add(status_label.set_text, f"Format error: {e}")
+        ui(status_label.set_text, f"Format error: {e}")
 
     finally:
         # Stop the pulsing bar
@@ -250,11 +1161,57 @@ def run_format(drive_info, fs, label, cluster_size, status_label, progressbar):
             progressbar.set_fraction(1.0 if success else 0.0)
             return False
 
-        GLib.idle_add(stop_pulse)
+        ui(stop_pulse)
 
+    return success
 
-# Formats drive with given filesystem, label, and cluster size
-def format_drive(device_path, fs, label, cluster_size, status_label):
+
+# Creates a single partition spanning start..end (parted units) on a fresh table
+@tracing.traced("engine")
+def create_partition(device_path, table, fs, start, end, status_label):
+    # Partition type names parted understands; exFAT shares NTFS's 0x07 id
+    parted_types = {"FAT32": "fat32", "exFAT": "ntfs", "NTFS": "ntfs", "ext4": "ext4"}
+
+    run_cmd(
+        ["pkexec", "parted", "-s", device_path, "mklabel", table],
+        status_label=status_label,
+        critical=True,
+    )
+    run_cmd(
+        [
+            "pkexec",
+            "parted",
+            "-s",
+            device_path,
+            "mkpart",
+            "primary",
+            parted_types[fs],
+            start,
+            end,
+        ],
+        status_label=status_label,
+        critical=True,
+    )
+    # Wait for udev to create the partition node before mkfs opens it
+    run_cmd(["udevadm", "settle"], status_label=None, critical=False)
+
+
+# Formats drive with given filesystem, label, and cluster size.
+# size_limit (bytes) restricts the filesystem to a partition of that size.
+# discarded tells mkfs the drive was just discarded, so it skips work the
+# discard already did. plan (from geometry.plan) lays the partition and
+# filesystem out on flash erase block boundaries.
+@tracing.traced("engine")
+def format_drive(
+    device_path,
+    fs,
+    label,
+    cluster_size,
+    status_label,
+    size_limit=None,
+    discarded=False,
+    plan=None,
+):
     try:
         # Ensure cluster_size is an integer
         cluster_size = int(cluster_size)
@@ -275,56 +1232,57 @@ def format_drive(device_path, fs, label, cluster_size, status_label):
 
         cmd = ["pkexec"]
 
+        # mkfs goes straight onto the whole device unless NTFS or a size
+        # limit (e.g. from a surface scan) needs a partition table
+        target = device_path
+        table = "gpt" if fs == "NTFS" else "msdos"
+        if plan:
+            start, end = f"{plan['start']}B", f"{plan['end'] - 1}B"
+            create_partition(device_path, table, fs, start, end, status_label)
+            target = partition_path(device_path)
+        elif fs == "NTFS" or size_limit:
+            if size_limit:
+                start, end = "1MiB", f"{size_limit // MiB}MiB"
+            else:
+                start, end = "0%", "100%"
+            create_partition(device_path, table, fs, start, end, status_label)
+            target = partition_path(device_path)
+
+        align_args = plan["mkfs_args"] if plan else []
+
         if fs == "FAT32":
             cluster_tmp = cluster_size / 512
-            cmd += [
-                "/usr/sbin/mkfs.vfat",
-                "-F",
-                "32",
-                "-I",
-                "-n",
-                label,
-                "-s",
-                str(int(cluster_tmp)),
-                device_path,
-            ]
+            cmd += ["/usr/sbin/mkfs.vfat", "-F", "32"]
+            if target == device_path:
+                cmd += ["-I"]
+            cmd += align_args
+            cmd += ["-n", label, "-s", str(int(cluster_tmp)), target]
 
         elif fs == "exFAT":
-            cmd += ["mkfs.exfat", "-L", label, "-c", str(cluster_size), device_path]
+            cmd += ["mkfs.exfat", "-L", label, "-c", str(cluster_size)]
+            cmd += align_args + [target]
 
         elif fs == "NTFS":
-            run_cmd(
-                ["pkexec", "parted", "-s", device_path, "mklabel", "gpt"],
-                status_label=status_label,
-                critical=True,
-            )
-            run_cmd(
-                [
-                    "pkexec",
-                    "parted",
-                    "-s",
-                    device_path,
-                    "mkpart",
-                    "primary",
-                    "ntfs",
-                    "0%",
-                    "100%",
-                ],
-                status_label=status_label,
-                critical=True,
-            )
-            part_path = device_path + "1"
-            cmd += ["mkfs.ntfs", "-f", "-L", label, "-c", str(cluster_size), part_path]
+            cmd += ["mkfs.ntfs", "-f", "-L", label, "-c", str(cluster_size), target]
 
         elif fs == "ext4":
-            cmd += ["mkfs.ext4", "-L", label, "-b", str(cluster_size), device_path]
+            cmd += ["mkfs.ext4", "-L", label, "-b", str(cluster_size)]
+            # mke2fs only honours the last -E, so all extended options go in one
+            extended = align_args[1:] if align_args else []
+            if discarded:
+                # No second discard, and inode tables are zeroed lazily by
+                # the kernel after the first mount instead of by mkfs
+                extended.append("nodiscard,lazy_itable_init=1")
+            if extended:
+                cmd += ["-E", ",".join(extended)]
+            cmd += [target]
 
         else:
             raise ValueError("Unsupported filesystem")
 
         try:
             run_cmd(cmd, status_label=status_label, critical=True)
-            GLib.idle_add(status_label.set_text, "Format complete.")
+            ui(status_label.set_text, "Format complete.")
             return True
         except subprocess.CalledProcessError:
             # Error already shown in status_label
@@ -333,17 +1291,133 @@ def format_drive(device_path, fs, label, cluster_size, status_label):
     except Exception as e:
         msg = f"Format error: {e}"
         if status_label:
-            GLib.idle_add(status_label.set_text, msg)
+            ui(status_label.set_text, msg)
         else:
             print(msg)
         return False
 
 
+# =====================================================
+#  Batch format
+# =====================================================
+
+# Builds the label of the index-th drive (from 1) of a batch. A run of "#"
+# is replaced by the zero-padded index ("MYUSB_##" → "MYUSB_01"), otherwise
+# "_01" is appended.
+def batch_label(scheme, index, fs):
+    if "#" in scheme:
+        label = re.sub(r"#+", lambda m: f"{index:0{len(m.group())}d}", scheme, 1)
+    else:
+        label = f"{scheme}_{index:02d}"
+    max_len = 11 if fs == "FAT32" else 255
+    if len(label) > max_len:
+        raise ValueError(f"Label {label} is longer than {max_len} characters")
+    return label
+
+
+# Status label stand-in that forwards messages for one drive of a batch
+class BatchStatus:
+    def __init__(self, device_path, on_update):
+        self.device_path = device_path
+        self.on_update = on_update
+
+    def set_text(self, text):
+        self.on_update(self.device_path, text)
+
+    def set_markup(self, markup):
+        self.on_update(self.device_path, re.sub(r"<[^>]+>", "", markup))
+
+
+# Progress bar stand-in for batch drives, which only report status text
+class BatchProgress:
+    def set_fraction(self, fraction):
+        pass
+
+    def set_text(self, text):
+        pass
+
+    def pulse(self):
+        pass
+
+
+# Formats many drives with the same settings, at most `concurrency` at once,
+# through a single authorization. on_update(device, message) and
+# on_done(results) are called in the GTK main loop; results maps each device
+# to True/False. cancels may map devices to their own cancel events.
+@tracing.traced("engine")
+def run_batch_format(
+    devices,
+    fs,
+    cluster_size,
+    label_scheme,
+    on_update,
+    on_done=None,
+    concurrency=4,
+    cancel=None,
+    discard=False,
+    align=False,
+    cancels=None,
+    probe=False,
+):
+    labels = {
+        device: batch_label(label_scheme, index, fs)
+        for index, device in enumerate(devices, 1)
+    }
+    results = {}
+
+    def format_one(device):
+        device_cancel = (cancels or {}).get(device, cancel)
+        if device_cancel is not None and device_cancel.is_set():
+            ui(on_update, device, "Cancelled")
+            return False
+        ui(on_update, device, "Waiting for USB bandwidth...")
+        try:
+            with use_session(session), job_slot(device, device_cancel):
+                ui(on_update, device, f"Formatting as {labels[device]}...")
+                return run_format(
+                    device,
+                    fs,
+                    labels[device],
+                    cluster_size,
+                    BatchStatus(device, on_update),
+                    BatchProgress(),
+                    cancel=device_cancel,
+                    discard=discard,
+                    align=align,
+                    probe=probe,
+                )
+        except topology.Cancelled:
+            ui(on_update, device, "Cancelled")
+            return False
+
+    try:
+        with elevation_session() as session:
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+                futures = {d: pool.submit(format_one, d) for d in devices}
+                for device, future in futures.items():
+                    try:
+                        results[device] = future.result()
+                    except Exception as e:
+                        ui(on_update, device, f"Format error: {e}")
+                        results[device] = False
+    except Exception as e:
+        for device in devices:
+            if device not in results:
+                ui(on_update, device, f"Format error: {e}")
+                results[device] = False
+
+    if on_done:
+        ui(on_done, results)
+    return results
+
+
 # =====================================================
 #  Verify Hash
 # =====================================================
 
-# Verifies file hash against user input using chosen algorithm
+# Verifies file hash against user input using chosen algorithm.
+# Returns True if the hash matches.
+@tracing.traced("engine")
 def verify_hash(file_path, algo, user_hash, status_label):
     try:
         algo_map = {
@@ -357,16 +1431,19 @@ def verify_hash(file_path, algo, user_hash, status_label):
         computed_hash = result.stdout.split()[0].lower()
 
         if computed_hash == user_hash:
-            GLib.idle_add(
+            ui(
                 status_label.set_markup,
                 f"<span foreground='green'><b>✅ Hash matches!</b></span>\n"
                 f"<small>Computed hash: {computed_hash}</small>",
             )
+            return True
         else:
-            GLib.idle_add(
+            ui(
                 status_label.set_markup,
                 f"<span foreground='red'><b>❌ Hash does not match.</b></span>\n"
                 f"<small>Computed hash: {computed_hash}</small>",
             )
+            return False
     except Exception as e:
-        GLib.idle_add(status_label.set_text, f"Error verifying hash: {e}")
+        ui(status_label.set_text, f"Error verifying hash: {e}")
+        return False
@@ -19,15 +19,61 @@
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import argparse
 import gi
 
 gi.require_version("Gtk", "3.0")
-from gi.repository import Gtk
+from gi.repository import Gtk, GLib
 
+from api import ApiServer
 from gui import Tuxus
+from jobs import JobManager
+import tracing
+
+
+# Parses command line options
+def parse_args():
+    parser = argparse.ArgumentParser(prog="tuxus")
+    parser.add_argument(
+        "--api",
+        action="store_true",
+        help="serve the local job API on a Unix socket",
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="run only the job API, without opening a window",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="record a Chrome trace-event file (same as TUXUS_TRACE=PATH)",
+    )
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    win = Tuxus()
+    args = parse_args()
+    if args.trace:
+        tracing.enable(args.trace)
+
+    if args.headless:
+        server = ApiServer(JobManager()).start()
+        print(f"Tuxus API listening on {server.path}")
+        loop = GLib.MainLoop()
+        try:
+            loop.run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
+        raise SystemExit(0)
+
+    # The window and the API share one job list
+    jobs = JobManager()
+    server = ApiServer(jobs).start() if args.api else None
+
+    win = Tuxus(jobs)
     win.connect("destroy", Gtk.main_quit)
     win.show_all()
 
@@ -52,5 +98,7 @@ if __name__ == "__main__":
     )
 
     Gtk.main()
+    if server:
+        server.stop()
     print("Tuxus terminated successfully. Goodbye!")
 
@@ -0,0 +1,300 @@
+"""
+    Tuxus - ISO burning & USB drive formatting app for Linux
+    Copyright © 2025 santofrancesco
+    Full notice can be found on https://www.github.com/santofrancesco/tuxus/blob/main/LICENSE
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# Asynchronous supervision of external commands.
+#
+# Every command Tuxus starts runs under a single asyncio event loop on one
+# background thread, however many are running at once. The loop learns of
+# exits through pidfds; only on kernels before 5.3 does asyncio fall back to
+# a waitpid thread per command. Output is read
+# incrementally and split into lines on "\n" as well as "\r", so tools that
+# redraw a progress line with carriage returns report every update.
+#
+# spawn() returns a Process handle at once; callers that are already on a
+# worker thread can block on Process.wait(), others pass callbacks.
+
+import asyncio, codecs, os, re, subprocess, sys, threading
+import tracing
+
+# Seconds between asking a process to stop and killing it
+KILL_GRACE = 5.0
+
+# Seconds between checks of a threading.Event passed as cancel=
+CANCEL_POLL = 0.2
+
+LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+# Returns the supervisor event loop, starting its thread on first use
+def get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _watch_children(_loop)
+            threading.Thread(
+                target=_loop.run_forever, name="tuxus-supervisor", daemon=True
+            ).start()
+        return _loop
+
+
+# Makes the loop watch its children through pidfds. Before Python 3.12
+# asyncio otherwise starts a thread per child that blocks in waitpid().
+def _watch_children(loop):
+    if sys.version_info >= (3, 12) or not hasattr(asyncio, "PidfdChildWatcher"):
+        return
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+    except (AttributeError, OSError):
+        return  # Kernel before 5.3: keep the threaded watcher
+    watcher = asyncio.PidfdChildWatcher()
+    watcher.attach_loop(loop)
+    asyncio.set_child_watcher(watcher)
+
+
+# Outcome of a supervised command
+class Result:
+    def __init__(self, cmd, returncode, stdout, stderr, reason=None):
+        self.cmd = cmd
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        # None, "timeout" or "cancelled"
+        self.reason = reason
+
+    @property
+    def timed_out(self):
+        return self.reason == "timeout"
+
+    @property
+    def cancelled(self):
+        return self.reason == "cancelled"
+
+
+# Handle of a running command
+class Process:
+    def __init__(self, cmd, cancel_input=None):
+        self.cmd = list(cmd)
+        self.cancel_input = cancel_input
+        self.reason = None
+        self.proc = None
+        self.future = None
+        self.pending_input = []  # written before the process existed
+
+    @property
+    def pid(self):
+        return self.proc.pid if self.proc else None
+
+    # Blocks until the command exits and returns its Result
+    def wait(self, timeout=None):
+        return self.future.result(timeout)
+
+    def done(self):
+        return self.future.done()
+
+    # Asks the command to stop: writes cancel_input to its stdin if set
+    # (for root helpers that cannot be signalled), otherwise terminates it
+    def cancel(self):
+        get_loop().call_soon_threadsafe(self._stop, "cancelled")
+
+    # Writes text to the command's stdin (spawn with stdin=True)
+    def write(self, text):
+        get_loop().call_soon_threadsafe(self._write, text)
+
+    # Closes the command's stdin, signalling end of input
+    def close_stdin(self):
+        get_loop().call_soon_threadsafe(self._close_stdin)
+
+    def _close_stdin(self):
+        if self.proc and self.proc.stdin and not self.proc.stdin.is_closing():
+            self.proc.stdin.close()
+
+    def _write(self, text):
+        if self.proc is None:
+            self.pending_input.append(text)
+        elif self.proc.stdin and not self.proc.stdin.is_closing():
+            self.proc.stdin.write(text.encode())
+
+    def _stop(self, reason):
+        if self.reason is None:
+            self.reason = reason
+            tracing.instant(reason, "command", cmd=" ".join(self.cmd))
+        if self.proc is None or self.proc.returncode is not None:
+            return
+        if self.cancel_input is not None and self.proc.stdin:
+            self._write(self.cancel_input)
+        else:
+            self._signal("terminate")
+        get_loop().call_later(KILL_GRACE, self._signal, "kill")
+
+    def _signal(self, method):
+        if self.proc is None or self.proc.returncode is not None:
+            return
+        try:
+            getattr(self.proc, method)()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+# Reads a stream to the end, calling on_line for every "\n" or "\r"
+# terminated line. Returns (whole output if capture is set, byte count).
+async def _pump(stream, on_line, capture):
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    parts = []
+    pending = ""
+    nbytes = 0
+    while True:
+        chunk = await stream.read(65536)
+        nbytes += len(chunk)
+        text = decoder.decode(chunk, final=not chunk)
+        if capture:
+            parts.append(text)
+        if on_line:
+            pending += text
+            lines = LINE_BREAK.split(pending)
+            pending = lines.pop() if chunk else ""
+            for line in lines:
+                if line:
+                    on_line(line)
+        if not chunk:
+            return "".join(parts), nbytes
+
+
+async def _watch_cancel(handle, cancel):
+    while not cancel.is_set():
+        await asyncio.sleep(CANCEL_POLL)
+    handle._stop("cancelled")
+
+
+async def _supervise(
+    handle, on_stdout, on_stderr, timeout, cancel, stdin, capture, tid, kwargs
+):
+    loop = asyncio.get_running_loop()
+    started = tracing.now()
+    handle.proc = await asyncio.create_subprocess_exec(
+        *handle.cmd,
+        stdin=subprocess.PIPE if stdin else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        **kwargs,
+    )
+    for text in handle.pending_input:
+        handle._write(text)
+    if handle.reason:
+        handle._stop(handle.reason)
+
+    watchers = []
+    if timeout is not None:
+        watchers.append(loop.call_later(timeout, handle._stop, "timeout"))
+    cancel_task = None
+    if cancel is not None:
+        cancel_task = asyncio.ensure_future(_watch_cancel(handle, cancel))
+
+    try:
+        (stdout, stdout_bytes), (stderr, stderr_bytes) = await asyncio.gather(
+            _pump(handle.proc.stdout, on_stdout, capture),
+            _pump(handle.proc.stderr, on_stderr, True),
+        )
+        returncode = await handle.proc.wait()
+    finally:
+        for watcher in watchers:
+            watcher.cancel()
+        if cancel_task:
+            cancel_task.cancel()
+        if handle.proc.stdin and not handle.proc.stdin.is_closing():
+            handle.proc.stdin.close()
+
+    if tid is not None:
+        # pkexec commands include the time spent waiting for authorization
+        elevated = handle.cmd[0] == "pkexec" and len(handle.cmd) > 1
+        argv = handle.cmd[1:] if elevated else handle.cmd
+        program = os.path.basename(argv[0])
+        if program.startswith("python") and len(argv) > 1:
+            program = os.path.basename(argv[1])
+        tracing.complete(
+            f"pkexec {program}" if elevated else program,
+            "elevation" if elevated else "command",
+            started,
+            tracing.now(),
+            tid,
+            cmd=" ".join(handle.cmd),
+            exit_code=returncode,
+            reason=handle.reason,
+            stdout_bytes=stdout_bytes,
+            stderr_bytes=stderr_bytes,
+        )
+
+    return Result(handle.cmd, returncode, stdout, stderr, handle.reason)
+
+
+# Starts cmd under supervision and returns its Process handle
+def spawn(
+    cmd,
+    on_stdout=None,
+    on_stderr=None,
+    timeout=None,
+    cancel=None,
+    cancel_input=None,
+    stdin=False,
+    capture=True,
+    **kwargs,
+):
+    """
+    Start a command on the supervisor loop.
+
+    Args:
+        cmd (list): Command and arguments.
+        on_stdout, on_stderr (callable, optional): Called with every output
+            line. They run on the supervisor thread and must not block.
+        timeout (float, optional): Seconds before the command is stopped.
+        cancel (threading.Event, optional): Stops the command once set.
+        cancel_input (str, optional): Written to stdin instead of sending a
+            signal when the command is stopped. Implies stdin=True.
+        stdin (bool): Keep a pipe to the command's stdin open.
+        capture (bool): Collect stdout in Result.stdout (stderr always is).
+        kwargs: Extra arguments for asyncio.create_subprocess_exec.
+
+    Returns:
+        Process handle; Process.wait() returns the Result.
+    """
+    handle = Process(cmd, cancel_input)
+    handle.future = asyncio.run_coroutine_threadsafe(
+        _supervise(
+            handle,
+            on_stdout,
+            on_stderr,
+            timeout,
+            cancel,
+            stdin or cancel_input is not None,
+            capture,
+            # Spans belong to the thread that started the command
+            tracing.thread_id() if tracing.enabled() else None,
+            kwargs,
+        ),
+        get_loop(),
+    )
+    return handle
+
+
+# Runs cmd to completion and returns its Result (blocks the calling thread)
+def run(cmd, timeout=None, cancel=None, **kwargs):
+    return spawn(cmd, timeout=timeout, cancel=cancel, **kwargs).wait()
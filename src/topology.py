@@ -0,0 +1,246 @@
+"""
+    Tuxus - ISO burning & USB drive formatting app for Linux
+    Copyright © 2025 santofrancesco
+    Full notice can be found on https://www.github.com/santofrancesco/tuxus/blob/main/LICENSE
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# USB topology of block devices and bandwidth-aware job scheduling.
+#
+# Sticks behind the same hub or root port share one link. Writing to all of
+# them at once oversubscribes it and aggregate throughput drops, so jobs take
+# a slot on every link between their drive and the host controller, and wait
+# while a link's bandwidth budget or job limit is used up.
+
+import contextlib, os, threading
+
+SYSFS_BLOCK = "/sys/class/block"
+
+# Usable bulk throughput in MB/s for a negotiated link speed in Mbit/s
+LINK_BUDGET = {1.5: 0.1, 12: 1, 480: 35, 5000: 400, 10000: 800, 20000: 1600}
+
+# Jobs allowed at once on one link, by link speed in Mbit/s
+LINK_JOBS = {480: 3, 5000: 8}
+
+SPEED_NAMES = {
+    1.5: "USB 1.0 low speed",
+    12: "USB 1.1 full speed",
+    480: "USB 2.0",
+    5000: "USB 3 (5 Gbit/s)",
+    10000: "USB 3 (10 Gbit/s)",
+    20000: "USB 3 (20 Gbit/s)",
+}
+
+
+def _read(path, name):
+    try:
+        with open(os.path.join(path, name)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _speed(path):
+    try:
+        return float(_read(path, "speed"))
+    except (TypeError, ValueError):
+        return None
+
+
+# Returns a readable name for a link speed in Mbit/s
+def speed_name(mbps):
+    if mbps is None:
+        return "unknown speed"
+    return SPEED_NAMES.get(mbps, f"{mbps:g} Mbit/s")
+
+
+# Returns usable MB/s of a link speed in Mbit/s
+def link_budget(mbps):
+    if mbps is None:
+        return None
+    return LINK_BUDGET.get(mbps, mbps / 8 * 0.7)
+
+
+# Resolves the USB path of a block device from sysfs.
+#
+# Returns None for devices that are not on USB, otherwise a dict with:
+#   controller   host controller (e.g. PCI address "0000:00:14.0")
+#   bus          root hub name (e.g. "usb2") and bus_speed_mbps
+#   port         port chain of the device (e.g. "2-1.3")
+#   speed_mbps   negotiated link speed, usb_version the device's USB version
+#   links        [{"name", "speed_mbps"}] from the device up to the root hub
+#   warnings     human readable slow-link warnings
+def usb_topology(device_path):
+    name = os.path.basename(device_path)
+    path = os.path.realpath(os.path.join(SYSFS_BLOCK, name))
+
+    # USB devices and hubs are the ancestors with a busnum attribute
+    links = []
+    while path not in ("/", "/sys", "/sys/devices"):
+        if os.path.exists(os.path.join(path, "busnum")):
+            links.append(
+                {
+                    "name": os.path.basename(path),
+                    "speed_mbps": _speed(path),
+                    "path": path,
+                }
+            )
+        path = os.path.dirname(path)
+    if not links:
+        return None
+
+    device, root = links[0], links[-1]
+    controller_path = os.path.dirname(root["path"])
+    version = _read(device["path"], "version")
+
+    topology = {
+        "controller": os.path.basename(controller_path),
+        "bus": root["name"],
+        "bus_speed_mbps": root["speed_mbps"],
+        "port": device["name"],
+        "speed_mbps": device["speed_mbps"],
+        "usb_version": version,
+        "links": [{"name": l["name"], "speed_mbps": l["speed_mbps"]} for l in links],
+    }
+    topology["warnings"] = _link_warnings(topology, controller_path)
+    return topology
+
+
+def _link_warnings(topology, controller_path):
+    speed = topology["speed_mbps"]
+    warnings = []
+    if speed is None:
+        return warnings
+
+    try:
+        device_major = int(float(topology["usb_version"] or 0))
+    except ValueError:
+        device_major = 0
+
+    # xHCI controllers expose a separate SuperSpeed root hub next to the
+    # USB 2.0 one; a USB 3 stick on the slow one lost its SuperSpeed link
+    try:
+        siblings = [
+            os.path.join(controller_path, n)
+            for n in os.listdir(controller_path)
+            if n.startswith("usb")
+        ]
+    except OSError:
+        siblings = []
+    superspeed_port = any((_speed(p) or 0) >= 5000 for p in siblings)
+
+    if device_major >= 3 and speed < 5000:
+        where = "a USB 3 port" if superspeed_port else "this port"
+        warnings.append(
+            f"USB 3 drive negotiated {speed_name(speed)} on {where}; "
+            "check the cable, hub or port"
+        )
+    elif speed < 480:
+        warnings.append(f"Drive is connected at {speed_name(speed)}")
+
+    slowest = min(
+        (l for l in topology["links"][1:] if l["speed_mbps"]),
+        key=lambda l: l["speed_mbps"],
+        default=None,
+    )
+    if slowest and slowest["speed_mbps"] < speed:
+        limit = speed_name(slowest["speed_mbps"])
+        warnings.append(f"Hub {slowest['name']} limits the drive to {limit}")
+    return warnings
+
+
+# =====================================================
+#  Scheduling
+# =====================================================
+
+# Raised by BandwidthScheduler.slot for a job cancelled while it waited
+class Cancelled(Exception):
+    pass
+
+
+# Hands out job slots so concurrent jobs fit the bandwidth budget and job
+# limit of every link on their path. A job that is alone on its links always
+# runs, so a single slow drive never waits forever.
+class BandwidthScheduler:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.used = {}  # link name -> [MB/s in use, drives]
+
+    # Link name -> (budget MB/s, drive limit) for the links of a topology
+    @staticmethod
+    def _links(topology):
+        links = {}
+        for link in topology["links"][1:]:
+            mbps = link["speed_mbps"]
+            limit = LINK_JOBS.get(mbps, 8 if (mbps or 0) > 5000 else 3)
+            links[link["name"]] = (link_budget(mbps), limit)
+        return links
+
+    # Link name -> [MB/s, drives] a job needs, summed over its drives
+    def _needs(self, drives):
+        needs, limits = {}, {}
+        for topology, demand in drives:
+            if not topology:
+                continue
+            own = link_budget(topology["speed_mbps"]) or 0.0
+            demand = min(demand, own) if demand and own else (demand or own)
+            for name, limit in self._links(topology).items():
+                limits[name] = limit
+                mbps, count = needs.get(name, (0.0, 0))
+                needs[name] = (mbps + demand, count + 1)
+        return needs, limits
+
+    def _fits(self, needs, limits):
+        for name, (demand, count) in needs.items():
+            budget, limit = limits[name]
+            used, drives = self.used.get(name, (0.0, 0))
+            if drives == 0:
+                continue
+            if drives + count > limit or (budget and used + demand > budget):
+                return False
+        return True
+
+    # Blocks until the job fits, then holds its share of every link.
+    # drives lists (topology, demand) for every drive the job reads or
+    # writes; demand is the expected MB/s, None means the drive's own link
+    # speed. Raises Cancelled once cancel is set while the job waits.
+    @contextlib.contextmanager
+    def slot(self, drives, cancel=None):
+        needs, limits = self._needs(drives)
+        with self.condition:
+            while True:
+                if cancel is not None and cancel.is_set():
+                    raise Cancelled("Cancelled while waiting for USB bandwidth")
+                if self._fits(needs, limits):
+                    break
+                self.condition.wait(0.5)
+            for name, (demand, count) in needs.items():
+                used, drives = self.used.get(name, (0.0, 0))
+                self.used[name] = (used + demand, drives + count)
+        try:
+            yield
+        finally:
+            with self.condition:
+                for name, (demand, count) in needs.items():
+                    used, drives = self.used[name]
+                    if drives <= count:
+                        del self.used[name]
+                    else:
+                        self.used[name] = (used - demand, drives - count)
+                self.condition.notify_all()
+
+
+# Shared by every job in the process
+scheduler = BandwidthScheduler()
@@ -0,0 +1,224 @@
+"""
+    Tuxus - ISO burning & USB drive formatting app for Linux
+    Copyright © 2025 santofrancesco
+    Full notice can be found on https://www.github.com/santofrancesco/tuxus/blob/main/LICENSE
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# Built-in tracing, exported as Chrome trace-event JSON.
+#
+# Enable with TUXUS_TRACE=/path/to/trace.json or main.py --trace PATH; the
+# file is written at exit and opens in chrome://tracing or ui.perfetto.dev.
+# When tracing is off, span() returns a shared no-op object and dispatch()
+# returns its argument, so instrumented code pays a single None check.
+
+import atexit, functools, json, os, threading, time
+
+_events = None
+_path = None
+_threads = {}
+_lock = threading.Lock()
+_origin = time.perf_counter_ns()
+_pid = os.getpid()
+
+
+# Turns tracing on; the trace is written to path at exit
+def enable(path):
+    global _events, _path
+    with _lock:
+        if _events is None:
+            _events = []
+            atexit.register(export)
+        _path = path
+
+
+def enabled():
+    return _events is not None
+
+
+# Returns the current time on the trace clock, in nanoseconds
+def now():
+    return time.perf_counter_ns()
+
+
+# Returns the id of the calling thread, remembering its name for the trace
+def thread_id():
+    tid = threading.get_native_id()
+    if tid not in _threads:
+        _threads[tid] = threading.current_thread().name
+    return tid
+
+
+def _record(event):
+    event.setdefault("pid", _pid)
+    with _lock:
+        if _events is not None:
+            _events.append(event)
+
+
+# Records a finished span measured by the caller (start/end from now())
+def complete(name, cat, start, end, tid=None, **args):
+    if _events is None:
+        return
+    _record(
+        {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": (start - _origin) / 1000,
+            "dur": (end - start) / 1000,
+            "tid": tid or thread_id(),
+            "args": args,
+        }
+    )
+
+
+# Records a point in time
+def instant(name, cat, **args):
+    if _events is None:
+        return
+    _record(
+        {
+            "name": name,
+            "cat": cat,
+            "ph": "i",
+            "s": "t",
+            "ts": (now() - _origin) / 1000,
+            "tid": thread_id(),
+            "args": args,
+        }
+    )
+
+
+class _Span:
+    __slots__ = ("name", "cat", "args", "start", "tid")
+
+    def __init__(self, name, cat, args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.tid = thread_id()
+        self.start = now()
+        return self
+
+    # Adds arguments (exit codes, byte counts...) before the span ends
+    def set(self, **args):
+        self.args.update(args)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = repr(exc)
+        complete(self.name, self.cat, self.start, now(), self.tid, **self.args)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def set(self, **args):
+        pass
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+# Context manager timing a block of code:
+#     with tracing.span("format", "engine", fs=fs) as s:
+#         ...
+#         s.set(exit_code=0)
+def span(name, cat="tuxus", **args):
+    if _events is None:
+        return _NO_SPAN
+    return _Span(name, cat, args)
+
+
+# Decorator recording a span for every call of a function, e.g. the engine
+# steps in logic.py. Simple return values (success flags) end up in the span.
+def traced(cat):
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _events is None:
+                return function(*args, **kwargs)
+            with _Span(function.__name__, cat, {}) as s:
+                result = function(*args, **kwargs)
+                if isinstance(result, (bool, int, str)):
+                    s.set(result=result)
+                return result
+
+        return wrapper
+
+    return decorate
+
+
+# Wraps a GUI update queued with GLib.idle_add so the trace shows how long it
+# waited for the main loop and how long it ran
+def dispatch(function):
+    if _events is None:
+        return function
+    queued = now()
+    name = getattr(function, "__qualname__", None) or repr(function)
+
+    def traced(*args):
+        start = now()
+        try:
+            return function(*args)
+        finally:
+            complete(
+                f"dispatch {name}",
+                "gui",
+                start,
+                now(),
+                queued_us=round((start - queued) / 1000, 1),
+            )
+
+    return traced
+
+
+# Writes the trace file
+def export(path=None):
+    path = path or _path
+    with _lock:
+        if _events is None or not path:
+            return
+        events = list(_events)
+        threads = dict(_threads)
+
+    metadata = [
+        {"name": "process_name", "ph": "M", "pid": _pid, "args": {"name": "tuxus"}}
+    ] + [
+        {
+            "name": "thread_name",
+            "ph": "M",
+            "pid": _pid,
+            "tid": tid,
+            "args": {"name": name},
+        }
+        for tid, name in threads.items()
+    ]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+
+
+if os.environ.get("TUXUS_TRACE"):
+    enable(os.environ["TUXUS_TRACE"])
@@ -0,0 +1,87 @@
+# Shared fixtures: the modules under src/ with fake drives and engines, so
+# the tests need neither hardware, root nor a display.
+
+import contextlib, os, sys, threading, time, types
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+# logic.py imports GLib only to hand GUI updates to the main loop. Without
+# PyGObject (e.g. on CI) those updates simply run at once.
+try:
+    import gi  # noqa: F401
+except ImportError:
+    GLib = types.SimpleNamespace(
+        idle_add=lambda function, *args: function(*args),
+        timeout_add=lambda interval, function, *args: function(*args),
+        source_remove=lambda source: None,
+        markup_escape_text=lambda text: text,
+    )
+    sys.modules["gi"] = types.SimpleNamespace(require_version=lambda *args: None)
+    sys.modules["gi.repository"] = types.SimpleNamespace(GLib=GLib)
+
+import jobs, logic  # noqa: E402
+
+
+# Removable drives the fake enumeration reports; tests add and remove some
+@pytest.fixture
+def drives(monkeypatch):
+    present = ["/dev/sdb", "/dev/sdc"]
+    monkeypatch.setattr(
+        logic, "list_usb_drives", lambda: [{"device": d} for d in present]
+    )
+    monkeypatch.setattr(logic, "job_slot", lambda *a, **k: contextlib.nullcontext())
+    return present
+
+
+# Replaces the operations with fakes that hold until released and record
+# their calls; engine.release() lets every running job finish
+class FakeEngine:
+    def __init__(self):
+        self.calls = []
+        self.released = threading.Event()
+
+    def run(self, job, status, progress):
+        self.calls.append((job.op, dict(job.params)))
+        status.set_text("working")
+        progress.set_fraction(0.5)
+        while not self.released.wait(0.01):
+            if job.cancel_event.is_set():
+                return False
+        return True
+
+    def release(self):
+        self.released.set()
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    fake = FakeEngine()
+    operations = {
+        op: (fake.run, required) for op, (_, required) in jobs.OPERATIONS.items()
+    }
+    monkeypatch.setattr(jobs, "OPERATIONS", operations)
+    yield fake
+    fake.release()
+
+
+@pytest.fixture
+def manager(drives, engine, monkeypatch):
+    # Auto rules are checked explicitly with check_rules()
+    monkeypatch.setattr(jobs, "WATCH_INTERVAL", 3600)
+    return jobs.JobManager()
+
+
+# Returns a function that waits until a job left the queued/running state
+@pytest.fixture
+def wait_finished():
+    def wait(job, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while job.active:
+            if time.monotonic() > deadline:
+                raise AssertionError(f"job {job.id} still {job.state}")
+            time.sleep(0.01)
+        return job
+
+    return wait
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+import api
+
+
+@pytest.fixture
+def client(manager, tmp_path):
+    server = api.ApiServer(manager, str(tmp_path / "tuxus.sock")).start()
+    connection = api.Client(server.path)
+    yield connection
+    connection.close()
+    server.stop()
+
+
+def test_devices(client):
+    assert client.call("devices") == [{"device": "/dev/sdb"}, {"device": "/dev/sdc"}]
+
+
+def test_submit_and_query_jobs(client, engine):
+    job = client.call("submit", op="format", device="/dev/sdb", fs="ext4")
+    assert job["op"] == "format" and job["params"]["device"] == "/dev/sdb"
+    assert [j["id"] for j in client.call("jobs")] == [job["id"]]
+    assert client.call("job", job=job["id"])["id"] == job["id"]
+
+    assert client.call("cancel", job=job["id"])["id"] == job["id"]
+    engine.release()
+    while client.call("job", job=job["id"])["state"] in ("queued", "running"):
+        time.sleep(0.01)
+    assert client.call("clear") == [job["id"]]
+    assert client.call("jobs") == []
+
+
+def test_submit_rejects_other_drives(client):
+    with pytest.raises(RuntimeError, match="not a removable USB drive"):
+        client.call("submit", op="format", device="/dev/sda")
+    with pytest.raises(RuntimeError, match="No such job"):
+        client.call("job", job=42)
+    with pytest.raises(RuntimeError, match="Unknown method"):
+        client.call("reboot")
+    assert client.call("jobs") == []
+
+
+def test_failing_method_keeps_connection(client, monkeypatch):
+    def fail():
+        raise OSError("sysfs went away")
+
+    monkeypatch.setattr(api.logic, "list_usb_drives", fail)
+    with pytest.raises(RuntimeError, match="devices failed: sysfs went away"):
+        client.call("devices")
+    assert client.call("jobs") == []
+
+
+def test_malformed_request_keeps_connection(client):
+    client.file.write("not json\n")
+    client.file.flush()
+    assert client.receive() == {"id": None, "error": "Malformed request"}
+    assert client.call("jobs") == []
+
+
+def test_subscription_streams_events(client):
+    subscriber = api.Client(client.sock.getpeername())
+    assert subscriber.call("subscribe") == "subscribed"
+    client.call("submit", op="format", device="/dev/sdb")
+    event = subscriber.receive()
+    assert event["event"] == "job" and event["job"]["state"] == "queued"
+    subscriber.close()
+
+
+def test_closed_subscriber_is_dropped(client, manager, monkeypatch):
+    monkeypatch.setattr(api, "STREAM_POLL", 0.01)
+    subscriber = api.Client(client.sock.getpeername())
+    subscriber.call("subscribe")
+    assert len(manager.subscribers) == 1
+    subscriber.close()
+
+    deadline = time.monotonic() + 5
+    while manager.subscribers and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not manager.subscribers
@@ -0,0 +1,171 @@
+import errno, json, os, shutil, subprocess, sys
+
+import pytest
+
+import blockio, logic
+from blockio import MiB
+
+HELPER = blockio.__file__
+
+
+# Attaches image files of the given sizes as loop devices (root only)
+@pytest.fixture
+def loop_devices(tmp_path):
+    if os.geteuid() != 0 or not shutil.which("losetup"):
+        pytest.skip("loop devices need root and losetup")
+    devices = []
+
+    def attach(size):
+        image = tmp_path / f"drive{len(devices)}.img"
+        image.write_bytes(os.urandom(size) if not devices else bytes(size))
+        result = subprocess.run(
+            ["losetup", "-f", "--show", str(image)], capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            pytest.skip(f"losetup failed: {result.stderr.strip()}")
+        devices.append(result.stdout.strip())
+        return devices[-1]
+
+    yield attach
+    for device in devices:
+        subprocess.run(["losetup", "-d", device])
+
+
+# Waits for a blockio.py run and returns its events
+def events(process):
+    stdout, _ = process.communicate(timeout=60)
+    return [json.loads(line) for line in stdout.splitlines()]
+
+
+def test_read_only_opens_share_the_drive(loop_devices):
+    device = loop_devices(1 * MiB)
+    first = blockio.open_device(device, os.O_RDONLY, exclusive=False)
+    try:
+        os.close(blockio.open_device(device, os.O_RDONLY, exclusive=False))
+    finally:
+        os.close(first)
+
+    # Writers still claim the drive for themselves
+    first = blockio.open_device(device)
+    try:
+        with pytest.raises(OSError) as e:
+            blockio.open_device(device)
+        assert e.value.errno == errno.EBUSY
+    finally:
+        os.close(first)
+
+
+def test_two_clones_of_one_source(loop_devices):
+    source = loop_devices(32 * MiB)
+    targets = [loop_devices(32 * MiB), loop_devices(32 * MiB)]
+    runs = [
+        subprocess.Popen(
+            [sys.executable, HELPER, "clone", source, target],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for target in targets
+    ]
+    outcomes = [events(run)[-1] for run in runs]
+    for target, outcome in zip(targets, outcomes):
+        assert outcome["event"] == "result", outcome
+        assert outcome["targets"] == {target: {"ok": True, "error": None}}
+    with open(source, "rb") as f:
+        data = f.read()
+    for target in targets:
+        with open(target, "rb") as f:
+            assert f.read() == data
+
+
+# =====================================================
+#  Surface scan
+# =====================================================
+
+PAGE = blockio.PAGE
+
+
+def test_merge_regions():
+    failures = [
+        (3 * PAGE, "bad", None),
+        (0, "aliased", 16 * MiB),
+        (PAGE, "aliased", 16 * MiB + PAGE),
+        (2 * PAGE, "bad", None),
+        (8 * PAGE, "bad", None),
+    ]
+    assert blockio.merge_regions(failures) == [
+        {"start": 0, "end": 2 * PAGE, "kind": "aliased", "alias_of": 16 * MiB},
+        {"start": 2 * PAGE, "end": 4 * PAGE, "kind": "bad"},
+        {"start": 8 * PAGE, "end": 9 * PAGE, "kind": "bad"},
+    ]
+    assert blockio.merge_regions([]) == []
+
+
+def test_real_capacity():
+    samples = [(offset, MiB) for offset in range(0, 64 * MiB, 8 * MiB)]
+    assert blockio.real_capacity(64 * MiB, samples, []) == 64 * MiB
+
+    # Wrap-around: the smallest distance between a page and its tag
+    wrapped = [(0, "aliased", 48 * MiB), (16 * MiB, "aliased", 48 * MiB)]
+    assert blockio.real_capacity(64 * MiB, samples, wrapped) == 32 * MiB
+
+    # Dropped writes: every sample from 40 MiB on failed
+    dropped = [
+        (offset + page, "bad", None)
+        for offset in range(40 * MiB, 64 * MiB, 8 * MiB)
+        for page in range(0, MiB, PAGE)
+    ]
+    assert blockio.real_capacity(64 * MiB, samples, dropped) == 40 * MiB
+
+
+# Scans a sparse file standing in for a fake drive: it reports size bytes
+# but keeps only real, and wrap=True maps writes past it onto the start
+# while wrap=False drops them and reads zeros.
+def fake_scan(tmp_path, monkeypatch, capsys, size, real, wrap):
+    path = tmp_path / "fake.img"
+    with open(path, "wb") as f:
+        f.truncate(real)
+    pwritev, preadv = os.pwritev, os.preadv
+
+    def write(fd, buffers, offset):
+        if offset >= real and not wrap:
+            return sum(len(b) for b in buffers)
+        return pwritev(fd, buffers, offset % real)
+
+    def read(fd, buffers, offset):
+        if offset >= real and not wrap:
+            buffers[0][:] = bytes(len(buffers[0]))
+            return len(buffers[0])
+        return preadv(fd, buffers, offset % real)
+
+    monkeypatch.setattr(os, "pwritev", write)
+    monkeypatch.setattr(os, "preadv", read)
+    monkeypatch.setattr(blockio, "device_size", lambda fd: size)
+    capsys.readouterr()
+    blockio.surface_scan(str(path), "quick")
+    lines = capsys.readouterr().out.splitlines()
+    return json.loads(lines[-1])
+
+
+def test_scan_finds_wrap_around_fake(tmp_path, monkeypatch, capsys):
+    report = fake_scan(tmp_path, monkeypatch, capsys, 64 * MiB, 16 * MiB, True)
+    assert report["event"] == "result"
+    assert report["real_capacity"] == 16 * MiB
+    regions = report["regions"]
+    assert regions and all(r["kind"] == "aliased" for r in regions)
+    assert all(r["alias_of"] > r["start"] for r in regions)
+
+    capacity, _ = logic.scan_verdict(report)
+    assert capacity == 16 * MiB
+
+
+def test_scan_finds_dropped_writes(tmp_path, monkeypatch, capsys):
+    report = fake_scan(tmp_path, monkeypatch, capsys, 64 * MiB, 24 * MiB, False)
+    assert report["real_capacity"] == 24 * MiB
+    assert all(r["kind"] == "bad" for r in report["regions"])
+    assert logic.scan_verdict(report)[0] == 24 * MiB
+
+
+def test_scan_of_genuine_drive(tmp_path, monkeypatch, capsys):
+    report = fake_scan(tmp_path, monkeypatch, capsys, 32 * MiB, 32 * MiB, True)
+    assert report["real_capacity"] == 32 * MiB and report["regions"] == []
@@ -0,0 +1,215 @@
+import hashlib, threading
+
+import pytest
+
+import checksums
+import logic
+
+SECTOR = checksums.SECTOR
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "distro.iso"
+    path.write_bytes(b"image data" * 1000)
+    return path
+
+
+def digest(path, algo):
+    return hashlib.new(algo, path.read_bytes()).hexdigest()
+
+
+def test_gnu_sums_file(image):
+    sha256 = digest(image, "sha256")
+    (image.parent / "SHA256SUMS").write_text(
+        f"{'0' * 64}  other.iso\n{sha256}  ./distro.iso\n"
+    )
+    assert checksums.find_sidecar(str(image)) == {
+        "algo": "sha256",
+        "expected": sha256,
+        "source": str(image.parent / "SHA256SUMS"),
+    }
+
+
+def test_binary_marker_and_upper_case(image):
+    md5 = digest(image, "md5")
+    (image.parent / "distro.iso.md5").write_text(f"{md5.upper()} *distro.iso\n")
+    checksum = checksums.find_sidecar(str(image))
+    assert checksum["algo"] == "md5" and checksum["expected"] == md5
+
+
+def test_bsd_lines_pick_the_requested_algorithm(image):
+    sha256 = digest(image, "sha256")
+    (image.parent / "distro-CHECKSUM").write_text(
+        "# Fedora style\n"
+        f"SHA1 (distro.iso) = {digest(image, 'sha1')}\n"
+        f"SHA256 (distro.iso) = {sha256}\n"
+    )
+    path = str(image.parent / "distro-CHECKSUM")
+    assert checksums.parse_checksum_file(path, str(image), "sha256") == sha256
+    assert checksums.parse_checksum_file(path, str(image), "sha512") is None
+    # The strongest algorithm wins when looking for any sidecar
+    assert checksums.find_sidecar(str(image))["algo"] == "sha256"
+
+
+def test_sums_for_other_files_are_ignored(image):
+    (image.parent / "SHA256SUMS").write_text(f"{'a' * 64}  other.iso\n")
+    (image.parent / "MD5SUMS").write_text(f"{'b' * 31}  distro.iso\n")
+    assert checksums.find_sidecar(str(image)) is None
+
+
+def test_bare_digest_sidecar(image):
+    sha1 = digest(image, "sha1")
+    (image.parent / "distro.sha1").write_text(sha1 + "\n")
+    assert checksums.find_sidecar(str(image))["expected"] == sha1
+
+
+# Builds an ISO with an implantisomd5 style checksum. Like implantisomd5 it
+# hashes the volume up to the skipped last sectors with the application use
+# area as spaces.
+def implanted_iso(path, sectors=40, skip=15):
+    data = bytearray(b"x" * sectors * SECTOR)
+    pvd = checksums.PVD_OFFSET
+    data[pvd : pvd + 6] = b"\x01CD001"
+    data[pvd + 80 : pvd + 84] = sectors.to_bytes(4, "little")
+    appdata = slice(checksums.APPDATA_OFFSET, checksums.APPDATA_OFFSET + 512)
+    data[appdata] = b" " * 512
+    md5 = hashlib.md5(data[: (sectors - skip) * SECTOR]).hexdigest()
+    fields = f"ISO MD5SUM = {md5};SKIPSECTORS = {skip};RHLISCHECKED = 1"
+    data[appdata] = fields.encode().ljust(512)
+    path.write_bytes(data)
+    return md5
+
+
+def test_implanted_md5(tmp_path):
+    path = tmp_path / "implanted.iso"
+    md5 = implanted_iso(path)
+    assert checksums.find_implanted_md5(str(path)) == {
+        "algo": "isomd5",
+        "expected": md5,
+        "length": 25 * SECTOR,
+        "source": "implanted ISO MD5",
+    }
+    assert checksums.find_checksum(str(path))["algo"] == "isomd5"
+
+
+def test_plain_file_has_no_implanted_md5(image):
+    assert checksums.find_implanted_md5(str(image)) is None
+
+
+@pytest.mark.parametrize("chunk", [checksums.CHUNK, 1000])
+def test_image_check_blanks_appdata(tmp_path, monkeypatch, chunk):
+    # Small chunks split the application use area between reads
+    monkeypatch.setattr(checksums, "CHUNK", chunk)
+    path = tmp_path / "implanted.iso"
+    implanted_iso(path)
+    check = checksums.ImageCheck(str(path), checksums.find_implanted_md5(str(path)))
+    assert check.done.wait(5)
+    assert check.ok is True and check.fraction == 1.0
+
+
+def test_image_check_ignores_skipped_sectors(tmp_path):
+    path = tmp_path / "implanted.iso"
+    implanted_iso(path)
+    checksum = checksums.find_implanted_md5(str(path))
+    with open(path, "r+b") as f:
+        f.seek(30 * SECTOR)
+        f.write(b"changed")
+    check = checksums.ImageCheck(str(path), checksum)
+    assert check.done.wait(5) and check.ok is True
+
+    with open(path, "r+b") as f:
+        f.seek(20 * SECTOR)
+        f.write(b"changed")
+    check = checksums.ImageCheck(str(path), checksum)
+    assert check.done.wait(5) and check.ok is False
+
+
+# =====================================================
+#  Burning against a checksum
+# =====================================================
+
+
+class Widget:
+    threadsafe = True
+
+    def __init__(self):
+        self.text = None
+
+    def set_text(self, text):
+        self.text = text
+
+    def set_fraction(self, fraction):
+        pass
+
+
+# Stands in for blockio.py write --await-commit: waits for the verdict on
+# stdin and fails like the helper when told to abort
+class FakeWriter:
+    def __init__(self):
+        self.input = []
+        self.args = None
+        self.spawned = threading.Event()
+        self.decided = threading.Event()
+
+    def write(self, text):
+        self.input.append(text)
+        self.decided.set()
+
+    def run_helper(self, args, on_event=None, cancel=None, on_spawn=None):
+        self.args = args
+        on_spawn(self)
+        self.spawned.set()
+        self.decided.wait(5)
+        if self.input != ["commit\n"]:
+            raise RuntimeError("Image rejected, the start of the drive was wiped")
+        return {"bytes": 10000, "seconds": 1.0}
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    fake = FakeWriter()
+    monkeypatch.setattr(logic, "run_helper", fake.run_helper)
+    monkeypatch.setattr(logic, "unmount_drive", lambda device: None)
+    monkeypatch.setattr(logic, "record_burn", lambda *args, **kwargs: None)
+    return fake
+
+
+def test_burn_commits_matching_image(image, writer):
+    (image.parent / "SHA256SUMS").write_text(f"{digest(image, 'sha256')}  distro.iso")
+    status = Widget()
+    assert logic.write_iso(str(image), "/dev/sdb", status, Widget())
+    assert "--await-commit" in writer.args
+    assert writer.input == ["commit\n"]
+    assert status.text.endswith("image checksum verified (SHA256 from SHA256SUMS)")
+
+
+def test_burn_aborts_corrupt_image(image, writer, monkeypatch):
+    # The hash only finishes once the write is under way
+    run = checksums.ImageCheck.run
+    monkeypatch.setattr(
+        checksums.ImageCheck, "run", lambda check: writer.spawned.wait(5) and run(check)
+    )
+    (image.parent / "SHA256SUMS").write_text(f"{'0' * 64}  distro.iso")
+    status = Widget()
+    assert not logic.write_iso(str(image), "/dev/sdb", status, Widget())
+    assert writer.input == ["abort\n"]
+    assert status.text == (
+        "Image is corrupt: it does not match the SHA256 from SHA256SUMS "
+        "(Image rejected, the start of the drive was wiped)"
+    )
+
+
+def test_corrupt_image_found_early_never_touches_the_drive(image, writer, monkeypatch):
+    # The hash finishes while the drive is unmounted
+    def unmount(device):
+        for thread in threading.enumerate():
+            if thread.name == "tuxus-image-check":
+                thread.join(5)
+
+    monkeypatch.setattr(logic, "unmount_drive", unmount)
+    (image.parent / "SHA256SUMS").write_text(f"{'0' * 64}  distro.iso")
+    status = Widget()
+    assert not logic.write_iso(str(image), "/dev/sdb", status, Widget())
+    assert writer.args is None
+    assert status.text.endswith("(drive left untouched)")
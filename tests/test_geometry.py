@@ -0,0 +1,102 @@
+import pytest
+
+import geometry
+from geometry import KiB, MiB
+
+
+# Builds /sys/class/block/<name> for a fake drive and returns its device path
+@pytest.fixture
+def sysfs(tmp_path, monkeypatch):
+    monkeypatch.setattr(geometry, "SYSFS_BLOCK", str(tmp_path))
+
+    def make(name="sdb", size=8 * 1024 * MiB, **queue):
+        base = tmp_path / name
+        (base / "queue").mkdir(parents=True)
+        (base / "device").mkdir()
+        (base / "size").write_text(f"{size // 512}\n")
+        for attr, value in queue.items():
+            folder = "device" if attr == "preferred_erase_size" else "queue"
+            (base / folder / attr).write_text(f"{value}\n")
+        return f"/dev/{name}"
+
+    return make
+
+
+def test_device_limits(sysfs):
+    device = sysfs(size=1024 * MiB, logical_block_size=512, discard_granularity=512)
+    limits = geometry.device_limits(device)
+    assert limits["size"] == 1024 * MiB
+    assert limits["physical_block_size"] == 512
+    assert limits["discard_granularity"] == 512
+    assert limits["preferred_erase_size"] == 0
+
+
+def test_erase_block_priority(sysfs):
+    limits = geometry.device_limits(
+        sysfs(
+            preferred_erase_size=8 * MiB,
+            discard_granularity=2 * MiB,
+            optimal_io_size=1 * MiB,
+        )
+    )
+    assert geometry.erase_block(limits, 16 * MiB) == (16 * MiB, "measured")
+    assert geometry.erase_block(limits) == (8 * MiB, "SD card erase size")
+    limits["preferred_erase_size"] = 0
+    assert geometry.erase_block(limits) == (2 * MiB, "discard granularity")
+
+
+def test_erase_block_ignores_implausible_sizes(sysfs):
+    # 512 byte discard granularity and a 3 MiB "power of two" are not erase blocks
+    limits = geometry.device_limits(
+        sysfs(discard_granularity=512, optimal_io_size=3 * MiB)
+    )
+    assert geometry.erase_block(limits) == (geometry.DEFAULT_ERASE_BLOCK, "default")
+    assert geometry.erase_block(limits, 64 * MiB)[1] == "default"
+
+
+def test_plan_aligns_partition_to_erase_blocks(sysfs):
+    device = sysfs(size=8 * 1024 * MiB + 3 * KiB, discard_granularity=8 * MiB)
+    plan = geometry.plan(device, "exFAT")
+    assert plan["erase_block"] == 8 * MiB
+    assert plan["start"] == 8 * MiB
+    assert plan["end"] % (8 * MiB) == 0
+    assert plan["end"] <= 8 * 1024 * MiB - geometry.GPT_BACKUP
+    assert plan["mkfs_args"] == ["-b", str(8 * MiB)]
+
+
+def test_plan_starts_at_one_mib_at_least(sysfs):
+    plan = geometry.plan(sysfs(discard_granularity=256 * KiB), "ext4")
+    assert plan["start"] == 1 * MiB
+    assert plan["cluster_size"] == 4 * KiB
+
+
+def test_plan_keeps_recommendation_for_explicit_cluster(sysfs):
+    plan = geometry.plan(sysfs(), "ext4", cluster_size=1 * KiB)
+    assert plan["cluster_size"] == 4 * KiB
+    assert plan["mkfs_args"] == ["-E", "stride=4096,stripe_width=4096"]
+
+
+def test_plan_size_limit(sysfs):
+    plan = geometry.plan(sysfs(), "FAT32", size_limit=256 * MiB)
+    assert plan["end"] == 252 * MiB
+
+
+def test_mkfs_args():
+    assert geometry.mkfs_args("FAT32", 32 * KiB, 4 * MiB) == ["-R", "8192"]
+    assert geometry.mkfs_args("FAT32", 32 * KiB, 4 * MiB, 4096) == ["-R", "1024"]
+    assert geometry.mkfs_args("FAT32", 32 * KiB, 32 * MiB) == ["-R", "65535"]
+    assert geometry.mkfs_args("exFAT", 32 * KiB, 4 * MiB) == ["-b", str(4 * MiB)]
+    assert geometry.mkfs_args("ext4", 4 * KiB, 4 * MiB) == [
+        "-E",
+        "stride=1024,stripe_width=1024",
+    ]
+    assert geometry.mkfs_args("NTFS", 4 * KiB, 4 * MiB) == []
+
+
+def test_fat32_cluster_leaves_enough_clusters():
+    assert geometry.recommended_cluster("FAT32", 32 * 1024 * MiB, 4 * MiB) == 32 * KiB
+    for size in (64 * MiB, 256 * MiB, 1024 * MiB):
+        cluster = geometry.recommended_cluster("FAT32", size, 4 * MiB)
+        assert size // cluster >= geometry.FAT32_MIN_CLUSTERS
+    # Never larger than an erase block
+    assert geometry.recommended_cluster("exFAT", 64 * 1024 * MiB, 16 * KiB) == 16 * KiB
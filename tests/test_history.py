@@ -0,0 +1,136 @@
+import itertools, sqlite3
+
+import pytest
+
+import history, logic
+
+STICK = {"vendor": "Acme ", "model": "Flash", "serial": "0001"}
+TWIN = {"vendor": "Acme", "model": "Flash", "serial": "0002"}
+OTHER = {"vendor": "Other", "model": "Disk", "serial": "0003"}
+
+
+# Keeps the database under tmp_path and makes every record a second newer
+@pytest.fixture(autouse=True)
+def database(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path))
+    clock = itertools.count(1000)
+    monkeypatch.setattr(history.time, "time", lambda: next(clock))
+    return tmp_path / "tuxus" / "history.db"
+
+
+def benchmark(read=90.0, write=25.0, rand_read=1500.0, rand_write=300.0):
+    return {
+        "seq_read_mbps": read,
+        "seq_write_mbps": write,
+        "rand_read_iops": rand_read,
+        "rand_write_iops": rand_write,
+    }
+
+
+def test_schema_and_drive_key(database):
+    history.record_benchmark(STICK, benchmark())
+    with sqlite3.connect(database) as conn:
+        rows = conn.execute("SELECT vendor, model, serial FROM benchmarks").fetchall()
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master")}
+    assert rows == [("Acme", "Flash", "0001")]
+    assert {"benchmarks", "burns", "formats", "formats_drive"} <= tables
+
+
+def test_old_database_gains_discarded_column(database):
+    database.parent.mkdir(parents=True)
+    with sqlite3.connect(database) as conn:
+        conn.execute(
+            "CREATE TABLE burns (vendor TEXT NOT NULL, model TEXT NOT NULL,"
+            " serial TEXT NOT NULL, timestamp REAL NOT NULL, image TEXT,"
+            " bytes INTEGER NOT NULL, seconds REAL NOT NULL)"
+        )
+    history.record_burn(STICK, 100_000_000, 10.0, discarded=True)
+    assert history.plain_burn_speed(STICK) is None
+
+
+def test_latest_benchmark_in_drive_list():
+    drive = {"identity": STICK}
+    assert logic.benchmark_summary(drive) == ""
+    history.record_benchmark(STICK, benchmark())
+    history.record_benchmark(STICK, benchmark(read=100.0, rand_write=250.0))
+    history.record_benchmark(OTHER, benchmark(read=5.0))
+    assert history.latest_benchmark(STICK)["seq_read_mbps"] == 100.0
+    assert logic.benchmark_summary(drive) == (
+        "read 100 MB/s, write 25 MB/s, 4K 1500/250 IOPS"
+    )
+
+    # A benchmark cut short leaves gaps
+    history.record_benchmark(STICK, {"seq_read_mbps": 80.0})
+    assert logic.benchmark_summary(drive) == ""
+
+
+def test_burns_ignore_empty_runs():
+    history.record_burn(STICK, 0, 5.0)
+    history.record_burn(STICK, 100, 0)
+    assert history.expected_write_speed(STICK) is None
+
+
+def test_expected_write_speed_rollup():
+    assert history.expected_write_speed(STICK) is None
+
+    # Same model, another stick
+    history.record_benchmark(TWIN, benchmark(write=12.0))
+    assert history.expected_write_speed(STICK) == 12.0
+    history.record_burn(TWIN, 100_000_000, 10.0)
+    assert history.expected_write_speed(STICK) == 10.0
+
+    # This stick's own benchmark, then its own burns, win
+    history.record_benchmark(STICK, benchmark(write=30.0))
+    assert history.expected_write_speed(STICK) == 30.0
+    for seconds in (4.0, 5.0, 20.0):
+        history.record_burn(STICK, 100_000_000, seconds)
+    assert history.expected_write_speed(STICK) == 20.0  # median
+
+
+def test_only_recent_burns_count(monkeypatch):
+    monkeypatch.setattr(history, "RECENT_BURNS", 3)
+    for seconds in (1.0, 1.0, 1.0, 10.0, 10.0, 10.0):
+        history.record_burn(STICK, 100_000_000, seconds)
+    assert history.expected_write_speed(STICK) == 10.0
+
+
+def test_plain_burn_speed_skips_discarded_burns():
+    history.record_burn(STICK, 100_000_000, 10.0)
+    history.record_burn(STICK, 100_000_000, 2.0, discarded=True)
+    assert history.plain_burn_speed(STICK) == 10.0
+    assert history.plain_burn_speed(TWIN) == 10.0
+    assert history.plain_burn_speed(OTHER) is None
+
+
+def test_speed_hint():
+    drive = {"identity": STICK}
+    assert logic.speed_hint(drive) == ""
+    history.record_burn(STICK, 250_000_000, 10.0)
+    assert logic.speed_hint(drive) == " [~25 MB/s]"
+    assert logic.speed_hint(drive, 6_000_000_000) == " [~25 MB/s, ~4 min]"
+    assert logic.speed_hint(drive, 500_000_000) == " [~25 MB/s, ~20 s]"
+
+
+def test_plain_format_seconds():
+    history.record_format(STICK, "vfat", 0)
+    assert history.plain_format_seconds(STICK, "vfat") is None
+    history.record_format(STICK, "vfat", 20.0)
+    history.record_format(STICK, "vfat", 3.0, discarded=True)
+    history.record_format(STICK, "ext4", 60.0)
+    assert history.plain_format_seconds(STICK, "vfat") == 20.0
+    assert history.plain_format_seconds(TWIN, "ext4") == 60.0
+    assert history.plain_format_seconds(OTHER, "vfat") is None
+
+
+def test_format_savings(monkeypatch):
+    monkeypatch.setattr(logic, "get_drive_identity", lambda device: STICK)
+    assert logic.format_savings("/dev/sdb", "vfat", 5.0, 2.0) == (
+        "discard took 2 s, format 5 s"
+    )
+    history.record_format(STICK, "vfat", 20.0)
+    assert logic.format_savings("/dev/sdb", "vfat", 5.0, 2.0) == (
+        "discard took 2 s, format 5 s, ~13 s faster than usual"
+    )
+    assert logic.format_savings("/dev/sdb", "vfat", 15.0, 5.0) == (
+        "discard took 5 s, format 15 s, no faster than usual"
+    )
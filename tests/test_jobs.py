@@ -0,0 +1,210 @@
+import time
+
+import pytest
+
+import jobs
+
+
+def test_submit_runs_job(manager, engine, wait_finished):
+    job = manager.submit("format", {"device": "/dev/sdb", "fs": "ext4"})
+    engine.release()
+    assert wait_finished(job).state == "done"
+    assert engine.calls == [("format", {"device": "/dev/sdb", "fs": "ext4"})]
+
+
+def test_submit_validates_request(manager):
+    with pytest.raises(ValueError, match="Unknown operation"):
+        manager.submit("erase", {"device": "/dev/sdb"})
+    with pytest.raises(ValueError, match="Missing parameter"):
+        manager.submit("burn", {"device": "/dev/sdb"})
+
+
+def test_numeric_params(manager):
+    job = manager.submit(
+        "burn", {"device": "/dev/sdb", "image": "x.iso", "flush_every": "16"}
+    )
+    assert job.params["flush_every"] == 16
+    for value in (0, -1, 1.5, "16 MiB", True, [16]):
+        with pytest.raises(ValueError, match="flush_every must be"):
+            manager.submit(
+                "burn", {"device": "/dev/sdc", "image": "x.iso", "flush_every": value}
+            )
+    with pytest.raises(ValueError, match="cluster_size must be"):
+        manager.submit("format", {"device": "/dev/sdc", "cluster_size": "4k"})
+
+
+def test_burn_passes_write_options(manager, monkeypatch, wait_finished):
+    calls = []
+    monkeypatch.setitem(
+        jobs.OPERATIONS, "burn", (jobs.run_burn, jobs.OPERATIONS["burn"][1])
+    )
+    monkeypatch.setattr(
+        jobs.logic, "write_iso", lambda *args, **kwargs: calls.append(kwargs)
+    )
+    params = {"device": "/dev/sdb", "image": "x.iso", "durability": "periodic"}
+    wait_finished(manager.submit("burn", dict(params, flush_every=8)))
+    wait_finished(manager.submit("burn", params))
+    assert [c["flush_every"] for c in calls] == [8, 64]
+    assert calls[0]["durability"] == "periodic"
+
+
+def test_submit_refuses_drives_outside_enumeration(manager):
+    with pytest.raises(ValueError, match="not a removable USB drive"):
+        manager.submit("format", {"device": "/dev/sda"})
+    with pytest.raises(ValueError, match="not a removable USB drive"):
+        manager.submit("duplicate", {"device": "/dev/sdb", "targets": ["/dev/sda"]})
+    assert manager.list() == []
+
+
+def test_busy_drive_is_refused(manager):
+    first = manager.submit("format", {"device": "/dev/sdb"})
+    with pytest.raises(ValueError, match=f"busy with job {first.id}"):
+        manager.submit("burn", {"device": "/dev/sdb", "image": "x.iso"})
+    with pytest.raises(ValueError, match="busy"):
+        manager.submit("duplicate", {"device": "/dev/sdc", "targets": ["/dev/sdb"]})
+
+
+def test_finished_job_frees_drive(manager, engine, wait_finished):
+    first = manager.submit("format", {"device": "/dev/sdb"})
+    engine.release()
+    wait_finished(first)
+    manager.submit("format", {"device": "/dev/sdb"})
+
+
+def test_duplicate_jobs_share_their_source(drives, manager):
+    drives += ["/dev/sdd"]
+    manager.submit("duplicate", {"device": "/dev/sdb", "targets": ["/dev/sdc"]})
+    manager.submit("duplicate", {"device": "/dev/sdb", "targets": "/dev/sdd"})
+    manager.submit("verify", {"device": "/dev/sdb", "image": "x.iso"})
+    # ...but nothing may write it meanwhile
+    with pytest.raises(ValueError, match="busy"):
+        manager.submit("format", {"device": "/dev/sdb"})
+
+
+def test_cancel(manager, wait_finished):
+    job = manager.submit("format", {"device": "/dev/sdb"})
+    manager.cancel(job.id)
+    assert wait_finished(job).state == "cancelled"
+
+
+def test_events_are_published(manager, engine, wait_finished):
+    events = manager.subscribe()
+    job = manager.submit("format", {"device": "/dev/sdb"})
+    engine.release()
+    wait_finished(job)
+    states = []
+    while not events.empty():
+        states.append(events.get()["job"]["state"])
+    assert states[0] == "queued" and states[-1] == "done"
+    assert "running" in states
+
+
+def test_track_registers_all_or_none(manager):
+    tracked = manager.track("format", [{"device": "/dev/sdb"}])
+    assert tracked[0].state == "running"
+    with pytest.raises(ValueError, match="busy"):
+        manager.track("format", [{"device": "/dev/sdc"}, {"device": "/dev/sdb"}])
+    with pytest.raises(ValueError, match="used twice"):
+        manager.track("format", [{"device": "/dev/sdc"}, {"device": "/dev/sdc"}])
+    assert len(manager.list()) == 1
+
+    tracked[0].finish(True)
+    assert tracked[0].state == "done" and tracked[0].fraction == 1.0
+
+
+def test_job_sinks_update_job_directly(manager):
+    job = manager.track("format", [{"device": "/dev/sdb"}])[0]
+    jobs.logic.ui(jobs.JobStatus(job).set_markup, "<b>Formatting</b>")
+    jobs.logic.ui(jobs.JobProgress(job).set_fraction, 0.25)
+    assert job.message == "Formatting"
+    assert job.fraction == 0.25
+
+
+def test_clear_finished(manager, engine, wait_finished):
+    done = manager.submit("format", {"device": "/dev/sdb"})
+    engine.release()
+    wait_finished(done)
+    engine.released.clear()
+    running = manager.submit("format", {"device": "/dev/sdc"})
+    events = manager.subscribe()
+
+    assert manager.clear_finished() == [done.id]
+    assert manager.list() == [running]
+    with pytest.raises(ValueError, match="No such job"):
+        manager.get(done.id)
+    assert events.get_nowait() == {"event": "cleared", "jobs": [done.id]}
+
+    # Late updates of a cleared job, e.g. a pulse stopping, stay quiet
+    jobs.logic.ui(jobs.JobStatus(done).set_text, "Format complete")
+    assert events.empty()
+    assert manager.clear_finished() == []
+
+
+# =====================================================
+#  Auto rules
+# =====================================================
+
+
+def test_rule_runs_on_inserted_drives_only(drives, manager, engine):
+    manager.add_rule("burn", {"image": "x.iso"})
+    manager.check_rules()
+    assert engine.calls == []
+
+    drives += ["/dev/sdd", "/dev/sde"]
+    manager.check_rules()
+    manager.check_rules()
+    assert sorted(p["device"] for _, p in engine.calls) == ["/dev/sdd", "/dev/sde"]
+
+
+def test_duplicate_rule_copies_all_inserted_drives(drives, manager, engine):
+    manager.add_rule("duplicate", {"device": "/dev/sdb"})
+    drives += ["/dev/sdd"]
+    manager.check_rules()
+    # More sticks while the first copy is still running
+    drives += ["/dev/sde", "/dev/sdf", "/dev/sdg"]
+    manager.check_rules()
+
+    targets = [p["targets"] for _, p in wait_calls(engine, 2)]
+    assert targets == [["/dev/sdd"], ["/dev/sde", "/dev/sdf", "/dev/sdg"]]
+
+
+def test_rule_retries_busy_drives(drives, manager, engine, wait_finished):
+    manager.add_rule("burn", {"image": "x.iso"})
+    drives += ["/dev/sdd"]
+    busy = manager.submit("format", {"device": "/dev/sdd"})
+    manager.check_rules()
+    assert len(manager.list()) == 1
+
+    engine.release()
+    wait_finished(busy)
+    manager.check_rules()
+    assert [job.op for job in manager.list()] == ["format", "burn"]
+
+
+def test_reinserted_drive_triggers_again(drives, manager, engine, wait_finished):
+    engine.release()
+    manager.add_rule("burn", {"image": "x.iso"})
+    drives += ["/dev/sdd"]
+    manager.check_rules()
+    wait_finished(manager.list()[0])
+
+    drives.remove("/dev/sdd")
+    manager.check_rules()
+    drives.append("/dev/sdd")
+    manager.check_rules()
+    assert len(manager.list()) == 2
+
+
+def test_rule_needs_device_operation(manager):
+    with pytest.raises(ValueError):
+        manager.add_rule("hash", {"file": "x", "hash": "y"})
+    with pytest.raises(ValueError, match="source"):
+        manager.add_rule("duplicate", {})
+
+
+# Waits for the fake engine to have been called count times
+def wait_calls(engine, count):
+    deadline = time.monotonic() + 5
+    while len(engine.calls) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return engine.calls
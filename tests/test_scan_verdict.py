@@ -0,0 +1,70 @@
+from logic import MiB, scan_verdict
+
+GiB = 1024 * MiB
+
+
+def test_clean_drive():
+    report = {"size": 8 * GiB, "real_capacity": 8 * GiB, "regions": []}
+    assert scan_verdict(report) == (8 * GiB, "no bad regions found")
+
+
+def test_fake_capacity():
+    # A 2 GiB stick claiming 32 GiB wraps writes around. The quick scan
+    # writes 1 MiB every 128 MiB, so every sample below the last 2 GiB reads
+    # back the tag of the last sample that landed on the same flash.
+    size, real, stride = 32 * GiB, 2 * GiB, 128 * MiB
+    report = {
+        "size": size,
+        "real_capacity": real,
+        "regions": [
+            {
+                "start": start,
+                "end": start + MiB,
+                "kind": "aliased",
+                "alias_of": start % real + size - real,
+            }
+            for start in range(0, size - real, stride)
+        ],
+    }
+    capacity, message = scan_verdict(report)
+    assert capacity == 2 * GiB
+    assert message == "real capacity is 2.0 GiB of the reported 32.0 GiB"
+
+
+def test_dropped_writes_past_capacity():
+    # Other fakes drop writes past their real size; those read back as bad
+    report = {
+        "size": 32 * GiB,
+        "real_capacity": 4 * GiB,
+        "regions": [{"start": 4 * GiB, "end": 32 * GiB, "kind": "bad"}],
+    }
+    assert scan_verdict(report)[0] == 4 * GiB
+
+
+def test_bad_region_below_capacity():
+    report = {
+        "size": 8 * GiB,
+        "real_capacity": 8 * GiB,
+        "regions": [{"start": 1 * GiB, "end": 1 * GiB + MiB, "kind": "bad"}],
+    }
+    capacity, message = scan_verdict(report)
+    assert capacity is None
+    assert message.startswith("1 bad region(s) found")
+
+
+def test_alias_within_capacity_is_a_defect():
+    report = {
+        "size": 8 * GiB,
+        "real_capacity": 8 * GiB,
+        "regions": [
+            {"start": 4 * GiB, "end": 4 * GiB + MiB, "kind": "aliased", "alias_of": 0}
+        ],
+    }
+    assert scan_verdict(report)[0] is None
+
+
+def test_tiny_real_capacity():
+    report = {"size": 16 * GiB, "real_capacity": 8 * MiB, "regions": []}
+    capacity, message = scan_verdict(report)
+    assert capacity is None
+    assert message.startswith("drive holds only")
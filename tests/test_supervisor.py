@@ -0,0 +1,92 @@
+import asyncio, os, sys, threading, time
+
+import pytest
+
+import supervisor
+
+
+# Feeds chunks through _pump and returns (lines, captured output, byte count)
+def pump(*chunks):
+    async def feed():
+        stream = asyncio.StreamReader()
+        for chunk in chunks:
+            stream.feed_data(chunk)
+        stream.feed_eof()
+        lines = []
+        output, nbytes = await supervisor._pump(stream, lines.append, True)
+        return lines, output, nbytes
+
+    return asyncio.run(feed())
+
+
+def test_pump_splits_on_every_line_break():
+    lines, output, nbytes = pump(b"one\ntwo\rthree\r\nfour")
+    assert lines == ["one", "two", "three", "four"]
+    assert output == "one\ntwo\rthree\r\nfour"
+    assert nbytes == 19
+
+
+def test_pump_joins_lines_across_chunks():
+    lines, _, _ = pump(b"10% do", b"ne\r20% done\r", b"\n", b"\n30%")
+    assert lines == ["10% done", "20% done", "30%"]
+
+
+def test_pump_decodes_split_characters():
+    data = "über ✓\n".encode()
+    lines, output, _ = pump(data[:1], data[1:2], data[2:-3], data[-3:-1], data[-1:])
+    assert lines == ["über ✓"]
+    assert output == "über ✓\n"
+
+
+def test_pump_without_capture():
+    async def feed():
+        stream = asyncio.StreamReader()
+        stream.feed_data(b"a\nb\n")
+        stream.feed_eof()
+        return await supervisor._pump(stream, None, False)
+
+    assert asyncio.run(feed()) == ("", 4)
+
+
+def test_run_collects_output():
+    lines = []
+    result = supervisor.run(
+        ["printf", "a\\rb\\nc"], on_stdout=lines.append, timeout=10
+    )
+    assert result.returncode == 0
+    assert result.stdout == "a\rb\nc"
+    assert lines == ["a", "b", "c"]
+    assert not result.timed_out and not result.cancelled
+
+
+def test_run_reports_stderr_and_exit_code():
+    code = "import sys; sys.stderr.write('boom'); sys.exit(3)"
+    result = supervisor.run([sys.executable, "-c", code], timeout=10)
+    assert result.returncode == 3
+    assert result.stderr == "boom"
+
+
+def test_run_timeout():
+    result = supervisor.run(["sleep", "30"], timeout=0.1)
+    assert result.timed_out
+    assert result.returncode != 0
+
+
+def test_run_cancel():
+    cancel = threading.Event()
+    threading.Timer(0.1, cancel.set).start()
+    result = supervisor.run(["sleep", "30"], cancel=cancel)
+    assert result.cancelled
+    assert result.returncode != 0
+
+
+@pytest.mark.skipif(not hasattr(os, "pidfd_open"), reason="needs pidfds")
+def test_commands_share_one_thread():
+    supervisor.get_loop()
+    before = threading.active_count()
+    handles = [supervisor.spawn(["sleep", "0.5"]) for _ in range(10)]
+    time.sleep(0.2)
+    running = threading.active_count()
+    assert all(handle.wait().returncode == 0 for handle in handles)
+    assert running <= before
+    assert not [t for t in threading.enumerate() if "waitpid" in t.name]
@@ -0,0 +1,171 @@
+import threading
+
+import pytest
+
+import topology
+
+CONTROLLER = "devices/pci0000:00/0000:00:14.0"
+
+# USB devices under the controller: path -> (speed, version). usb1 is the
+# USB 2.0 root hub, usb2 its SuperSpeed sibling.
+USB = {
+    "usb1": ("480", "2.00"),
+    "usb2": ("5000", "3.10"),
+    "usb1/1-1": ("480", "2.00"),  # USB 2.0 hub
+    "usb1/1-1/1-1.1": ("480", "2.00"),
+    "usb1/1-1/1-1.2": ("480", "2.00"),
+    "usb1/1-2": ("480", "3.20"),  # USB 3 stick that lost its SuperSpeed link
+    "usb1/1-3": ("12", "1.10"),
+    "usb2/2-1": ("5000", "3.20"),
+    "usb2/2-2": ("5000", "3.20"),
+}
+
+# Block devices and the USB device they sit on
+DRIVES = {
+    "sdb": "usb1/1-1/1-1.1",
+    "sdc": "usb1/1-1/1-1.2",
+    "sdd": "usb2/2-1",
+    "sde": "usb2/2-2",
+    "sdf": "usb1/1-2",
+    "sdg": "usb1/1-3",
+}
+
+
+# Builds /sys/devices and /sys/class/block for the drives above
+@pytest.fixture
+def sysfs(tmp_path, monkeypatch):
+    controller = tmp_path / CONTROLLER
+    for path, (speed, version) in USB.items():
+        folder = controller / path
+        folder.mkdir(parents=True)
+        (folder / "busnum").write_text(path.split("/")[0][3:] + "\n")
+        (folder / "speed").write_text(speed + "\n")
+        (folder / "version").write_text(f" {version}\n")
+
+    block = tmp_path / "class" / "block"
+    block.mkdir(parents=True)
+    for name, path in DRIVES.items():
+        port = path.rsplit("/", 1)[-1]
+        disk = controller / path / f"{port}:1.0" / "host0" / "block" / name
+        disk.mkdir(parents=True)
+        (block / name).symlink_to(disk)
+    sata = tmp_path / "devices/pci0000:00/0000:00:17.0/ata1/host1/block/sda"
+    sata.mkdir(parents=True)
+    (block / "sda").symlink_to(sata)
+
+    monkeypatch.setattr(topology, "SYSFS_BLOCK", str(block))
+
+
+def test_usb_topology(sysfs):
+    assert topology.usb_topology("/dev/sdb") == {
+        "controller": "0000:00:14.0",
+        "bus": "usb1",
+        "bus_speed_mbps": 480.0,
+        "port": "1-1.1",
+        "speed_mbps": 480.0,
+        "usb_version": "2.00",
+        "links": [
+            {"name": "1-1.1", "speed_mbps": 480.0},
+            {"name": "1-1", "speed_mbps": 480.0},
+            {"name": "usb1", "speed_mbps": 480.0},
+        ],
+        "warnings": [],
+    }
+    assert topology.usb_topology("/dev/sda") is None
+
+
+def test_slow_link_warnings(sysfs):
+    assert topology.usb_topology("/dev/sdd")["warnings"] == []
+    assert topology.usb_topology("/dev/sdf")["warnings"] == [
+        "USB 3 drive negotiated USB 2.0 on a USB 3 port; "
+        "check the cable, hub or port"
+    ]
+    assert topology.usb_topology("/dev/sdg")["warnings"] == [
+        "Drive is connected at USB 1.1 full speed"
+    ]
+
+
+# Enters a slot on another thread; returns (entered event, release function)
+def hold(scheduler, drives, cancel=None):
+    entered, release, errors = threading.Event(), threading.Event(), []
+
+    def run():
+        try:
+            with scheduler.slot(drives, cancel):
+                entered.set()
+                release.wait(5)
+        except topology.Cancelled as e:
+            errors.append(e)
+            entered.set()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+
+    def finish():
+        release.set()
+        thread.join(5)
+        return errors
+
+    return entered, finish
+
+
+def drive(name, demand=None):
+    return [(topology.usb_topology(f"/dev/{name}"), demand)]
+
+
+def test_drives_behind_one_hub_take_turns(sysfs):
+    scheduler = topology.BandwidthScheduler()
+    first, finish_first = hold(scheduler, drive("sdb"))
+    assert first.wait(5)
+
+    # Both sticks would fill the USB 2.0 hub on their own
+    second, finish_second = hold(scheduler, drive("sdc"))
+    assert not second.wait(0.3)
+    finish_first()
+    assert second.wait(5)
+    finish_second()
+    assert scheduler.used == {}
+
+
+def test_slow_drives_share_a_hub(sysfs):
+    scheduler = topology.BandwidthScheduler()
+    first, finish_first = hold(scheduler, drive("sdb", 10))
+    second, finish_second = hold(scheduler, drive("sdc", 10))
+    assert first.wait(5) and second.wait(5)
+    assert scheduler.used["1-1"] == (20, 2)
+    finish_first()
+    finish_second()
+
+
+def test_drives_on_separate_ports_run_together(sysfs):
+    scheduler = topology.BandwidthScheduler()
+    holders = [
+        hold(scheduler, drive("sdb")),  # USB 2.0 bus
+        hold(scheduler, drive("sdd", 30)),  # SuperSpeed bus, own root port
+        hold(scheduler, drive("sde", 30)),
+    ]
+    assert all(entered.wait(5) for entered, _ in holders)
+    for _, finish in holders:
+        finish()
+
+
+def test_one_job_counts_all_its_drives(sysfs):
+    scheduler = topology.BandwidthScheduler()
+    # A duplicate from sdb to sdc needs the hub twice
+    first, finish_first = hold(scheduler, drive("sdb", 10) + drive("sdc", 10))
+    assert first.wait(5)
+    assert scheduler.used["1-1"] == (20, 2)
+    finish_first()
+
+
+def test_cancel_while_waiting(sysfs):
+    scheduler = topology.BandwidthScheduler()
+    first, finish_first = hold(scheduler, drive("sdb"))
+    assert first.wait(5)
+    cancel = threading.Event()
+    second, finish_second = hold(scheduler, drive("sdc"), cancel)
+    cancel.set()
+    assert second.wait(5)
+    assert len(finish_second()) == 1
+    finish_first()
+    assert scheduler.used == {}